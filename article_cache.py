@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from extractors import project_fields
+from single_flight import SingleFlight
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+NEWS_ITEM_RE = re.compile(r'/news/item/(\d+)')
+
+
+def get_news_item_id(url):
+    """Числовой ID новости из URL вида https://www.mos.ru/news/item/<id>/"""
+    match = NEWS_ITEM_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+def make_validators(headers, content):
+    """Валидаторы ответа для условных запросов: ETag, Last-Modified и хэш тела"""
+    return {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'content_hash': hashlib.sha256(content).hexdigest()
+    }
+
+
+def conditional_headers(validators):
+    """Заголовки If-None-Match / If-Modified-Since для сохраненной версии"""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+class MemoryTier:
+    """LRU-кэш в памяти процесса с ограничением по размеру"""
+
+    name = 'memory'
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SqliteTier:
+    """
+    Кэш на диске: переживает перезапуск и общий для воркеров gunicorn.
+
+    Устаревшие записи хранятся ради условных запросов, поэтому раз в
+    prune_every записей удаляются те, что не обновлялись дольше max_age
+    секунд, и самые старые сверх max_rows (0 - без ограничения).
+    """
+
+    name = 'disk'
+
+    def __init__(self, path, max_age=0, max_rows=0, prune_every=100):
+        self.path = path
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self.writes = 0
+        self._connect = LocalConnection(path)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS articles ('
+                'item_id TEXT PRIMARY KEY, entry TEXT NOT NULL, stored_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS articles_stored_at ON articles (stored_at)')
+        self.prune()
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT entry FROM articles WHERE item_id = ?', (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO articles (item_id, entry, stored_at) VALUES (?, ?, ?)',
+                (key, json.dumps(entry, ensure_ascii=False), entry['stored_at'])
+            )
+        # Счетчик без блокировки: пропущенная или лишняя очистка не страшна
+        self.writes += 1
+        if self.writes % self.prune_every == 0:
+            self.prune()
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM articles WHERE item_id = ?', (key,))
+
+    def prune(self):
+        """Удаляет записи старше max_age и самые старые сверх max_rows, возвращает их число"""
+        removed = 0
+        with self._connect() as conn:
+            if self.max_age:
+                removed += conn.execute(
+                    'DELETE FROM articles WHERE stored_at < ?', (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_rows:
+                removed += conn.execute(
+                    'DELETE FROM articles WHERE item_id IN ('
+                    'SELECT item_id FROM articles ORDER BY stored_at DESC LIMIT -1 OFFSET ?)', (self.max_rows,)
+                ).rowcount
+        if removed:
+            logger.info(f"Article cache: pruned {removed} disk entries")
+        return removed
+
+
+class ArticleCache:
+    """
+    Двухуровневый кэш результатов парсинга по ID новости.
+
+    Запись - словарь {'data': <результат парсинга>, 'validators': <ETag,
+    Last-Modified, хэш тела>, 'stored_at': <unix time>}. Чтение идет сначала
+    из памяти, затем с диска (найденное на диске поднимается в память).
+
+    Устаревшие по TTL записи не отдаются, но хранятся до вытеснения (на
+    диске - до db_max_age секунд и не больше db_max_rows записей): по их
+    валидаторам делается условный запрос, и если страница не изменилась,
+    запись продлевается без повторного разбора HTML.
+
+    Одновременные промахи по одному ID объединяются: загрузку и парсинг
+    выполняет один запрос, остальные получают его результат.
+
+    Запрос с набором полей (fields) получает из полной записи только их;
+    при промахе разбираются только эти поля, и такой неполный результат
+    в кэш не записывается.
+
+    leases (coordination.Coordinator) объединяет промахи и между
+    экземплярами с общим дисковым кэшем: новость загружает экземпляр,
+    взявший аренду (она продлевается, пока идет загрузка), остальные
+    ждут ее записи на диске.
+    """
+
+    def __init__(self, ttl=600, max_size=1000, db_path=None, leases=None, db_max_age=0, db_max_rows=0):
+        self.ttl = ttl
+        self.memory = MemoryTier(max_size)
+        self.disk = SqliteTier(db_path, db_max_age, db_max_rows) if db_path else None
+        self.leases = leases if self.disk is not None else None
+        self.stats = {'hits': 0, 'misses': 0, 'bypass': 0, 'revalidated': 0, 'shared': 0}
+        self.stats_lock = threading.Lock()
+        self.flight = SingleFlight()
+
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def lookup(self, key, allow_stale=False):
+        """Возвращает (запись, уровень) или (None, None)"""
+        stale = None, None
+        for tier in (self.memory, self.disk):
+            if tier is None:
+                continue
+            entry = tier.get(key)
+            if entry is None:
+                continue
+            if self.is_fresh(entry):
+                if tier is self.disk:
+                    self.memory.set(key, entry)
+                return entry, tier.name
+            if stale[0] is None:
+                stale = entry, tier.name
+        return stale if allow_stale else (None, None)
+
+    def store(self, key, data, validators=None):
+        entry = {'data': data, 'validators': validators, 'stored_at': time.time()}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+        return entry
+
+    def get_cached(self, key, refresh=False):
+        """Ответ из кэша с полем 'cache' или None, если нужен парсинг"""
+        if refresh:
+            return None
+        entry, tier = self.lookup(key)
+        if entry is None:
+            return None
+        self._count('hits')
+        return {
+            **entry['data'],
+            'cache': {
+                'status': 'hit',
+                'tier': tier,
+                'age': round(time.time() - entry['stored_at'], 3)
+            }
+        }
+
+    def get_stale(self, key, refresh=False):
+        """Устаревшая запись для условного запроса (при refresh не используется)"""
+        if refresh:
+            return None
+        return self.lookup(key, allow_stale=True)[0]
+
+    def put_parsed(self, key, result, validators, stale=None, refresh=False, partial=False):
+        """
+        Сохраняет результат парсинга и помечает ответ как miss/bypass.
+
+        result None означает, что страница не изменилась: устаревшая
+        запись продлевается и отдается со статусом revalidated.
+        partial - результат с частью полей, он не сохраняется.
+        """
+        if result is None and stale is not None:
+            self._count('revalidated')
+            entry = self.store(key, stale['data'], validators)
+            return {**entry['data'], 'cache': {'status': 'revalidated', 'age': 0}}
+
+        self._count('bypass' if refresh else 'misses')
+        if result.get('success') and not partial:
+            self.store(key, result, validators)
+        return {**result, 'cache': {'status': 'bypass' if refresh else 'miss', 'age': 0}}
+
+    def get_or_parse(self, url, parse, refresh=False, fields=None):
+        """
+        Результат парсинга из кэша или через parse(url, validators).
+
+        parse возвращает (результат, валидаторы), результат None - страница
+        не изменилась. В ответ добавляется поле 'cache' со статусом
+        hit/miss/bypass/revalidated, уровнем кэша и возрастом записи в секундах;
+        запросы, дождавшиеся чужой загрузки, помечаются флагом coalesced.
+        fields - набор полей ответа, parse должен разбирать только их.
+        """
+        key = get_news_item_id(url)
+        if key is None:
+            return parse(url)[0]
+        cached = self.get_cached(key, refresh)
+        if cached is not None:
+            return project_fields(cached, fields)
+
+        def fetch():
+            lease = self.lease_name(key, refresh, fields)
+            if lease is not None:
+                # Аренду держит другой экземпляр, пока загружает эту новость
+                while not self.leases.acquire(lease, renew=True):
+                    time.sleep(self.leases.poll_interval)
+            try:
+                shared = self.get_shared(key) if lease is not None else None
+                if shared is not None:
+                    return shared
+                stale = self.get_stale(key, refresh)
+                result, validators = parse(url, stale.get('validators') if stale else None)
+                return self.put_parsed(key, result, validators, stale, refresh, fields is not None)
+            finally:
+                if lease is not None:
+                    self.leases.release(lease)
+
+        # Полный и неполный разбор одной новости - разные загрузки
+        result, leader = self.flight.do((key, fields), fetch)
+        return project_fields(result if leader else self.mark_coalesced(result), fields)
+
+    async def get_or_parse_async(self, url, parse, refresh=False, fields=None):
+        """
+        То же, что get_or_parse, для корутины parse(url, validators); чтение
+        и запись дискового кэша и аренды выполняются вне event loop
+        """
+        key = get_news_item_id(url)
+        if key is None:
+            return (await parse(url))[0]
+        cached = await self.run_blocking(self.get_cached, key, refresh)
+        if cached is not None:
+            return project_fields(cached, fields)
+
+        async def fetch():
+            lease = self.lease_name(key, refresh, fields)
+            try:
+                # Внутри try: отмена, пришедшая, пока аренда бралась в пуле потоков,
+                # не оставит ее за нами (в процессе загрузку новости ведет один вызов)
+                while lease is not None and not await self.run_blocking(self.leases.acquire, lease, None, True):
+                    # Аренду держит другой экземпляр, пока загружает эту новость
+                    await asyncio.sleep(self.leases.poll_interval)
+                shared = await self.run_blocking(self.get_shared, key) if lease is not None else None
+                if shared is not None:
+                    return shared
+                stale = await self.run_blocking(self.get_stale, key, refresh)
+                result, validators = await parse(url, stale.get('validators') if stale else None)
+                return await self.run_blocking(self.put_parsed, key, result, validators, stale, refresh,
+                                               fields is not None)
+            finally:
+                if lease is not None:
+                    await self.run_blocking(self.leases.release, lease)
+
+        result, leader = await self.flight.do_async((key, fields), fetch)
+        return project_fields(result if leader else self.mark_coalesced(result), fields)
+
+    async def run_blocking(self, func, *args):
+        """Вызов, который может обратиться к SQLite, - в пуле потоков; без диска - сразу"""
+        if self.disk is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def lease_name(self, key, refresh, fields):
+        """
+        Аренда загрузки между экземплярами или None: только полный разбор
+        без refresh - его результат попадает в общий кэш
+        """
+        if self.leases is None or refresh or fields is not None:
+            return None
+        return f'article:{key}'
+
+    def get_shared(self, key):
+        """Запись, которую пока ждали аренду, сохранил другой экземпляр"""
+        cached = self.get_cached(key)
+        if cached is None:
+            return None
+        self._count('shared')
+        return {**cached, 'cache': {**cached['cache'], 'shared': True}}
+
+    def mark_coalesced(self, result):
+        """Ответ для запроса, дождавшегося чужой загрузки"""
+        return {**result, 'cache': {**result['cache'], 'coalesced': True}}
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['coalesced'] = self.flight.coalesced
+        stats['in_flight'] = self.flight.in_flight()
+        stats['memory_size'] = len(self.memory)
+        stats['disk'] = self.disk is not None
+        stats['leases'] = self.leases is not None
+        return stats
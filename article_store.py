@@ -0,0 +1,226 @@
+import json
+import logging
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from article_cache import get_news_item_id
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4, 'мая': 5, 'июня': 6,
+    'июля': 7, 'августа': 8, 'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+}
+RU_DATE_RE = re.compile(r'(\d{1,2})\s+(' + '|'.join(MONTHS) + r')\s+(\d{4})', re.I)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS stored_articles ('
+    'item_id INTEGER PRIMARY KEY, url TEXT NOT NULL, title TEXT NOT NULL, content TEXT NOT NULL, '
+    'date TEXT NOT NULL, published TEXT, images TEXT NOT NULL, tags TEXT NOT NULL, '
+    'parsed_at TEXT, stored_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS stored_articles_published ON stored_articles (published, item_id)',
+    'CREATE TABLE IF NOT EXISTS stored_article_tags ('
+    'tag TEXT NOT NULL, item_id INTEGER NOT NULL, PRIMARY KEY (tag, item_id)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS stored_article_tags_item ON stored_article_tags (item_id)',
+]
+
+# Полнотекстовый индекс по заголовку, тексту и тегам; синхронизируется триггерами
+FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS stored_articles_fts USING fts5("
+    "title, content, tags, content='stored_articles', content_rowid='item_id', tokenize='unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS stored_articles_ai AFTER INSERT ON stored_articles BEGIN '
+    'INSERT INTO stored_articles_fts (rowid, title, content, tags) '
+    'VALUES (new.item_id, new.title, new.content, new.tags); END',
+    'CREATE TRIGGER IF NOT EXISTS stored_articles_ad AFTER DELETE ON stored_articles BEGIN '
+    "INSERT INTO stored_articles_fts (stored_articles_fts, rowid, title, content, tags) "
+    "VALUES ('delete', old.item_id, old.title, old.content, old.tags); END",
+    'CREATE TRIGGER IF NOT EXISTS stored_articles_au AFTER UPDATE ON stored_articles BEGIN '
+    "INSERT INTO stored_articles_fts (stored_articles_fts, rowid, title, content, tags) "
+    "VALUES ('delete', old.item_id, old.title, old.content, old.tags); "
+    'INSERT INTO stored_articles_fts (rowid, title, content, tags) '
+    'VALUES (new.item_id, new.title, new.content, new.tags); END',
+]
+
+COLUMNS = 'a.item_id, a.url, a.title, a.content, a.date, a.published, a.images, a.tags, a.parsed_at'
+
+
+def normalize_date(value):
+    """Дата публикации в виде YYYY-MM-DD[THH:MM:SS] для сортировки и фильтров или None"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        return moment.replace(tzinfo=None).isoformat(timespec='seconds')
+    except ValueError:
+        pass
+    match = RU_DATE_RE.search(value)
+    if match:
+        day, month, year = match.groups()
+        try:
+            return datetime(int(year), MONTHS[month.lower()], int(day)).isoformat(timespec='seconds')
+        except ValueError:
+            return None
+    return None
+
+
+def fts_query(text):
+    """
+    Запрос пользователя в синтаксис FTS5.
+
+    Слова ищутся целиком (все сразу), звездочка на конце слова - поиск по
+    началу слова; кавычки и операторы FTS5 не интерпретируются.
+    """
+    terms = []
+    for word in re.findall(r'[\w*]+', text):
+        prefix = word.endswith('*')
+        word = word.strip('*')
+        if word:
+            terms.append('"' + word + '"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class ArticleStore:
+    """
+    Хранилище разобранных статей в SQLite с индексами по ID, дате, тегам
+    и полнотекстовым индексом FTS5.
+
+    Каждая успешно разобранная статья сохраняется (новая версия заменяет
+    старую), запросы к списку и поиску не обращаются к mos.ru.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connect = LocalConnection(path)
+        with self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            try:
+                for statement in FTS_SCHEMA:
+                    conn.execute(statement)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                # SQLite собран без FTS5 - поиск идет через LIKE
+                logger.warning(f"FTS5 is not available, falling back to LIKE search: {e}")
+                self.fts = False
+
+    def save(self, article):
+        """Сохраняет успешный результат парсинга, возвращает True, если статья записана"""
+        item_id = get_news_item_id(article.get('url'))
+        if not article.get('success') or item_id is None:
+            return False
+        tags = list(dict.fromkeys(article.get('tags') or []))
+        with self._connect() as conn:
+            conn.execute(
+                # UPSERT, а не REPLACE: при REPLACE не срабатывает триггер удаления и FTS-индекс расходится
+                'INSERT INTO stored_articles (item_id, url, title, content, date, published, '
+                'images, tags, parsed_at, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (item_id) DO UPDATE SET url = excluded.url, title = excluded.title, '
+                'content = excluded.content, date = excluded.date, published = excluded.published, '
+                'images = excluded.images, tags = excluded.tags, parsed_at = excluded.parsed_at, '
+                'stored_at = excluded.stored_at',
+                (
+                    int(item_id), article['url'], article.get('title', ''), article.get('content', ''),
+                    article.get('date', ''), normalize_date(article.get('date')),
+                    json.dumps(article.get('images') or [], ensure_ascii=False),
+                    json.dumps(tags, ensure_ascii=False),
+                    article.get('parsed_at'), time.time()
+                )
+            )
+            conn.execute('DELETE FROM stored_article_tags WHERE item_id = ?', (int(item_id),))
+            conn.executemany(
+                'INSERT INTO stored_article_tags (tag, item_id) VALUES (?, ?)',
+                [(tag, int(item_id)) for tag in tags]
+            )
+        return True
+
+    def row_to_article(self, row):
+        item_id, url, title, content, date, published, images, tags, parsed_at = row[:9]
+        article = {
+            'item_id': item_id,
+            'url': url,
+            'title': title,
+            'content': content,
+            'date': date,
+            'published': published,
+            'images': json.loads(images),
+            'tags': json.loads(tags),
+            'parsed_at': parsed_at
+        }
+        if len(row) > 9:
+            article['snippet'] = row[9]
+        return article
+
+    def get(self, item_id):
+        row = self._connect().execute(
+            f'SELECT {COLUMNS} FROM stored_articles a WHERE a.item_id = ?', (int(item_id),)
+        ).fetchone()
+        return self.row_to_article(row) if row else None
+
+    def _filters(self, tag=None, date_from=None, date_to=None):
+        clauses, params = [], []
+        if tag:
+            clauses.append('a.item_id IN (SELECT item_id FROM stored_article_tags WHERE tag = ?)')
+            params.append(tag)
+        if date_from:
+            clauses.append('a.published >= ?')
+            params.append(date_from)
+        if date_to:
+            # Дата без времени включает весь день
+            clauses.append('a.published < ?' if 'T' in date_to else "a.published < (? || 'T99')")
+            params.append(date_to)
+        return clauses, params
+
+    def query(self, tag=None, date_from=None, date_to=None, limit=20, offset=0):
+        """Статьи по фильтрам, новые первыми: (статьи, всего найдено)"""
+        clauses, params = self._filters(tag, date_from, date_to)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) FROM stored_articles a {where}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT {COLUMNS} FROM stored_articles a {where} '
+            'ORDER BY a.published IS NULL, a.published DESC, a.item_id DESC LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        ).fetchall()
+        return [self.row_to_article(row) for row in rows], total
+
+    def search(self, text, tag=None, date_from=None, date_to=None, limit=20, offset=0):
+        """Полнотекстовый поиск, лучшие совпадения первыми: (статьи со snippet, всего найдено)"""
+        clauses, params = self._filters(tag, date_from, date_to)
+        conn = self._connect()
+        if self.fts:
+            match = fts_query(text)
+            if not match:
+                return [], 0
+            where = ' AND '.join(['stored_articles_fts MATCH ?'] + clauses)
+            source = 'stored_articles_fts JOIN stored_articles a ON a.item_id = stored_articles_fts.rowid'
+            params = [match] + params
+            snippet = "snippet(stored_articles_fts, 1, '<b>', '</b>', '...', 20)"
+            order = 'bm25(stored_articles_fts, 5.0, 1.0, 2.0)'
+        else:
+            words = text.split()
+            if not words:
+                return [], 0
+            like = ['(a.title LIKE ? OR a.content LIKE ?)'] * len(words)
+            where = ' AND '.join(like + clauses)
+            source = 'stored_articles a'
+            params = [p for word in words for p in (f'%{word}%', f'%{word}%')] + params
+            snippet = "substr(a.content, 1, 200)"
+            order = 'a.published DESC'
+
+        total = conn.execute(f'SELECT COUNT(*) FROM {source} WHERE {where}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT {COLUMNS}, {snippet} FROM {source} WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        ).fetchall()
+        return [self.row_to_article(row) for row in rows], total
+
+    def get_stats(self):
+        conn = self._connect()
+        return {
+            'articles': conn.execute('SELECT COUNT(*) FROM stored_articles').fetchone()[0],
+            'tags': conn.execute('SELECT COUNT(DISTINCT tag) FROM stored_article_tags').fetchone()[0],
+            'fts': self.fts
+        }
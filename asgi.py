@@ -0,0 +1,11 @@
+"""
+ASGI-обертка для запуска под uvicorn:
+
+    uvicorn asgi:app
+    SERVER_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from flask_api_parser import app as flask_app, init_worker, shutdown_worker  # noqa: F401
+
+app = WsgiToAsgi(flask_app)
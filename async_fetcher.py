@@ -0,0 +1,193 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+import aiohttp
+
+from article_cache import conditional_headers
+from metrics import RATE_LIMITED, RETRIES, WAIT_SECONDS, record_timing
+from page_reader import CHUNK_SIZE, ArticleEndScanner, BodyReader, content_length
+from rate_control import parse_retry_after
+from transport import ConnectionStats, aiohttp_trace_config
+
+logger = logging.getLogger(__name__)
+
+
+class ClientDisconnected(Exception):
+    """Клиент закрыл соединение, пока шла загрузка; она отменена"""
+
+
+class AsyncFetcher:
+    """
+    Асинхронная загрузка страниц mos.ru.
+
+    Работает в собственном event loop в фоновом потоке: пул keep-alive
+    соединений живет дольше одного HTTP-запроса к API и общий для всех
+    потоков Flask. Корутины отправляются через submit().
+
+    rate_limiter - общий с синхронным парсером AdaptiveRateLimiter (если
+    он blocking, его обращения к SQLite идут в пуле потоков), stats -
+    счетчики запросов, новых соединений и кэша DNS.
+    Тело читается по частям, как в синхронном парсере (page_reader).
+    """
+
+    def __init__(self, headers, rate_limiter, user_agent=None, timeout=30, max_retries=3,
+                 max_page_bytes=10 * 1024 * 1024, drain_bytes=65536, pool_size=100, keepalive=60, dns_ttl=300):
+        self.headers = headers
+        self.rate_limiter = rate_limiter
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_page_bytes = max_page_bytes
+        self.drain_bytes = drain_bytes
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.stats = ConnectionStats('async')
+        self.session = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='async-fetcher', daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _get_session(self):
+        # Сессия создается внутри loop при первом запросе
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=self.keepalive,
+                ttl_dns_cache=self.dns_ttl or None,
+                use_dns_cache=self.dns_ttl > 0
+            )
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                trace_configs=[aiohttp_trace_config(self.stats)],
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    async def fetch(self, url, validators=None, article_end=None):
+        """
+        Получение страницы с повторными попытками без блокировки потока.
+
+        Возвращает (статус, заголовки, тело) для ответов 200 и 304 или None.
+        При разомкнутом автомате регулятора бросает CircuitOpenError,
+        для тела больше max_page_bytes - PageTooLarge. article_end -
+        правила извлечения, после регионов которых загрузка останавливается.
+        """
+        throttled = False
+        for attempt in range(self.max_retries):
+            reserved = False
+            try:
+                if attempt > 0:
+                    RETRIES.inc(mode='async')
+                    # После 429 пауза уже выставлена в регуляторе и учитывается в reserve()
+                    if not throttled:
+                        await self._wait(self.rate_limiter.backoff(attempt - 1), 'backoff')
+                throttled = False
+
+                # Автомат проверяется сразу: отмена во время резервирования не оставит пробу занятой
+                self.rate_limiter.check_circuit()
+                reserved = True
+                await self._wait(await self._limiter(self.rate_limiter.reserve_slot), 'rate_limit')
+
+                headers = conditional_headers(validators)
+                if self.user_agent:
+                    headers['User-Agent'] = self.user_agent()
+
+                started = time.perf_counter()
+                async with self._get_session().get(url, headers=headers, allow_redirects=True) as response:
+                    if response.status in (200, 304):
+                        body = b''
+                        if response.status == 200:
+                            # Распакованный размер не сравним с Content-Length сжатого ответа
+                            compressed = response.headers.get('Content-Encoding', 'identity') != 'identity'
+                            reader = BodyReader('async', self.max_page_bytes,
+                                                ArticleEndScanner(article_end) if article_end else None, self.drain_bytes,
+                                                None if compressed else content_length(response.headers))
+                            body = await reader.read_async(response.content.iter_chunked(CHUNK_SIZE))
+                        record_timing('network', time.perf_counter() - started)
+                        await self._limiter(self.rate_limiter.on_success)
+                        return response.status, response.headers, body
+                    record_timing('network', time.perf_counter() - started)
+                    if response.status in (429, 503):
+                        RATE_LIMITED.inc(mode='async')
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        logger.warning(f"Rate limit hit (HTTP {response.status}), Retry-After: {retry_after}")
+                        await self._limiter(self.rate_limiter.on_throttle, retry_after)
+                        throttled = True
+                        continue
+                    else:
+                        self.rate_limiter.on_failure()
+                        logger.warning(f"HTTP {response.status} for {url}")
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.rate_limiter.on_failure()
+                logger.error(f"Request error (attempt {attempt + 1}): {e}")
+                if attempt == self.max_retries - 1:
+                    raise
+            finally:
+                # Отмена и PageTooLarge не доходят до on_*: пробный запрос освобождается здесь
+                if reserved:
+                    self.rate_limiter.release_probe()
+
+        return None
+
+    async def _wait(self, seconds, reason):
+        if seconds > 0:
+            WAIT_SECONDS.observe(seconds, reason=reason)
+            record_timing(f'wait.{reason}', seconds)
+            await asyncio.sleep(seconds)
+
+    async def _limiter(self, method, *args):
+        """Вызов регулятора; общий между экземплярами (SQLite) - вне event loop"""
+        if self.rate_limiter.blocking:
+            return await self.run_sync(method, *args)
+        return method(*args)
+
+    async def run_sync(self, func, *args):
+        """Выполняет блокирующую функцию (парсинг HTML) вне event loop"""
+        # Контекст передается в поток, чтобы туда дошла разбивка времени запроса
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+
+    def submit(self, coro):
+        """Запускает корутину в loop загрузчика, возвращает concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def wait(self, coro, disconnected=None, poll_interval=0.5):
+        """
+        Ожидает корутину из другого event loop (async-представления Flask).
+
+        Flask под WSGI не отменяет представление при отключении клиента,
+        поэтому его проверяет disconnected() - раз в poll_interval секунд,
+        пока корутина выполняется. Клиент отключился - загрузка в loop
+        загрузчика отменяется и бросается ClientDisconnected.
+        """
+        future = asyncio.wrap_future(self.submit(coro))
+        if disconnected is None:
+            return await future
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=poll_interval)
+            if done:
+                return future.result()
+            if disconnected():
+                future.cancel()
+                raise ClientDisconnected()
+
+    def close(self):
+        async def _close():
+            if self.session is not None:
+                await self.session.close()
+
+        self.submit(_close()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
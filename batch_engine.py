@@ -0,0 +1,104 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов (token bucket), общий для всех потоков"""
+
+    def __init__(self, rate, capacity=1):
+        # rate - токенов в секунду, capacity - допустимый всплеск
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        """Резервирует токен и возвращает, сколько секунд нужно подождать"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def set_rate(self, rate):
+        """Меняет частоту, накопленные токены сохраняются"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def acquire(self):
+        """Блокирует поток, пока не будет доступен токен"""
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+class BatchExecutor:
+    """Пул воркеров для пакетного парсинга с сохранением порядка результатов"""
+
+    def __init__(self, worker, max_workers=4):
+        self.worker = worker
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch')
+
+    def _call(self, item, kwargs):
+        try:
+            return self.worker(item, **kwargs)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'url': item
+            }
+
+    def submit_all(self, items, **kwargs):
+        """Отправляет все элементы в пул, возвращает futures в порядке входа"""
+        return [self.pool.submit(self._call, item, kwargs) for item in items]
+
+    def run(self, items, **kwargs):
+        """Выполняет пакет и возвращает результаты в порядке входных данных"""
+        return [future.result() for future in self.submit_all(items, **kwargs)]
+
+    def iter_completed(self, items, window=None, **kwargs):
+        """
+        Выдает пары (индекс, результат) по мере завершения задач.
+
+        Одновременно в пуле не больше window задач, поэтому память
+        не растет с размером пакета.
+        """
+        window = window or self.max_workers * 2
+        items = iter(enumerate(items))
+        pending = {}
+
+        def submit_next():
+            for index, item in items:
+                pending[self.pool.submit(self._call, item, kwargs)] = index
+                return True
+            return False
+
+        while len(pending) < window and submit_next():
+            pass
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    submit_next()
+                    yield index, future.result()
+        finally:
+            # Клиент отключился - не запускаем оставшиеся задачи
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,176 @@
+"""
+Корпус страниц для бенчмарков.
+
+    python bench/corpus.py record https://www.mos.ru/news/item/123456/ ...
+    python bench/corpus.py synthesize --count 10
+
+record сохраняет настоящие страницы mos.ru как <id>.html, synthesize
+генерирует страницы с разметкой в духе mos.ru (synthetic-<n>.html):
+шапка, меню, статья, теги, блоки "читайте также", большие inline-скрипты.
+Страницы split-<n>.html - раскладка, где дата, теги и часть изображений
+вынесены за <article>, а в шапке есть свой блок .content. Страницы
+portal-<n>.html - статья в тяжелой обвязке портала: мегаменю в шапке
+и карта сайта в подвале (около 500 КБ), как у настоящих страниц mos.ru.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+WORDS = (
+    'Москва мэр Собянин открыл новую станцию метро парк школа больница дорога '
+    'жители город район благоустройство программа реновация транспорт проект '
+    'строительство округ библиотека центр выставка фестиваль горожане'
+).split()
+
+
+def phrase(rnd, count=None):
+    return ' '.join(rnd.choice(WORDS) for _ in range(count or rnd.randint(8, 40)))
+
+
+def related_block(rnd, count):
+    items = ''.join(
+        f'<li><a href="/news/item/{rnd.randint(100000, 200000)}/">'
+        f'<img src="/upload/thumbs/{i}.jpg" alt=""><span>{phrase(rnd, 8)}</span></a></li>'
+        for i in range(count)
+    )
+    return f'<div class="related"><h2>Читайте также</h2><ul>{items}</ul></div>'
+
+
+def portal_menu(rnd, sections):
+    """Мегаменю и карта сайта портала: разделы со ссылками, иконками и описаниями"""
+    blocks = []
+    for section in range(sections):
+        links = ''.join(
+            f'<li class="menu__item"><a class="menu__link" href="/services/{section}/{i}/">'
+            f'<img class="menu__icon" src="/static/icons/{section}-{i}.svg" alt="">'
+            f'<span class="menu__title">{phrase(rnd, 3)}</span>'
+            f'<span class="menu__hint">{phrase(rnd, 12)}</span></a></li>'
+            for i in range(20)
+        )
+        blocks.append(f'<div class="menu__section"><div class="menu__caption">{phrase(rnd, 2)}</div>'
+                      f'<ul class="menu__list">{links}</ul></div>')
+    return ''.join(blocks)
+
+
+def synthetic_page(seed, heavy=False, split=False, portal=False):
+    """
+    Синтетическая страница новости в разметке, похожей на mos.ru;
+    split - дата, теги и галерея после </article>, промо .content в шапке;
+    portal - мегаменю в шапке и карта сайта в подвале
+    """
+    rnd = random.Random(seed)
+    paragraphs = []
+    for i in range(rnd.randint(4, 20)):
+        kind = rnd.random()
+        if kind < 0.6:
+            paragraphs.append(f'<p>{phrase(rnd)} <b>{phrase(rnd, 3)}</b>&nbsp;{phrase(rnd)}.</p>')
+        elif kind < 0.75:
+            paragraphs.append(f'<div class="news-article__text"><div><p>{phrase(rnd)}</p></div></div>')
+        elif kind < 0.85:
+            paragraphs.append(
+                f'<figure><img src="/upload/newsfeed/{seed}/{i}.jpg" alt="">'
+                f'<figcaption>{phrase(rnd, 6)}</figcaption></figure>'
+            )
+        elif kind < 0.9:
+            paragraphs.append(f'<p>Подписаться на {phrase(rnd, 4)} рассылку новостей</p>')
+        else:
+            paragraphs.append(f'<blockquote><p>{phrase(rnd)}</p></blockquote>')
+
+    tags = ' '.join(f'<a href="/news/tags/{i}/">{phrase(rnd, 2)}</a>' for i in range(rnd.randint(1, 5)))
+    state = '{"news":"' + 'x' * (rnd.randint(10000, 30000) * (5 if heavy else 1)) + '"}'
+    related = related_block(rnd, 300 if heavy else 20)
+    title = phrase(rnd, 6)
+    heading = phrase(rnd, 10)
+    date = f'2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}'
+    time_tag = f'<time datetime="{date}T10:00:00+03:00">{rnd.randint(1, 28)} мая</time>\n'
+    tags_block = f'<div class="tags">{tags}</div>\n'
+    promo = outside = ''
+    if split:
+        promo = f'<div class="content"><p>{phrase(rnd, 20)}</p></div>'
+        gallery = ''.join(f'<img src="/upload/gallery/{seed}/{i}.jpg" alt="">' for i in range(3))
+        outside = f'<div class="news-date">{date}</div>\n{tags_block}<div class="gallery">{gallery}</div>\n'
+        time_tag = tags_block = ''
+    menu = sitemap = ''
+    if portal:
+        menu = f'<nav class="megamenu">{portal_menu(rnd, 27)}</nav>'
+        sitemap = f'<nav class="sitemap">{portal_menu(rnd, 27)}</nav>'
+
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{title} - mos.ru</title>
+<style>{'.b{margin:0}' * (3000 if heavy else 200)}</style>
+<script>window.__INITIAL_STATE__={state}</script></head>
+<body>
+<header><nav class="menu"><a href="/">Главная</a> <a href="/news/">Новости</a> Поиск Войти</nav>
+<img src="/static/logo.svg" alt="mos.ru">{promo}{menu}</header>
+<main>
+<article class="news-article">
+<h1>{heading}</h1>
+{time_tag}<div class="content">{''.join(paragraphs)}</div>
+{tags_block}</article>
+{outside}{related}
+</main>
+<footer><p>{phrase(rnd, 60)}</p>{sitemap}</footer>
+</body></html>
+""".encode()
+
+
+def synthesize(count, heavy_every=5, split_count=2, portal_count=1, directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    pages = [(f'synthetic-{n:03d}.html', n, heavy_every and n % heavy_every == heavy_every - 1, False, False)
+             for n in range(count)]
+    pages += [(f'split-{n:03d}.html', count + n, False, True, False) for n in range(split_count)]
+    pages += [(f'portal-{n:03d}.html', count + split_count + n, False, False, True) for n in range(portal_count)]
+    for name, seed, heavy, split, portal in pages:
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(synthetic_page(seed, heavy=heavy, split=split, portal=portal))
+        print(path)
+
+
+def record(urls, delay=2.0, directory=FIXTURES_DIR):
+    import requests
+
+    os.makedirs(directory, exist_ok=True)
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    for url in urls:
+        match = re.search(r'/news/item/(\d+)', url)
+        if not match:
+            print(f"Skipping {url}: not a news item", file=sys.stderr)
+            continue
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code != 200:
+            print(f"Skipping {url}: HTTP {response.status_code}", file=sys.stderr)
+            continue
+        path = os.path.join(directory, f'{match.group(1)}.html')
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        print(path)
+        time.sleep(delay)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the benchmark page corpus')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='Save live mos.ru news pages')
+    record_parser.add_argument('urls', nargs='+')
+    record_parser.add_argument('--delay', type=float, default=2.0, help='Pause between requests, seconds')
+    record_parser.add_argument('--dir', default=FIXTURES_DIR)
+
+    synth_parser = commands.add_parser('synthesize', help='Generate synthetic mos.ru-like pages')
+    synth_parser.add_argument('--count', type=int, default=10)
+    synth_parser.add_argument('--heavy-every', type=int, default=5, help='Every N-th page is heavy')
+    synth_parser.add_argument('--split', type=int, default=2, help='Pages with date and tags outside <article>')
+    synth_parser.add_argument('--portal', type=int, default=1, help='Pages with a heavy portal header and footer')
+    synth_parser.add_argument('--dir', default=FIXTURES_DIR)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.urls, args.delay, args.dir)
+    else:
+        synthesize(args.count, args.heavy_every, args.split, args.portal, args.dir)
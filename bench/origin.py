@@ -0,0 +1,145 @@
+"""
+Локальный стенд вместо www.mos.ru для бенчмарков.
+
+Отдает страницы из bench/fixtures по адресам /news/item/<id>/ (страница
+выбирается по id по кругу), с настраиваемой задержкой, долей ответов 429
+и долей ошибок 500. Поддерживает ETag/If-None-Match.
+
+    python bench/origin.py --port 8765 --latency 0.2 --jitter 0.05 --rate-429 0.05
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ITEM_RE = re.compile(r'^/news/item/(\d+)/?$')
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Страницы корпуса в порядке имен файлов"""
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages.append(f.read())
+    if not pages:
+        raise RuntimeError(f"No fixtures found in {directory}")
+    return pages
+
+
+class OriginStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'ok': 0, 'not_modified': 0, 'rate_limited': 0, 'errors': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+def make_handler(pages, latency=0.0, jitter=0.0, rate_429=0.0, rate_error=0.0, retry_after=1, stats=None):
+    etags = ['"' + hashlib.sha1(page).hexdigest() + '"' for page in pages]
+
+    class OriginHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            match = ITEM_RE.match(self.path.split('?')[0])
+            if not match:
+                self.send_error(404)
+                return
+
+            delay = latency + random.uniform(-jitter, jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            roll = random.random()
+            if roll < rate_429:
+                stats.count('rate_limited')
+                self._send(429, b'Too Many Requests', {'Retry-After': str(retry_after)})
+                return
+            if roll < rate_429 + rate_error:
+                stats.count('errors')
+                self._send(500, b'Internal Server Error')
+                return
+
+            index = int(match.group(1)) % len(pages)
+            if self.headers.get('If-None-Match') == etags[index]:
+                stats.count('not_modified')
+                self._send(304, b'', {'ETag': etags[index]})
+                return
+
+            stats.count('ok')
+            self._send(200, pages[index], {
+                'Content-Type': 'text/html; charset=utf-8',
+                'ETag': etags[index]
+            })
+
+        def _send(self, status, body, headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return OriginHandler
+
+
+def start_origin(host='127.0.0.1', port=0, fixtures_dir=FIXTURES_DIR, **options):
+    """Запускает стенд в фоновом потоке, возвращает (сервер, статистика)"""
+    stats = OriginStats()
+    handler = make_handler(load_fixtures(fixtures_dir), stats=stats, **options)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='bench-origin', daemon=True).start()
+    return server, stats
+
+
+def add_origin_arguments(parser):
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Directory with *.html pages')
+    parser.add_argument('--latency', type=float, default=0.1, help='Base response latency, seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latency jitter, seconds')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Share of 429 responses')
+    parser.add_argument('--rate-error', type=float, default=0.0, help='Share of 500 responses')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After for 429, seconds')
+
+
+def origin_options(args):
+    return {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'rate_429': args.rate_429,
+        'rate_error': args.rate_error,
+        'retry_after': args.retry_after
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake mos.ru origin for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_origin_arguments(parser)
+    args = parser.parse_args()
+
+    server, stats = start_origin(args.host, args.port, args.fixtures, **origin_options(args))
+    print(f"Fake origin on http://{args.host}:{server.server_port}/news/item/<id>/")
+    try:
+        while True:
+            time.sleep(10)
+            print(stats.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,419 @@
+"""
+Бенчмарк парсера на сохраненном корпусе и локальном стенде вместо mos.ru.
+
+Замеряет:
+  - CPU на извлечение одной статьи для каждого бэкенда (bs4/lxml,
+    bs4 - с выборочным разбором и без);
+  - стоимость компиляции правил извлечения и извлечение с планом,
+    собранным заранее, против плана, собираемого на каждый вызов;
+  - задержку /parse и /batch (p50/p90/p99) и пропускную способность
+    при N одновременных клиентах;
+  - пиковую память (VmHWM) процесса сервиса, а под gunicorn - суммарные
+    RSS и PSS мастера и воркеров (PSS меньше RSS на общие страницы);
+  - с --check-drain: что запросы, начатые до SIGTERM, завершаются успешно.
+
+    python bench/run.py --output results.json
+    python bench/run.py --target main --clients 8 --compare baseline.json
+    python bench/run.py --target gunicorn --latency 1 --check-drain
+
+Сервис запускается отдельным процессом с MOSRU_ORIGIN, указывающим
+на стенд, и снятым лимитом частоты запросов.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from origin import add_origin_arguments, load_fixtures, origin_options, start_origin  # noqa: E402
+
+# Сервисы репозитория: файл и наличие /batch
+TARGETS = {
+    'api': ('flask_api_parser.py', True),
+    'main': ('main.py', True),
+    'app': ('app.py', True),
+    'gunicorn': ('gunicorn.conf.py', True)
+}
+
+# Метрики, для которых регрессия - рост значения, и для которых - падение
+LOWER_IS_BETTER = ('_ms', 'rss_kb', 'pss_kb', 'alloc_kb')
+HIGHER_IS_BETTER = ('_rps', '_per_s')
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+
+    def pick(q):
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.mean(values) * 1000, 3),
+        'p50_ms': round(pick(0.5) * 1000, 3),
+        'p90_ms': round(pick(0.9) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3)
+    }
+
+
+def bench_extraction(pages, repeat):
+    """CPU-время и пик выделенной памяти на извлечение одной статьи, сверка полей с bs4"""
+    from extractors import EXTRACTORS, get_extractor
+
+    reference = [get_extractor('bs4', selective=False).extract(page) for page in pages]
+    results = {}
+    for backend in ('bs4', 'lxml'):
+        for selective in (False, True) if EXTRACTORS[backend].supports_selective else (False,):
+            extractor = get_extractor(backend, selective=selective)
+            timings = []
+            mismatches = 0
+            peak = 0
+            for index, page in enumerate(pages):
+                tracemalloc.start()
+                if extractor.extract(page) != reference[index]:
+                    mismatches += 1
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                for _ in range(repeat):
+                    started = time.process_time()
+                    extractor.extract(page)
+                    timings.append(time.process_time() - started)
+
+            name = f"{backend}{'-selective' if selective else ''}"
+            results[name] = dict(percentiles(timings), mismatches=mismatches, peak_alloc_kb=peak // 1024)
+            print(f"extract {name}: p50 {results[name]['p50_ms']} ms, peak {peak // 1024} KiB, "
+                  f"mismatches {mismatches}")
+
+    results['harness_max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def bench_rules(pages, repeat):
+    """Компиляция правил извлечения: отдельно и в составе каждого вызова"""
+    from extractors import DEFAULT_RULES, ExtractionRules, get_extractor
+
+    compile_timings = []
+    for _ in range(repeat * len(pages)):
+        started = time.process_time()
+        ExtractionRules(DEFAULT_RULES)
+        compile_timings.append(time.process_time() - started)
+    results = {'compile': percentiles(compile_timings)}
+    print(f"rules compile: p50 {results['compile']['p50_ms']} ms")
+
+    for backend in ('bs4', 'lxml'):
+        compiled = get_extractor(backend, selective=True, rules=ExtractionRules(DEFAULT_RULES))
+        timings = {'precompiled': [], 'per_call': []}
+        for page in pages:
+            for _ in range(repeat):
+                started = time.process_time()
+                compiled.extract(page)
+                timings['precompiled'].append(time.process_time() - started)
+                started = time.process_time()
+                get_extractor(backend, selective=True, rules=ExtractionRules(DEFAULT_RULES)).extract(page)
+                timings['per_call'].append(time.process_time() - started)
+        for mode, values in timings.items():
+            results[f'{backend}_{mode}'] = percentiles(values)
+        print(f"rules {backend}: p50 {results[backend + '_precompiled']['p50_ms']} ms precompiled, "
+              f"{results[backend + '_per_call']['p50_ms']} ms compiled per call")
+    return results
+
+
+def peak_rss_kb(pid):
+    """Пиковый RSS процесса из /proc (только Linux)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid):
+    """PID процесса и всех его потомков (только Linux)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def tree_memory_kb(pid):
+    """Суммарные RSS и PSS процесса с потомками из /proc/<pid>/smaps_rollup"""
+    totals = {'processes': 0, 'rss_kb': 0, 'pss_kb': 0}
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/smaps_rollup') as f:
+                for line in f:
+                    name, value = line.split(':', 1) if ':' in line else (None, None)
+                    if name in ('Rss', 'Pss'):
+                        totals[name.lower() + '_kb'] += int(value.split()[0])
+        except OSError:
+            continue
+        totals['processes'] += 1
+    return totals if totals['processes'] else None
+
+
+def start_service(target, port, origin_url, env_overrides):
+    script, _ = TARGETS[target]
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'MOSRU_ORIGIN': origin_url,
+        # Лимит частоты защищает настоящий mos.ru, на стенде он не нужен
+        'MOSRU_RATE': '100000',
+        'MOSRU_BURST': '100000',
+        'GUNICORN_ACCESS_LOG': ''
+    })
+    env.update(env_overrides)
+    if script == 'gunicorn.conf.py':
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT_DIR, script)]
+    else:
+        command = [sys.executable, os.path.join(ROOT_DIR, script)]
+    process = subprocess.Popen(
+        command,
+        cwd=ROOT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{script} exited with code {process.returncode}")
+        try:
+            if requests.get(base_url + '/health', timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{script} did not become healthy in time")
+
+
+class ItemIds:
+    """Уникальные id новостей, чтобы запросы не попадали в кэш сервиса"""
+
+    def __init__(self, start):
+        self.next_id = start
+
+    def take(self, count):
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+
+def run_clients(clients, jobs, send):
+    """Выполняет jobs в clients потоках, возвращает задержки, ошибки и длительность"""
+    local = threading.local()
+
+    def call(job):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            ok = send(local.session, job)
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(call, jobs))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    return latencies, errors, elapsed
+
+
+def bench_service(args, origin_url):
+    script, has_batch = TARGETS[args.target]
+    env_overrides = dict(item.split('=', 1) for item in args.env)
+    process, base_url = start_service(args.target, args.service_port, origin_url, env_overrides)
+    ids = ItemIds(args.first_id)
+
+    def item_url(item_id):
+        return f'https://www.mos.ru/news/item/{item_id}/'
+
+    def send_parse(session, item_id):
+        response = session.post(base_url + '/parse', json={'url': item_url(item_id)}, timeout=120)
+        return response.status_code == 200 and response.json().get('success')
+
+    def send_batch(session, batch):
+        response = session.post(base_url + '/batch', json={'urls': [item_url(i) for i in batch]}, timeout=300)
+        return response.status_code == 200 and response.json().get('successful') == len(batch)
+
+    results = {'target': args.target, 'script': script}
+    try:
+        # Прогрев: импорт модулей, первые соединения
+        run_clients(1, ids.take(3), send_parse)
+
+        for clients in args.clients:
+            latencies, errors, elapsed = run_clients(clients, ids.take(args.requests), send_parse)
+            results[f'parse_c{clients}'] = dict(
+                percentiles(latencies),
+                errors=errors,
+                throughput_rps=round(args.requests / elapsed, 2)
+            )
+            print(f"/parse x{clients}: p50 {results[f'parse_c{clients}'].get('p50_ms')} ms, "
+                  f"{results[f'parse_c{clients}']['throughput_rps']} rps, {errors} errors")
+
+        if has_batch:
+            batches = [ids.take(args.batch_size) for _ in range(args.batches)]
+            latencies, errors, elapsed = run_clients(1, batches, send_batch)
+            results['batch'] = dict(
+                percentiles(latencies),
+                errors=errors,
+                batch_size=args.batch_size,
+                throughput_articles_per_s=round(args.batches * args.batch_size / elapsed, 2)
+            )
+            print(f"/batch x{args.batch_size}: p50 {results['batch'].get('p50_ms')} ms, "
+                  f"{results['batch']['throughput_articles_per_s']} articles/s")
+
+        results['service_peak_rss_kb'] = peak_rss_kb(process.pid)
+        if args.target == 'gunicorn':
+            results['service_memory'] = tree_memory_kb(process.pid)
+
+        if args.check_drain:
+            results['drain'] = check_drain(process, ids.take(args.drain_requests), send_parse)
+            print(f"Drain: {results['drain']['completed']} of {results['drain']['requests']} "
+                  f"in-flight requests completed after SIGTERM")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+def check_drain(process, jobs, send, delay=0.3):
+    """Отправляет запросы, через delay секунд - SIGTERM; начатые запросы должны завершиться"""
+    outcome = {}
+
+    def run():
+        outcome['latencies'], outcome['errors'], _ = run_clients(len(jobs), jobs, send)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(delay)
+    process.send_signal(signal.SIGTERM)
+    thread.join()
+    return {
+        'requests': len(jobs),
+        'completed': len(outcome['latencies']),
+        'errors': outcome['errors'],
+        'exit_code': process.wait(timeout=120)
+    }
+
+
+def flatten(data, prefix=''):
+    flat = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline_path, threshold):
+    """Сравнение с сохраненным прогоном, возвращает список регрессий"""
+    with open(baseline_path) as f:
+        baseline = flatten(json.load(f)['results'])
+    regressions = []
+    for name, value in sorted(flatten(current).items()):
+        old = baseline.get(name)
+        if not old or not name.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER):
+            continue
+        change = (value - old) / old
+        worse = change > threshold if name.endswith(LOWER_IS_BETTER) else change < -threshold
+        marker = 'REGRESSION' if worse else ''
+        print(f"{name:50} {old:>12} -> {value:>12} ({change:+.1%}) {marker}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extraction and the parsing service')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='api', help='Service to benchmark')
+    parser.add_argument('--skip-extraction', action='store_true')
+    parser.add_argument('--skip-service', action='store_true')
+    parser.add_argument('--repeat', type=int, default=5, help='Extraction repeats per page')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=50, help='/parse requests per client level')
+    parser.add_argument('--batches', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--first-id', type=int, default=int(time.time()), help='First news id, unique per run')
+    parser.add_argument('--service-port', type=int, default=5099)
+    parser.add_argument('--origin-port', type=int, default=0)
+    parser.add_argument('--env', action='append', default=[], help='Extra service env, NAME=value')
+    parser.add_argument('--check-drain', action='store_true',
+                        help='Send SIGTERM with requests in flight and count completed ones')
+    parser.add_argument('--drain-requests', type=int, default=16)
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change counted as regression')
+    add_origin_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    if not args.skip_extraction:
+        pages = load_fixtures(args.fixtures)
+        results['extraction'] = bench_extraction(pages, args.repeat)
+        results['rules'] = bench_rules(pages, args.repeat)
+
+    if not args.skip_service:
+        server, stats = start_origin(port=args.origin_port, fixtures_dir=args.fixtures, **origin_options(args))
+        try:
+            results['service'] = bench_service(args, f'http://127.0.0.1:{server.server_port}')
+            results['origin'] = stats.snapshot()
+        finally:
+            server.shutdown()
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from rate_control import AdaptiveRateLimiter
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS rate_limits ('
+    'name TEXT PRIMARY KEY, rate REAL NOT NULL, capacity REAL NOT NULL, tokens REAL NOT NULL, '
+    'updated_at REAL NOT NULL, paused_until REAL NOT NULL DEFAULT 0, last_decrease REAL NOT NULL DEFAULT 0)',
+    'CREATE TABLE IF NOT EXISTS leases ('
+    'name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS instances ('
+    'instance_id TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)',
+]
+
+
+class Coordinator:
+    """
+    Общий файл SQLite для нескольких экземпляров сервиса.
+
+    Через него экземпляры (и воркеры gunicorn в них) делят бюджет запросов
+    к mos.ru (SharedRateLimiter), берут аренды (одну новость загружает один
+    экземпляр, фоновую загрузку ведет один экземпляр) и отмечают, что живы:
+    по этим отметкам очередь заданий возвращает URL упавших экземпляров.
+
+    Экземпляр - процесс: instance_id - префикс (по умолчанию имя хоста)
+    и PID. Файл должен лежать на диске с рабочими блокировками (локальный
+    диск или общий том контейнеров на одном хосте, не NFS).
+    """
+
+    def __init__(self, path, instance=None, lease_ttl=60, heartbeat_ttl=30, poll_interval=0.1):
+        self.path = path
+        self.instance = instance or socket.gethostname()
+        self.lease_ttl = lease_ttl
+        self.heartbeat_ttl = heartbeat_ttl
+        self.poll_interval = poll_interval
+        self.connect = LocalConnection(path)
+        self.stopped = threading.Event()
+        self.thread = None
+        # Аренды, которые продлевает фоновый поток, пока их не освободят: имя -> срок
+        self.held = {}
+        self.held_lock = threading.Lock()
+        with self.connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def start(self):
+        """Фоновые отметки, что экземпляр жив, и продление аренд (после fork - в каждом воркере)"""
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='coordination-heartbeat', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        try:
+            with self.connect() as conn:
+                conn.execute('DELETE FROM instances WHERE instance_id = ?', (self.instance_id,))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to unregister instance: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                self.heartbeat()
+                self.renew()
+            except sqlite3.Error as e:
+                logger.error(f"Coordination heartbeat failed: {e}")
+            if self.stopped.wait(min(self.heartbeat_ttl, self.lease_ttl) / 3):
+                return
+
+    @property
+    def instance_id(self):
+        # PID берется при обращении: после fork у каждого воркера свой ID
+        return f'{self.instance}-{os.getpid()}'
+
+    def acquire(self, name, ttl=None, renew=False):
+        """
+        Аренда name на ttl секунд (продление, если она уже наша); False - ее
+        держит другой экземпляр. Аренды переставших отмечаться экземпляров
+        не ждут истечения срока.
+
+        renew=True - аренду продлевает фоновый поток (start()), пока ее
+        не освободят release(): загрузка с повторами и паузами может идти
+        дольше срока аренды, и другой экземпляр не должен ее перехватить.
+        """
+        now = time.time()
+        ttl = ttl or self.lease_ttl
+        with self.connect() as conn:
+            row = conn.execute(
+                'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.expires_at < ? OR leases.owner = excluded.owner OR leases.owner NOT IN ('
+                'SELECT instance_id FROM instances WHERE heartbeat_at >= ?) RETURNING owner',
+                (name, self.instance_id, now + ttl, now, now - self.heartbeat_ttl)
+            ).fetchone()
+        if row is not None and renew:
+            with self.held_lock:
+                self.held[name] = ttl
+        return row is not None
+
+    def release(self, name):
+        with self.held_lock:
+            self.held.pop(name, None)
+        with self.connect() as conn:
+            conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.instance_id))
+
+    def renew(self):
+        """Продлевает аренды, взятые с renew=True"""
+        with self.held_lock:
+            held = list(self.held.items())
+        if not held:
+            return
+        now = time.time()
+        with self.connect() as conn:
+            conn.executemany('UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?',
+                             [(now + ttl, name, self.instance_id) for name, ttl in held])
+
+    def heartbeat(self):
+        """Отметка, что экземпляр жив; давно не отмечавшиеся удаляются"""
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT INTO instances (instance_id, heartbeat_at) VALUES (?, ?) '
+                'ON CONFLICT (instance_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at',
+                (self.instance_id, now)
+            )
+            conn.execute('DELETE FROM instances WHERE heartbeat_at < ?', (now - self.heartbeat_ttl * 10,))
+
+    def live_instances(self):
+        """ID экземпляров, отмечавшихся за последние heartbeat_ttl секунд"""
+        rows = self.connect().execute(
+            'SELECT instance_id FROM instances WHERE heartbeat_at >= ?', (time.time() - self.heartbeat_ttl,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_stats(self):
+        conn = self.connect()
+        return {
+            'path': self.path,
+            'instance_id': self.instance_id,
+            'live_instances': len(self.live_instances()),
+            'leases': conn.execute('SELECT COUNT(*) FROM leases WHERE expires_at >= ?', (time.time(),)).fetchone()[0]
+        }
+
+
+class SharedTokenBucket:
+    """
+    Token bucket в файле координации: один бюджет запросов на все экземпляры.
+
+    Каждая операция - один UPDATE, поэтому экземпляры не мешают друг другу
+    и не могут потратить токен дважды. Время - по часам системы (time.time),
+    общим для процессов одного хоста. Там же хранятся общая пауза после 429
+    и время последнего снижения частоты.
+    """
+
+    # Пополнение на время с прошлого обращения; updated_at не уходит назад
+    REFILL = 'min(capacity, tokens + max(0, :now - updated_at) * rate)'
+
+    def __init__(self, coordinator, name, rate, capacity=1):
+        self.coordinator = coordinator
+        self.name = name
+        self.capacity = float(capacity)
+        with coordinator.connect() as conn:
+            # Текущая частота сохраняется, если она ниже настроенной (идет снижение после 429)
+            conn.execute(
+                'INSERT INTO rate_limits (name, rate, capacity, tokens, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET capacity = excluded.capacity, '
+                'rate = min(rate, excluded.rate), tokens = min(tokens, excluded.capacity)',
+                (name, float(rate), self.capacity, self.capacity, time.time())
+            )
+
+    def _update(self, assignments='', condition='', tokens=REFILL, **params):
+        # Выражения в SET видят значения до UPDATE, RETURNING - после
+        with self.coordinator.connect() as conn:
+            return conn.execute(
+                f'UPDATE rate_limits SET tokens = {tokens}, updated_at = max(updated_at, :now)'
+                f'{assignments} WHERE name = :name {condition} RETURNING tokens, rate, paused_until',
+                {'now': time.time(), 'name': self.name, **params}
+            ).fetchone()
+
+    @property
+    def rate(self):
+        return self.coordinator.connect().execute(
+            'SELECT rate FROM rate_limits WHERE name = ?', (self.name,)
+        ).fetchone()[0]
+
+    def reserve(self):
+        """Резервирует токен и возвращает, сколько секунд подождать (с учетом общей паузы)"""
+        now = time.time()
+        tokens, rate, paused_until = self._update(tokens=self.REFILL + ' - 1', now=now)
+        return max(0.0, paused_until - now) + (-tokens / rate if tokens < 0 else 0.0)
+
+    def set_rate(self, rate):
+        self._update(', rate = :rate', rate=float(rate))
+
+    def decrease(self, factor, min_rate):
+        """Снижает частоту, если ее не снижали последнюю секунду; True - снизил этот вызов"""
+        return self._update(', rate = max(:min_rate, rate * :factor), last_decrease = :now',
+                            'AND :now - last_decrease >= 1.0', factor=factor, min_rate=min_rate) is not None
+
+    def increase(self, step, max_rate):
+        return self._update(', rate = min(:max_rate, rate + :step)', 'AND rate < :max_rate',
+                            step=step, max_rate=max_rate) is not None
+
+    def pause(self, seconds):
+        self._update(', paused_until = max(paused_until, :now + :seconds)', seconds=seconds)
+
+    def paused_for(self):
+        paused_until = self.coordinator.connect().execute(
+            'SELECT paused_until FROM rate_limits WHERE name = ?', (self.name,)
+        ).fetchone()[0]
+        return max(0.0, paused_until - time.time())
+
+
+class SharedRateLimiter(AdaptiveRateLimiter):
+    """
+    AdaptiveRateLimiter с общими для всех экземпляров частотой, паузой
+    после 429 и их снижением/ростом (SharedTokenBucket): max_rate - бюджет
+    всего сервиса, а не одного процесса, и ответ 429 одному экземпляру
+    притормаживает все. Автомат размыкается в каждом процессе по его
+    собственным отказам подряд.
+    """
+
+    blocking = True
+
+    def __init__(self, coordinator, max_rate, capacity=1, name='mosru', **kwargs):
+        super().__init__(max_rate, capacity,
+                         bucket=SharedTokenBucket(coordinator, name, max_rate, capacity), **kwargs)
+
+    def reserve_slot(self):
+        return self.bucket.reserve()
+
+    def _paused_for(self, now):
+        return self.bucket.paused_for()
+
+    def _pause(self, now, seconds):
+        self.bucket.pause(seconds)
+
+    def _decrease(self, now):
+        return self.bucket.decrease(self.decrease, self.min_rate)
+
+    def _increase(self):
+        return self.bucket.increase(self.increase, self.max_rate)
+
+    def get_state(self):
+        return {**super().get_state(), 'shared': True}
@@ -0,0 +1,726 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import soupsieve
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+# Селекторы и фильтры, общие для всех бэкендов (правила по умолчанию, см. ExtractionRules)
+TITLE_SELECTORS = ['h1', 'title']
+UNWANTED_SELECTOR = 'script, style, nav, footer, header, .navigation, .menu'
+CONTENT_SELECTOR = 'article, .content, .news-content, main, [role="main"]'
+DATE_SELECTORS = ['[datetime]', '.news-date', '.date', '[data-test="news-date"]']
+TAG_SELECTORS = ['.tags a', '.categories a', '[data-test="tags"] a']
+SKIP_WORDS = ['меню', 'навигация', 'войти', 'поиск', 'подписаться', 'cookies']
+# Элементы, на границах которых делится текст основного контента
+BLOCK_TAGS = frozenset(['p', 'div'])
+# Пустые элементы HTML: у них нет закрывающего тега
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                       'source', 'track', 'wbr'])
+MIN_CONTENT_LENGTH = 30
+MIN_FALLBACK_LENGTH = 50
+MIN_TITLE_LENGTH = 5
+BASE_URL = 'https://www.mos.ru'
+# Поля статьи, которые извлекает бэкенд, и производные поля ответа с полем-источником
+EXTRACT_FIELDS = ('title', 'content', 'date', 'images', 'tags')
+DERIVED_FIELDS = {'content_length': 'content', 'images_count': 'images'}
+ARTICLE_FIELDS = EXTRACT_FIELDS + tuple(DERIVED_FIELDS)
+
+
+def compile_skip_pattern(words):
+    """Одно регулярное выражение вместо проверки каждого слова по отдельности"""
+    if not words:
+        # Пустой список - ничего не отсеивается
+        return re.compile(r'(?!)')
+    return re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def required_fields(fields):
+    """Поля для извлечения под запрошенный набор полей ответа (None - все)"""
+    if fields is None:
+        return None
+    return frozenset(DERIVED_FIELDS.get(name, name) for name in fields)
+
+
+def project_fields(result, fields):
+    """Ответ без полей статьи, которые не запрошены; служебные поля остаются"""
+    if fields is None:
+        return result
+    return {key: value for key, value in result.items() if key not in ARTICLE_FIELDS or key in fields}
+
+
+def empty_fields(fields):
+    data = {'title': '', 'content': '', 'date': '', 'images': [], 'tags': []}
+    if fields is None:
+        return data
+    return {name: value for name, value in data.items() if name in fields}
+
+SIMPLE_SELECTOR_RE = re.compile(r'^(?P<tag>[a-z][a-z0-9]*)?(?P<classes>(?:\.[\w-]+)*)(?P<attrs>(?:\[[^\]]+\])*)$', re.I)
+ATTR_SELECTOR_RE = re.compile(r'\[\s*([\w-]+)\s*(?:=\s*["\']?([^"\'\]]*)["\']?\s*)?\]')
+
+
+class RegionMatcher:
+    """
+    Определяет по имени и атрибутам тега, нужен ли он селекторам.
+
+    Для селектора "X a" материализуется поддерево X целиком. Поддерживаются
+    простые селекторы вида tag, .class, [attr], [attr="value"] и их сочетания.
+    """
+
+    def __init__(self, selectors):
+        self.rules = []
+        for group in selectors:
+            for selector in group.split(','):
+                match = SIMPLE_SELECTOR_RE.match(selector.split()[0])
+                if not match:
+                    raise ValueError(f"Unsupported selector for selective parsing: {selector}")
+                tag = match.group('tag')
+                classes = set(c for c in match.group('classes').split('.') if c)
+                attrs = ATTR_SELECTOR_RE.findall(match.group('attrs'))
+                self.rules.append((tag.lower() if tag else None, classes, attrs))
+
+    def matches(self, name, attrs):
+        for tag, classes, required in self.rules:
+            if tag and tag != name:
+                continue
+            if classes:
+                class_value = attrs.get('class') or ''
+                if isinstance(class_value, list):
+                    class_value = ' '.join(class_value)
+                if not classes.issubset(class_value.split()):
+                    continue
+            if all(attrs.get(attr) is not None and (not value or attrs.get(attr) == value)
+                   for attr, value in required):
+                return True
+        return False
+
+
+# Правила по умолчанию; файл правил переопределяет их по ключам
+DEFAULT_RULES = {
+    'title': TITLE_SELECTORS,
+    'unwanted': UNWANTED_SELECTOR,
+    'content': CONTENT_SELECTOR,
+    'date': DATE_SELECTORS,
+    'tags': TAG_SELECTORS,
+    'skip_words': SKIP_WORDS,
+    'block_tags': sorted(BLOCK_TAGS),
+    'min_content_length': MIN_CONTENT_LENGTH,
+    'min_fallback_length': MIN_FALLBACK_LENGTH,
+    'min_title_length': MIN_TITLE_LENGTH,
+    'base_url': BASE_URL
+}
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extraction_rules.json')
+
+
+class ExtractionRules:
+    """
+    План извлечения, скомпилированный из правил один раз: селекторы
+    soupsieve для bs4, выражение стоп-слов и отбор регионов. Селекторы
+    lxml компилирует LxmlExtractor - по одному набору на поток и план.
+
+    Неизвестный ключ, неверный тип (в том числе элемента списка) или
+    селектор - ValueError.
+    """
+
+    def __init__(self, rules=None):
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        unknown = set(rules) - set(DEFAULT_RULES)
+        if unknown:
+            raise ValueError(f"Unknown extraction rules: {', '.join(sorted(unknown))}")
+        for key, default in DEFAULT_RULES.items():
+            if not isinstance(rules[key], type(default)):
+                raise ValueError(f"Extraction rule {key} must be {type(default).__name__}")
+            if isinstance(default, list) and not all(isinstance(item, str) for item in rules[key]):
+                raise ValueError(f"Extraction rule {key} must be a list of strings")
+        self.rules = rules
+        self.title = list(rules['title'])
+        self.unwanted = rules['unwanted']
+        self.content = rules['content']
+        self.date = list(rules['date'])
+        self.tags = list(rules['tags'])
+        self.skip_re = compile_skip_pattern(rules['skip_words'])
+        self.block_tags = frozenset(rules['block_tags'])
+        self.min_content_length = rules['min_content_length']
+        self.min_fallback_length = rules['min_fallback_length']
+        self.min_title_length = rules['min_title_length']
+        self.base_url = rules['base_url']
+        # Выборочный разбор: регионы полей и все изображения; ненужные блоки
+        # пропускаются целиком, кроме кандидатов в заголовок внутри них.
+        # Отбор регионов понимает только простые селекторы; с другими план
+        # применяется без выборочного разбора и остановки загрузки после статьи
+        try:
+            self.region_matcher = RegionMatcher(self.title + [self.content] + self.date + self.tags + ['img'])
+            self.title_matcher = RegionMatcher(self.title)
+            # Селектор с потомками ("aside nav") отбирал бы больше, чем нужно, - такие
+            # блоки строятся и удаляются после разбора
+            self.unwanted_matcher = RegionMatcher([selector for selector in self.unwanted.split(',')
+                                                   if len(selector.split()) == 1])
+        except ValueError as e:
+            logger.warning(f"Region parsing is disabled for these extraction rules: {e}")
+            self.region_matcher = self.title_matcher = self.unwanted_matcher = None
+        try:
+            self.soup = {
+                'title': [soupsieve.compile(selector) for selector in self.title],
+                'unwanted': soupsieve.compile(self.unwanted),
+                'content': soupsieve.compile(self.content),
+                'date': [soupsieve.compile(selector) for selector in self.date],
+                'tags': [soupsieve.compile(selector) for selector in self.tags]
+            }
+        except soupsieve.SelectorSyntaxError as e:
+            raise ValueError(f"Invalid selector in extraction rules: {e}") from e
+        self.version = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:12]
+
+    def current(self):
+        return self
+
+    def get_stats(self):
+        return {'path': None, 'version': self.version, 'region_parsing': self.region_matcher is not None}
+
+
+class RulesFile:
+    """
+    Правила извлечения из JSON-файла с перезагрузкой при изменении.
+
+    current() возвращает скомпилированный план; время изменения файла
+    проверяется не чаще раза в check_interval секунд. Файл с ошибкой
+    не применяется - остается прежний план, ошибка видна в get_stats().
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.rules = ExtractionRules()
+        self.mtime = None
+        self.checked = 0.0
+        self.reloads = 0
+        self.error = None
+        self.reload()
+
+    def reload(self):
+        """Перечитывает файл, если он изменился; True - план обновлен"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            if self.mtime is None and self.error is None:
+                logger.warning(f"Extraction rules file is not available, using defaults: {e}")
+                self.error = str(e)
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                rules = ExtractionRules(json.load(f))
+        except Exception as e:
+            # Любая ошибка сборки плана оставляет прежний план
+            logger.error(f"Invalid extraction rules in {self.path}, keeping version {self.rules.version}: {e}")
+            self.error = str(e)
+            return False
+        if rules.version != self.rules.version:
+            logger.info(f"Extraction rules loaded from {self.path}: version {rules.version}")
+            self.reloads += 1
+        self.rules = rules
+        self.error = None
+        return True
+
+    def current(self):
+        now = time.monotonic()
+        if now - self.checked >= self.check_interval:
+            with self.lock:
+                if now - self.checked >= self.check_interval:
+                    self.checked = now
+                    self.reload()
+        return self.rules
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'version': self.rules.version,
+            'region_parsing': self.rules.region_matcher is not None,
+            'reloads': self.reloads,
+            'error': self.error
+        }
+
+
+_default_rules = None
+_default_rules_lock = threading.Lock()
+
+
+def default_rules():
+    """
+    Правила процесса: файл EXTRACTION_RULES (по умолчанию extraction_rules.json
+    рядом с модулем), пустое значение - встроенные правила без файла.
+    """
+    global _default_rules
+    with _default_rules_lock:
+        if _default_rules is None:
+            path = os.environ.get('EXTRACTION_RULES', RULES_PATH)
+            interval = float(os.environ.get('EXTRACTION_RULES_CHECK_INTERVAL', 5))
+            _default_rules = RulesFile(path, interval) if path else ExtractionRules()
+        return _default_rules
+
+
+class RegionStrainer:
+    """
+    parse_only для BeautifulSoup: в дерево попадают только регионы статьи.
+
+    Ненужные блоки (шапка, меню, подвал) не строятся вовсе: пока открыт
+    такой блок, отклоняется каждый тег внутри него, кроме кандидатов
+    в заголовок - заголовок, как и при полном разборе, ищется до удаления
+    ненужных блоков. Конец блока отслеживает RegionSoup по закрывающим
+    тегам (глубина считается по тегам с именем блока).
+
+    Поддерживает интерфейс bs4 < 4.13 (search_tag/search) и >= 4.13
+    (allow_tag_creation/allow_string_creation).
+    """
+
+    text = None
+    excludes_everything = False
+
+    def __init__(self, rules):
+        self.matcher = rules.region_matcher
+        self.title = rules.title_matcher
+        self.unwanted = rules.unwanted_matcher
+        # Открытый ненужный блок: [тег, глубина]
+        self.skipped = None
+        # Заголовок из ненужного блока: RegionSoup запоминает его, чтобы удалить после извлечения заголовка
+        self.in_unwanted = False
+
+    def search_tag(self, name, attrs):
+        return self.allow_tag_creation(None, name, attrs)
+
+    def search(self, markup):
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        attrs = attrs or {}
+        void = name in VOID_TAGS
+        self.in_unwanted = False
+        if self.skipped is not None:
+            if self.title.matches(name, attrs):
+                self.in_unwanted = True
+                return True
+            if name == self.skipped[0] and not void:
+                self.skipped[1] += 1
+            return False
+        if self.unwanted.matches(name, attrs):
+            if self.title.matches(name, attrs):
+                # Построенный элемент удалит отбор ненужных блоков
+                return True
+            if not void:
+                self.skipped = [name, 1]
+            return False
+        return self.matcher.matches(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    def close_tag(self, name):
+        """Закрывающий тег вне построенных регионов"""
+        if self.skipped is not None and name == self.skipped[0]:
+            self.skipped[1] -= 1
+            if self.skipped[1] == 0:
+                self.skipped = None
+
+
+class RegionSoup(BeautifulSoup):
+    """
+    BeautifulSoup с RegionStrainer: передает ему закрывающие теги вне
+    регионов и собирает в unwanted_titles кандидатов в заголовок,
+    построенных внутри ненужных блоков.
+    """
+
+    def __init__(self, markup, rules):
+        self.unwanted_titles = []
+        super().__init__(markup, 'html.parser', parse_only=RegionStrainer(rules))
+
+    def handle_starttag(self, name, *args, **kwargs):
+        # Strainer решает только за теги вне построенных регионов
+        strained = len(self.tagStack) <= 1
+        tag = super().handle_starttag(name, *args, **kwargs)
+        if strained and tag is not None and self.parse_only.in_unwanted:
+            self.unwanted_titles.append(tag)
+        return tag
+
+    def handle_endtag(self, name, nsprefix=None):
+        if len(self.tagStack) <= 1:
+            self.parse_only.close_tag(name)
+        super().handle_endtag(name, nsprefix)
+
+
+def remove_element(elem):
+    """
+    Удаление элемента lxml с сохранением текста после него.
+
+    На месте элемента остается пустой комментарий, поэтому текст до и после
+    не склеивается в один узел - так же, как после decompose() в bs4.
+    """
+    placeholder = etree.Comment()
+    placeholder.tail = elem.tail
+    elem.getparent().replace(elem, placeholder)
+
+
+class TextBlocks:
+    """
+    Сборщик текстовых блоков за один проход по дереву.
+
+    Каждая граница p/div закрывает текущий блок, поэтому текст вложенных
+    div попадает ровно в один блок, а не повторяется у каждого предка.
+    Куски текста склеиваются как в get_text(strip=True).
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.parts = []
+        self.depth = 0
+
+    def add(self, text):
+        if self.depth and text:
+            text = text.strip()
+            if text:
+                self.parts.append(text)
+
+    def boundary(self, opening):
+        if self.parts:
+            self.blocks.append(''.join(self.parts))
+            self.parts = []
+        self.depth += 1 if opening else -1
+
+
+def bs4_text_blocks(root, block_tags=BLOCK_TAGS):
+    """Текстовые блоки поддерева BeautifulSoup без повторного обхода вложенных div"""
+    collector = TextBlocks()
+    stack = [(root, iter(root.contents))]
+    while stack:
+        elem, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if elem is not root and elem.name in block_tags:
+                collector.boundary(False)
+        elif isinstance(node, Tag):
+            if node.name in block_tags:
+                collector.boundary(True)
+            stack.append((node, iter(node.contents)))
+        elif type(node) in (NavigableString, CData):
+            collector.add(node)
+    return collector.blocks
+
+
+def lxml_text_blocks(root, block_tags=BLOCK_TAGS):
+    """Текстовые блоки поддерева lxml, аналог bs4_text_blocks"""
+    collector = TextBlocks()
+    for event, elem in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+        if elem is root:
+            continue
+        if event == 'start':
+            if elem.tag in block_tags:
+                collector.boundary(True)
+            collector.add(elem.text)
+        else:
+            # Для комментариев и PI учитывается только текст после них
+            if event == 'end' and elem.tag in block_tags:
+                collector.boundary(False)
+            collector.add(elem.tail)
+    return collector.blocks
+
+
+class Extractor:
+    """
+    Интерфейс бэкенда извлечения данных статьи.
+
+    extract() получает HTML (bytes или str) и возвращает словарь с полями
+    title, content, date, images, tags. Все бэкенды должны давать
+    одинаковый результат на одном и том же HTML.
+
+    В выборочном режиме (selective, если бэкенд его поддерживает) строится
+    дерево только из регионов, нужных селекторам: заголовок, дата, блок
+    статьи, теги и изображения; ненужные блоки пропускаются - поля те же,
+    что при полном разборе. Если блок статьи не найден или в нем нет
+    текста, выполняется полный разбор.
+
+    fields - набор полей из EXTRACT_FIELDS: остальные не извлекаются
+    и в результат не попадают (None - все поля).
+
+    rules - ExtractionRules или RulesFile (по умолчанию default_rules());
+    план берется один раз на вызов extract(). С селекторами, которые отбор
+    регионов не понимает, разбор всегда полный.
+    """
+
+    name = None
+    supports_selective = False
+
+    def __init__(self, selective=False, rules=None):
+        self.selective = selective and self.supports_selective
+        self.rules = rules or default_rules()
+
+    def extract(self, content, steps=None, fields=None):
+        """
+        Поля статьи из HTML.
+
+        В steps (если передан) записывается время этапов в секундах:
+        tree/fields - построение дерева и извлечение полей, с префиксом
+        region_ - то же для выборочного разбора.
+        """
+        if steps is None:
+            steps = {}
+        rules = self.rules.current()
+        if self.selective and rules.region_matcher is not None:
+            data = self.extract_timed(self.parse_region, content, True, steps, fields, 'region_', rules)
+            if data is not None:
+                return data
+        return self.extract_timed(self.parse_full, content, False, steps, fields, rules=rules)
+
+    def extract_timed(self, parse, content, region_only, steps, fields=None, prefix='', rules=None):
+        rules = rules or self.rules.current()
+        started = time.perf_counter()
+        root = parse(content, rules)
+        parsed = time.perf_counter()
+        data = self.extract_tree(root, region_only, fields, rules)
+        steps[prefix + 'tree'] = parsed - started
+        steps[prefix + 'fields'] = time.perf_counter() - parsed
+        return data
+
+    def parse_full(self, content, rules):
+        raise NotImplementedError
+
+    def parse_region(self, content, rules):
+        raise NotImplementedError
+
+    def extract_tree(self, root, region_only, fields, rules):
+        raise NotImplementedError
+
+
+class Bs4Extractor(Extractor):
+    """Извлечение через BeautifulSoup (html.parser) - медленно, но без C-зависимостей"""
+
+    name = 'bs4'
+    supports_selective = True
+
+    def parse_full(self, content, rules):
+        return BeautifulSoup(content, 'html.parser')
+
+    def parse_region(self, content, rules):
+        return RegionSoup(content, rules)
+
+    def extract_tree(self, soup, region_only, fields, rules):
+        selectors = rules.soup
+        data = empty_fields(fields)
+
+        # Заголовок
+        for selector in selectors['title'] if 'title' in data else ():
+            title_elem = selector.select_one(soup)
+            if title_elem:
+                title_text = title_elem.get_text(strip=True)
+                if title_text and len(title_text) > rules.min_title_length:
+                    data['title'] = title_text
+                    break
+
+        # Удаляем ненужные элементы (они не входят ни в одно поле, кроме заголовка);
+        # выборочный разбор их не строил, кроме кандидатов в заголовок
+        if data.keys() - {'title'}:
+            for unwanted in selectors['unwanted'].select(soup):
+                unwanted.decompose()
+            for unwanted in soup.unwanted_titles if region_only else ():
+                unwanted.decompose()
+
+        # Основной контент - улучшенная логика
+        if 'content' in data:
+            content_text = []
+
+            # Ищем основной контент
+            main_content = selectors['content'].select_one(soup)
+            if main_content:
+                for text in bs4_text_blocks(main_content, rules.block_tags):
+                    # Фильтруем короткие и навигационные элементы
+                    if len(text) > rules.min_content_length and not rules.skip_re.search(text):
+                        content_text.append(text)
+
+            if region_only and not content_text:
+                return None
+
+            # Если основной контент не найден, собираем все параграфы
+            if not content_text:
+                for p in soup.find_all('p'):
+                    text = p.get_text(strip=True)
+                    if text and len(text) > rules.min_fallback_length:
+                        content_text.append(text)
+
+            data['content'] = '\n\n'.join(content_text)
+
+        # Дата публикации
+        for selector in selectors['date'] if 'date' in data else ():
+            date_elem = selector.select_one(soup)
+            if date_elem:
+                date_text = date_elem.get('datetime') or date_elem.get_text(strip=True)
+                if date_text:
+                    data['date'] = date_text
+                    break
+
+        # Изображения
+        for img in soup.find_all('img') if 'images' in data else ():
+            src = img.get('src') or img.get('data-src')
+            if src and not src.startswith('data:'):
+                if src.startswith('/'):
+                    src = rules.base_url + src
+                data['images'].append(src)
+
+        # Теги
+        for selector in selectors['tags'] if 'tags' in data else ():
+            for tag in selector.select(soup):
+                tag_text = tag.get_text(strip=True)
+                if tag_text:
+                    data['tags'].append(tag_text)
+
+        return data
+
+
+def lxml_text(elem):
+    """Аналог get_text(strip=True) из BeautifulSoup"""
+    return ''.join(text.strip() for text in elem.itertext())
+
+
+class LxmlExtractor(Extractor):
+    """
+    Извлечение через lxml (libxml2) - в несколько раз быстрее html.parser.
+
+    CSS-селекторы переводятся в XPath один раз на поток и план правил:
+    скомпилированные XPath-выражения lxml не рассчитаны на одновременный
+    вызов из разных потоков. Выборочного разбора нет: libxml2 строит
+    дерево целиком быстрее, чем Python отбирает из него регионы.
+    """
+
+    name = 'lxml'
+
+    def __init__(self, selective=False, rules=None):
+        super().__init__(selective, rules)
+        self.local = threading.local()
+
+    def selectors(self, rules):
+        selectors = getattr(self.local, 'selectors', None)
+        if selectors is None or self.local.version != rules.version:
+            selectors = self.local.selectors = {
+                'title': [CSSSelector(s, translator='html') for s in rules.title],
+                'unwanted': CSSSelector(rules.unwanted, translator='html'),
+                'content': CSSSelector(rules.content, translator='html'),
+                'date': [CSSSelector(s, translator='html') for s in rules.date],
+                'tags': [CSSSelector(s, translator='html') for s in rules.tags],
+                # huge_tree снимает ограничение libxml2 на глубину вложенности (256)
+                'parser': lxml_html.HTMLParser(huge_tree=True)
+            }
+            self.local.version = rules.version
+        return selectors
+
+    def parse_full(self, content, rules):
+        if isinstance(content, bytes):
+            # Без meta charset libxml2 считает страницу latin-1, mos.ru отдает UTF-8
+            try:
+                content = content.decode('utf-8')
+            except UnicodeDecodeError:
+                pass
+        return lxml_html.document_fromstring(content, parser=self.selectors(rules)['parser'])
+
+    def extract_tree(self, root, region_only, fields, rules):
+        selectors = self.selectors(rules)
+        data = empty_fields(fields)
+
+        # Заголовок
+        for selector in selectors['title'] if 'title' in data else ():
+            found = selector(root)
+            if found:
+                title_text = lxml_text(found[0])
+                if title_text and len(title_text) > rules.min_title_length:
+                    data['title'] = title_text
+                    break
+
+        # Удаляем ненужные элементы
+        if data.keys() - {'title'}:
+            for unwanted in selectors['unwanted'](root):
+                remove_element(unwanted)
+
+        if 'content' in data:
+            content_text = []
+            found = selectors['content'](root)
+            if found:
+                for text in lxml_text_blocks(found[0], rules.block_tags):
+                    if len(text) > rules.min_content_length and not rules.skip_re.search(text):
+                        content_text.append(text)
+
+            if region_only and not content_text:
+                return None
+
+            if not content_text:
+                for p in root.iter('p'):
+                    text = lxml_text(p)
+                    if text and len(text) > rules.min_fallback_length:
+                        content_text.append(text)
+
+            data['content'] = '\n\n'.join(content_text)
+
+        # Дата публикации
+        for selector in selectors['date'] if 'date' in data else ():
+            found = selector(root)
+            if found:
+                date_text = found[0].get('datetime') or lxml_text(found[0])
+                if date_text:
+                    data['date'] = date_text
+                    break
+
+        # Изображения
+        for img in root.iter('img') if 'images' in data else ():
+            src = img.get('src') or img.get('data-src')
+            if src and not src.startswith('data:'):
+                if src.startswith('/'):
+                    src = rules.base_url + src
+                data['images'].append(src)
+
+        # Теги
+        for selector in selectors['tags'] if 'tags' in data else ():
+            for tag in selector(root):
+                tag_text = lxml_text(tag)
+                if tag_text:
+                    data['tags'].append(tag_text)
+
+        return data
+
+
+EXTRACTORS = {
+    'bs4': Bs4Extractor,
+    'lxml': LxmlExtractor
+}
+
+
+def get_extractor(name=None, selective=None, rules=None):
+    """
+    Бэкенд извлечения по имени: 'lxml', 'bs4' или 'auto'.
+
+    auto (по умолчанию) выбирает lxml, если он установлен, иначе bs4.
+    Выборочный разбор (EXTRACTOR_SELECTIVE, по умолчанию включен) есть
+    только у bs4: lxml разбирает страницу целиком быстрее.
+    rules - правила извлечения, по умолчанию default_rules().
+    """
+    name = (name or os.environ.get('EXTRACTOR_BACKEND', 'auto')).lower()
+    if name == 'auto':
+        name = 'lxml' if lxml_html is not None else 'bs4'
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor backend: {name}")
+    if name == 'lxml' and lxml_html is None:
+        logger.warning("lxml is not installed, falling back to bs4 extractor")
+        name = 'bs4'
+    if selective is None:
+        selective = os.environ.get('EXTRACTOR_SELECTIVE', 'True').lower() == 'true'
+    return EXTRACTORS[name](selective, rules)
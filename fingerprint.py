@@ -0,0 +1,124 @@
+import difflib
+import hashlib
+import json
+
+from extractors import ARTICLE_FIELDS, DERIVED_FIELDS
+from metrics import INCREMENTAL_RESULTS
+
+# Поля статьи, по которым считается отпечаток; производные поля
+# (content_length, images_count) меняются вместе с исходными
+FINGERPRINT_FIELDS = ('title', 'date', 'images', 'tags', 'content')
+
+
+def digest(value):
+    """Короткий стабильный хэш строки или JSON-значения"""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def split_paragraphs(content):
+    return content.split('\n\n') if content else []
+
+
+def fingerprint(article):
+    """
+    Отпечаток статьи: хэш каждого поля, каждого абзаца текста и общий
+    хэш по полям, которые есть в результате. Время разбора, сведения
+    о кэше и разбивка времени в отпечаток не входят.
+    """
+    fields = {name: digest(article[name]) for name in FINGERPRINT_FIELDS if name in article}
+    result = {'article': digest(fields), 'fields': fields}
+    if 'content' in article:
+        result['paragraphs'] = [digest(paragraph) for paragraph in split_paragraphs(article['content'])]
+    return result
+
+
+def with_fingerprint(result):
+    """Результат парсинга с отпечатком; неудачные результаты - без изменений"""
+    if not result.get('success'):
+        return result
+    return {**result, 'fingerprint': fingerprint(result)}
+
+
+def validate_since(since):
+    """
+    Отпечаток прошлой версии от клиента: общий хэш строкой или объект
+    fingerprint из прошлого ответа. Возвращает сообщение об ошибке или None.
+    """
+    if isinstance(since, str):
+        return None
+    if not isinstance(since, dict) or not isinstance(since.get('article'), str):
+        return '"since" must be a fingerprint object or its "article" hash'
+    if not isinstance(since.get('fields', {}), dict):
+        return '"since.fields" must be an object'
+    paragraphs = since.get('paragraphs', [])
+    if not isinstance(paragraphs, list) or not all(isinstance(p, str) for p in paragraphs):
+        return '"since.paragraphs" must be a list of hashes'
+    return None
+
+
+def paragraph_changes(paragraphs, hashes, previous_hashes):
+    """
+    Правки абзацев относительно прошлой версии: список операций
+    replace/insert/delete с диапазоном [start, end) в прошлом списке
+    абзацев и новыми абзацами. Применяются с конца списка к началу.
+    """
+    matcher = difflib.SequenceMatcher(None, previous_hashes, hashes, autojunk=False)
+    changes = []
+    for op, start, end, new_start, new_end in matcher.get_opcodes():
+        if op == 'equal':
+            continue
+        change = {'op': op, 'start': start, 'end': end}
+        if op != 'delete':
+            change['paragraphs'] = paragraphs[new_start:new_end]
+        changes.append(change)
+    return changes
+
+
+def incremental(result, since):
+    """
+    Ответ относительно прошлой версии since (см. validate_since).
+
+    Тот же общий хэш - только not_modified. Иначе, если since - полный
+    отпечаток, сравниваются хэши полей, которые есть в результате (при
+    fields - только выбранные): изменившиеся поля попадают в changes,
+    а текст - правками абзацев; ни одно не изменилось - not_modified.
+    По одному хэшу разницу не посчитать, и возвращается полный результат.
+    Новый отпечаток (целиком) есть в ответе всегда.
+    """
+    if not result.get('success'):
+        return result
+    current = fingerprint(result)
+    previous = since if isinstance(since, dict) else {'article': since}
+    service = {key: value for key, value in result.items() if key not in ARTICLE_FIELDS}
+    not_modified = {**service, 'not_modified': True, 'fingerprint': current}
+
+    if current['article'] == previous['article']:
+        INCREMENTAL_RESULTS.inc(result='not_modified')
+        return not_modified
+
+    previous_fields = previous.get('fields')
+    if not previous_fields:
+        INCREMENTAL_RESULTS.inc(result='full')
+        return {**result, 'not_modified': False, 'fingerprint': current}
+
+    changed = [name for name, field_hash in current['fields'].items() if previous_fields.get(name) != field_hash]
+    if not changed:
+        # Общий хэш отличается только набором полей (since - от полного результата)
+        INCREMENTAL_RESULTS.inc(result='not_modified')
+        return not_modified
+
+    changes = {}
+    for name in changed:
+        if name == 'content' and 'paragraphs' in previous:
+            changes['content'] = paragraph_changes(split_paragraphs(result['content']), current['paragraphs'],
+                                                   previous['paragraphs'])
+        else:
+            changes[name] = result[name]
+        # Производные поля (content_length, images_count) - вместе с исходным
+        for derived, source in DERIVED_FIELDS.items():
+            if source == name and derived in result:
+                changes[derived] = result[derived]
+    INCREMENTAL_RESULTS.inc(result='diff')
+    return {**service, 'not_modified': False, 'changes': changes, 'fingerprint': current}
@@ -1,14 +1,35 @@
-from flask import Flask, request, jsonify
-import requests
-from bs4 import BeautifulSoup
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 import time
-import random
-from urllib.parse import urljoin
 import json
 import logging
 from fake_useragent import UserAgent
 from datetime import datetime
 import os
+import asyncio
+import multiprocessing
+import select
+import socket
+import ssl
+import threading
+from functools import partial
+
+from batch_engine import BatchExecutor
+from rate_control import AdaptiveRateLimiter, CircuitOpenError, parse_retry_after
+from async_fetcher import AsyncFetcher, ClientDisconnected
+from transport import Transport
+from page_reader import CHUNK_SIZE, ArticleEndScanner, BodyReader, Page, content_length
+from article_cache import ArticleCache, make_validators, conditional_headers
+from article_store import ArticleStore
+from extractors import ARTICLE_FIELDS, get_extractor, project_fields, required_fields
+from parse_pool import ParsePool
+from prefetcher import NewsPrefetcher
+from job_queue import JobQueue
+from coordination import Coordinator, SharedRateLimiter
+import response_format
+from fingerprint import incremental, validate_since, with_fingerprint
+from metrics import (REGISTRY, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, FETCH_SECONDS, WAIT_SECONDS,
+                     PARSE_SECONDS, EXTRACT_STEP_SECONDS, RETRIES, RATE_LIMITED, ERRORS,
+                     timed, record_timing, collect_timings, with_timings)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -16,9 +37,98 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Режим сервиса: full - все подсистемы; simple - без хранилища статей и очереди
+# заданий (ничего не пишется на диск), как прежние app.py и main.py
+SERVICE_MODE = os.environ.get('SERVICE_MODE', 'full')
+SIMPLE_MODE = SERVICE_MODE == 'simple'
+
+# Настройки пакетной обработки
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', 50))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+BATCH_STREAM_MAX_URLS = int(os.environ.get('BATCH_STREAM_MAX_URLS', 1000))
+# Общий лимит запросов к www.mos.ru (запросов в секунду и допустимый всплеск)
+MOSRU_RATE = float(os.environ.get('MOSRU_RATE', 1.0))
+MOSRU_BURST = float(os.environ.get('MOSRU_BURST', 3))
+# Адаптация частоты при ответах 429: нижняя граница, шаг роста после N успехов подряд,
+# множитель снижения; автомат размыкается после N отказов подряд на паузу в секундах
+MOSRU_MIN_RATE = float(os.environ.get('MOSRU_MIN_RATE', 0.1))
+MOSRU_RATE_INCREASE = float(os.environ.get('MOSRU_RATE_INCREASE', 0.1))
+MOSRU_RATE_INCREASE_AFTER = int(os.environ.get('MOSRU_RATE_INCREASE_AFTER', 20))
+MOSRU_RATE_DECREASE = float(os.environ.get('MOSRU_RATE_DECREASE', 0.5))
+MOSRU_BREAKER_THRESHOLD = int(os.environ.get('MOSRU_BREAKER_THRESHOLD', 5))
+MOSRU_BREAKER_COOLDOWN = float(os.environ.get('MOSRU_BREAKER_COOLDOWN', 30))
+# Соединения с mos.ru: размер пула синхронного транспорта, время жизни простаивающего
+# keep-alive соединения и кэша DNS в секундах, HTTP/2 (нужен httpx[http2])
+MOSRU_POOL_SIZE = int(os.environ.get('MOSRU_POOL_SIZE', 32))
+MOSRU_KEEPALIVE = int(os.environ.get('MOSRU_KEEPALIVE', 60))
+MOSRU_DNS_TTL = int(os.environ.get('MOSRU_DNS_TTL', 300))
+MOSRU_HTTP2 = os.environ.get('MOSRU_HTTP2', 'False').lower() == 'true'
+# Загрузка страниц по частям: предельный размер тела в байтах; остановка после
+# регионов статьи (по умолчанию выключена: изображения и теги после них теряются);
+# сколько байт остатка дочитывается, чтобы сохранить keep-alive соединение
+MOSRU_MAX_PAGE_BYTES = int(os.environ.get('MOSRU_MAX_PAGE_BYTES', 10 * 1024 * 1024))
+MOSRU_STOP_AT_ARTICLE_END = os.environ.get('MOSRU_STOP_AT_ARTICLE_END', 'False').lower() == 'true'
+MOSRU_DRAIN_BYTES = int(os.environ.get('MOSRU_DRAIN_BYTES', 65536))
+# Асинхронная загрузка: размер пула соединений и лимит пакета
+ASYNC_POOL_SIZE = int(os.environ.get('ASYNC_POOL_SIZE', 100))
+ASYNC_BATCH_MAX_URLS = int(os.environ.get('ASYNC_BATCH_MAX_URLS', 500))
+# Координация нескольких экземпляров через общий файл SQLite (пустое значение - экземпляры
+# независимы): общие бюджет MOSRU_RATE, кэш и очередь заданий; префикс ID экземпляра
+# (по умолчанию имя хоста), срок аренды загрузки (продлевается, пока загрузка идет)
+# и отметки "жив" в секундах
+COORDINATION_DB = os.environ.get('COORDINATION_DB', '')
+COORDINATION_INSTANCE = os.environ.get('COORDINATION_INSTANCE', '')
+COORDINATION_LEASE_TTL = int(os.environ.get('COORDINATION_LEASE_TTL', 60))
+COORDINATION_HEARTBEAT_TTL = int(os.environ.get('COORDINATION_HEARTBEAT_TTL', 30))
+# Кэш результатов парсинга: TTL в секундах, размер LRU в памяти, путь к SQLite (опционально,
+# при координации по умолчанию - ее файл)
+ARTICLE_CACHE_TTL = int(os.environ.get('ARTICLE_CACHE_TTL', 600))
+ARTICLE_CACHE_SIZE = int(os.environ.get('ARTICLE_CACHE_SIZE', 1000))
+ARTICLE_CACHE_DB = os.environ.get('ARTICLE_CACHE_DB', COORDINATION_DB) or None
+# Очистка дискового кэша: записи, не обновлявшиеся дольше (секунд), и сверх числа записей; 0 - без ограничения
+ARTICLE_CACHE_DB_MAX_AGE = int(os.environ.get('ARTICLE_CACHE_DB_MAX_AGE', 7 * 24 * 3600))
+ARTICLE_CACHE_DB_MAX_ROWS = int(os.environ.get('ARTICLE_CACHE_DB_MAX_ROWS', 100000))
+# Хранилище разобранных статей с поиском (SQLite + FTS5), пустое значение отключает его;
+# размер страницы выдачи по умолчанию и максимальный
+ARTICLE_STORE_DB = os.environ.get('ARTICLE_STORE_DB', '' if SIMPLE_MODE else 'articles.db')
+STORE_PAGE_SIZE = int(os.environ.get('STORE_PAGE_SIZE', 20))
+STORE_PAGE_MAX = int(os.environ.get('STORE_PAGE_MAX', 100))
+# Разбор HTML в пуле процессов: включение, число процессов (по умолчанию - число ядер;
+# gunicorn.conf.py делит его между воркерами) и перезапуск воркера после N задач
+PARSE_POOL = os.environ.get('PARSE_POOL', 'False').lower() == 'true'
+PARSE_PROCESSES = int(os.environ.get('PARSE_PROCESSES', 0)) or None
+PARSE_MAX_TASKS_PER_CHILD = int(os.environ.get('PARSE_MAX_TASKS_PER_CHILD', 500))
+# Адрес, с которого реально загружаются страницы вместо https://www.mos.ru
+# (зеркало или локальный стенд для бенчмарков)
+MOSRU_ORIGIN = os.environ.get('MOSRU_ORIGIN', '').rstrip('/')
+# Фоновая загрузка новых новостей: автозапуск, источники через запятую (лента, RSS),
+# период опроса в секундах, окно в часах, статей в секунду и максимум статей за цикл
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', 'False').lower() == 'true'
+PREFETCH_SOURCES = [s.strip() for s in os.environ.get('PREFETCH_SOURCES', 'https://www.mos.ru/news/').split(',') if s.strip()]
+PREFETCH_INTERVAL = int(os.environ.get('PREFETCH_INTERVAL', 300))
+PREFETCH_LOOKBACK_HOURS = float(os.environ.get('PREFETCH_LOOKBACK_HOURS', 6))
+PREFETCH_RATE = float(os.environ.get('PREFETCH_RATE', 0.2))
+PREFETCH_MAX_ITEMS = int(os.environ.get('PREFETCH_MAX_ITEMS', 100))
+# Очередь заданий для больших пакетов: путь к SQLite (пустое значение отключает очередь),
+# число фоновых воркеров, URL одного задания в работе одновременно, лимит URL в задании
+JOBS_DB = os.environ.get('JOBS_DB', COORDINATION_DB or ('' if SIMPLE_MODE else 'jobs.db'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 1))
+JOB_MAX_URLS = int(os.environ.get('JOB_MAX_URLS', 10000))
+JOB_RESULTS_PAGE_MAX = int(os.environ.get('JOB_RESULTS_PAGE_MAX', 500))
+# Ответы: сжатие zstd/br/gzip по Accept-Encoding для ответов от N байт,
+# кодировщик JSON (auto - orjson, если установлен; json - стандартный)
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'True').lower() == 'true'
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+# Отпечатки содержимого (хэши полей и абзацев) в каждом успешном результате
+FINGERPRINTS = os.environ.get('FINGERPRINTS', 'True').lower() == 'true'
+# Сервис запущен сервером приложений (gunicorn.conf.py): модуль может импортироваться
+# в мастере до fork, поэтому пул разбора и фоновые задачи запускает init_worker
+SERVER_MANAGED = os.environ.get('SERVER_MANAGED', 'False').lower() == 'true'
+
 class MosRuAPIParser:
     def __init__(self):
-        self.session = requests.Session()
         self.ua = UserAgent()
         
         # Настройки для обхода блокировок
@@ -37,140 +147,356 @@ class MosRuAPIParser:
             'Referer': 'https://www.mos.ru/'
         }
         
-        self.session.headers.update(self.headers)
+        # Один транспорт на все потоки: пул keep-alive соединений и кэш DNS
+        self.transport = Transport(self.headers, MOSRU_POOL_SIZE, MOSRU_KEEPALIVE, MOSRU_DNS_TTL, MOSRU_HTTP2)
         self.timeout = 30
         self.max_retries = 3
-        self.delay_range = (1, 3)
+        # Один регулятор на все потоки и асинхронный загрузчик - запросы к mos.ru
+        # идут с общей частотой, которая снижается при ответах 429; при координации
+        # частота и паузы общие для всех экземпляров сервиса
+        limiter = partial(SharedRateLimiter, coordinator) if coordinator else AdaptiveRateLimiter
+        self.rate_limiter = limiter(
+            MOSRU_RATE, MOSRU_BURST,
+            min_rate=MOSRU_MIN_RATE,
+            increase=MOSRU_RATE_INCREASE,
+            decrease=MOSRU_RATE_DECREASE,
+            increase_after=MOSRU_RATE_INCREASE_AFTER,
+            breaker_threshold=MOSRU_BREAKER_THRESHOLD,
+            breaker_cooldown=MOSRU_BREAKER_COOLDOWN
+        )
+        self.async_fetcher = None
+        self.async_lock = threading.Lock()
+        self.cache = ArticleCache(ARTICLE_CACHE_TTL, ARTICLE_CACHE_SIZE, ARTICLE_CACHE_DB, coordinator,
+                                  ARTICLE_CACHE_DB_MAX_AGE, ARTICLE_CACHE_DB_MAX_ROWS)
+        self.store = ArticleStore(ARTICLE_STORE_DB) if ARTICLE_STORE_DB else None
+        # Бэкенд извлечения: EXTRACTOR_BACKEND=lxml|bs4|auto
+        self.extractor = get_extractor()
+        logger.info(f"Extractor backend: {self.extractor.name}")
+        self.parse_pool = None
+        if not SERVER_MANAGED:
+            self.start_parse_pool()
     
-    def get_page_with_retries(self, url):
-        """Получение страницы с повторными попытками"""
+    def start_parse_pool(self):
+        """Пул процессов разбора, если он включен (PARSE_POOL)"""
+        # В дочерних процессах пула (spawn импортирует главный модуль заново) пул не создается
+        if PARSE_POOL and self.parse_pool is None and multiprocessing.current_process().name == 'MainProcess':
+            self.parse_pool = ParsePool(PARSE_PROCESSES, PARSE_MAX_TASKS_PER_CHILD,
+                                        self.extractor.name, self.extractor.selective)
+            logger.info(f"Parse pool started: {self.parse_pool.processes} processes")
+    
+    def get_page_with_retries(self, url, validators=None, article_end=None):
+        """
+        Получение страницы с повторными попытками
+        
+        validators - ETag/Last-Modified сохраненной версии: запрос становится
+        условным, ответ 304 возвращается как успешный.
+        
+        Тело читается по частям, не больше MOSRU_MAX_PAGE_BYTES (иначе
+        PageTooLarge); article_end - правила извлечения: загрузка
+        останавливается после регионов статьи, тело обрезается по ним.
+        
+        Частоту и паузы задает общий регулятор: 429/503 снижают частоту
+        и ставят паузу по Retry-After для всех потоков, при разомкнутом
+        автомате бросается CircuitOpenError без запроса к сайту.
+        """
+        throttled = False
         for attempt in range(self.max_retries):
+            reserved = False
             try:
                 if attempt > 0:
-                    delay = random.uniform(*self.delay_range)
-                    time.sleep(delay)
+                    RETRIES.inc(mode='sync')
+                    # После 429 пауза уже выставлена в регуляторе и учитывается в acquire()
+                    if not throttled:
+                        self.wait(self.rate_limiter.backoff(attempt - 1), 'backoff')
+                throttled = False
                 
-                # Обновляем User-Agent
-                self.session.headers['User-Agent'] = self.ua.random
+                wait_time = self.rate_limiter.acquire()
+                reserved = True
+                if wait_time > 0:
+                    WAIT_SECONDS.observe(wait_time, reason='rate_limit')
+                    record_timing('wait.rate_limit', wait_time)
                 
-                response = self.session.get(url, timeout=self.timeout, allow_redirects=True)
+                # Новый User-Agent передаем в запрос, не меняя общую сессию между потоками
+                headers = {'User-Agent': self.ua.random, **conditional_headers(validators)}
                 
-                if response.status_code == 200:
-                    return response
-                elif response.status_code == 429:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"Rate limit hit, waiting {wait_time}s")
-                    time.sleep(wait_time)
+                started = time.perf_counter()
+                with self.transport.stream(url, headers=headers, timeout=self.timeout) as response:
+                    page = Page(response.status_code, response.headers)
+                    if response.status_code == 200:
+                        reader = BodyReader('sync', MOSRU_MAX_PAGE_BYTES,
+                                            ArticleEndScanner(article_end) if article_end else None, MOSRU_DRAIN_BYTES,
+                                            content_length(response.headers), response.wire_bytes)
+                        page.content = reader.read(response.iter_chunks(CHUNK_SIZE))
+                record_timing('network', time.perf_counter() - started)
+                
+                if response.status_code in (200, 304):
+                    self.rate_limiter.on_success()
+                    return page
+                elif response.status_code in (429, 503):
+                    RATE_LIMITED.inc(mode='sync')
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    logger.warning(f"Rate limit hit (HTTP {response.status_code}), Retry-After: {retry_after}")
+                    self.rate_limiter.on_throttle(retry_after)
+                    throttled = True
                     continue
                 else:
+                    self.rate_limiter.on_failure()
                     logger.warning(f"HTTP {response.status_code} for {url}")
                     
-            except requests.exceptions.RequestException as e:
+            except self.transport.errors as e:
+                self.rate_limiter.on_failure()
                 logger.error(f"Request error (attempt {attempt + 1}): {e}")
                 if attempt == self.max_retries - 1:
                     raise
+            finally:
+                # Исключения вне transport.errors (PageTooLarge и др.) не доходят до on_*:
+                # пробный запрос освобождается здесь
+                if reserved:
+                    self.rate_limiter.release_probe()
                 
         return None
     
+    def article_end(self):
+        """Текущие правила извлечения, по регионам которых загрузка останавливается"""
+        if not MOSRU_STOP_AT_ARTICLE_END:
+            return None
+        rules = self.extractor.rules.current()
+        # Селекторы, которые отбор регионов не понимает, - страница загружается целиком
+        return rules if rules.region_matcher is not None else None
+    
+    def wait(self, seconds, reason):
+        """Пауза перед запросом к mos.ru с учетом в метриках"""
+        WAIT_SECONDS.observe(seconds, reason=reason)
+        record_timing(f'wait.{reason}', seconds)
+        time.sleep(seconds)
+    
+    def origin_url(self, url):
+        """URL для загрузки с учетом MOSRU_ORIGIN"""
+        if MOSRU_ORIGIN and url.startswith('https://www.mos.ru/'):
+            return MOSRU_ORIGIN + url[len('https://www.mos.ru'):]
+        return url
+    
     def parse_news_article(self, url):
         """Парсинг отдельной новости"""
+        return self.parse_news_article_conditional(url)[0]
+    
+    def parse_news_article_conditional(self, url, validators=None, fields=None):
+        """
+        Парсинг новости с условным запросом
+        
+        Возвращает (результат, валидаторы). Если страница не изменилась
+        (ответ 304 или тот же хэш содержимого), результат None и
+        HTML не разбирается. fields - разобрать только эти поля
+        (неполный результат в хранилище не попадает).
+        """
         try:
             logger.info(f"Parsing: {url}")
-            response = self.get_page_with_retries(url)
+            with timed(FETCH_SECONDS, 'fetch', mode='sync'):
+                response = self.get_page_with_retries(self.origin_url(url), validators, self.article_end())
             
-            if not response:
+            if response is None:
+                ERRORS.inc(stage='fetch', type='retries_exhausted')
                 return {
                     'success': False,
                     'error': 'Failed to fetch page',
                     'url': url
-                }
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Извлекаем данные
-            article_data = {
-                'success': True,
-                'url': url,
-                'title': '',
-                'content': '',
-                'date': '',
-                'images': [],
-                'tags': [],
-                'parsed_at': datetime.now().isoformat()
-            }
+                }, None
             
-            # Заголовок
-            title_selectors = ['h1', 'title']
-            for selector in title_selectors:
-                title_elem = soup.select_one(selector)
-                if title_elem:
-                    title_text = title_elem.get_text(strip=True)
-                    if title_text and len(title_text) > 5:
-                        article_data['title'] = title_text
-                        break
+            if response.status_code == 304:
+                logger.info(f"Not modified: {url}")
+                return None, validators
             
-            # Основной контент - улучшенная логика
-            content_text = []
+            new_validators = make_validators(response.headers, response.content)
+            if validators and validators.get('content_hash') == new_validators['content_hash']:
+                logger.info(f"Content unchanged: {url}")
+                return None, new_validators
             
-            # Удаляем ненужные элементы
-            for unwanted in soup.select('script, style, nav, footer, header, .navigation, .menu'):
-                unwanted.decompose()
+            result = self.extract_article(url, response.content, fields)
+            if fields is None:
+                self.store_article(result)
+            return result, new_validators
             
-            # Ищем основной контент
-            main_content = soup.select_one('article, .content, .news-content, main, [role="main"]')
-            if main_content:
-                paragraphs = main_content.find_all(['p', 'div'])
-                for p in paragraphs:
-                    text = p.get_text(strip=True)
-                    if text and len(text) > 30:
-                        # Фильтруем навигационные элементы
-                        if not any(skip in text.lower() for skip in 
-                                 ['меню', 'навигация', 'войти', 'поиск', 'подписаться', 'cookies']):
-                            content_text.append(text)
+        except CircuitOpenError as e:
+            ERRORS.inc(stage='fetch', type='circuit_open')
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url,
+                'retry_after': round(e.retry_after, 1)
+            }, None
+        except Exception as e:
+            logger.error(f"Error parsing {url}: {e}")
+            ERRORS.inc(stage='fetch', type=type(e).__name__)
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url,
+                'parsed_at': datetime.now().isoformat()
+            }, None
+    
+    def parse_news_article_cached(self, url, refresh=False, fields=None, since=None):
+        """
+        Парсинг новости через кэш, refresh=True - принудительное обновление
+        
+        fields - поля статьи в ответе (None - все); не запрошенные поля
+        при промахе кэша не извлекаются. since - отпечаток прошлой
+        версии: вернуть только изменения или not_modified.
+        """
+        fields = frozenset(fields) if fields is not None else None
+        parse = self.parse_news_article_conditional
+        if fields is not None:
+            parse = partial(parse, fields=fields)
+        return self.fingerprinted(self.cache.get_or_parse(url, parse, refresh, fields), since)
+    
+    async def parse_news_article_cached_async(self, url, refresh=False, fields=None, since=None):
+        """Асинхронный парсинг новости через кэш"""
+        fields = frozenset(fields) if fields is not None else None
+        parse = self.parse_news_article_conditional_async
+        if fields is not None:
+            parse = partial(parse, fields=fields)
+        return self.fingerprinted(await self.cache.get_or_parse_async(url, parse, refresh, fields), since)
+    
+    def fingerprinted(self, result, since=None):
+        """Результат с отпечатком содержимого или, с since, изменения относительно прошлой версии"""
+        if since is not None:
+            return incremental(result, since)
+        return with_fingerprint(result) if FINGERPRINTS else result
+    
+    def get_async_fetcher(self):
+        """Асинхронный загрузчик создается при первом обращении"""
+        with self.async_lock:
+            if self.async_fetcher is None:
+                self.async_fetcher = AsyncFetcher(
+                    self.headers,
+                    self.rate_limiter,
+                    user_agent=lambda: self.ua.random,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    max_page_bytes=MOSRU_MAX_PAGE_BYTES,
+                    drain_bytes=MOSRU_DRAIN_BYTES,
+                    pool_size=ASYNC_POOL_SIZE,
+                    keepalive=MOSRU_KEEPALIVE,
+                    dns_ttl=MOSRU_DNS_TTL
+                )
+            return self.async_fetcher
+    
+    async def parse_news_article_async(self, url):
+        """Парсинг отдельной новости без блокировки потока на загрузке"""
+        return (await self.parse_news_article_conditional_async(url))[0]
+    
+    async def parse_news_article_conditional_async(self, url, validators=None, fields=None):
+        """Асинхронный вариант parse_news_article_conditional"""
+        fetcher = self.get_async_fetcher()
+        try:
+            logger.info(f"Parsing (async): {url}")
+            with timed(FETCH_SECONDS, 'fetch', mode='async'):
+                response = await fetcher.fetch(self.origin_url(url), validators, self.article_end())
             
-            # Если основной контент не найден, собираем все параграфы
-            if not content_text:
-                all_paragraphs = soup.find_all('p')
-                for p in all_paragraphs:
-                    text = p.get_text(strip=True)
-                    if text and len(text) > 50:
-                        content_text.append(text)
+            if response is None:
+                ERRORS.inc(stage='fetch', type='retries_exhausted')
+                return {
+                    'success': False,
+                    'error': 'Failed to fetch page',
+                    'url': url
+                }, None
             
-            article_data['content'] = '\n\n'.join(content_text)
+            status, headers, content = response
+            if status == 304:
+                logger.info(f"Not modified: {url}")
+                return None, validators
             
-            # Дата публикации
-            date_selectors = ['[datetime]', '.news-date', '.date', '[data-test="news-date"]']
-            for selector in date_selectors:
-                date_elem = soup.select_one(selector)
-                if date_elem:
-                    date_text = date_elem.get('datetime') or date_elem.get_text(strip=True)
-                    if date_text:
-                        article_data['date'] = date_text
-                        break
+            new_validators = make_validators(headers, content)
+            if validators and validators.get('content_hash') == new_validators['content_hash']:
+                logger.info(f"Content unchanged: {url}")
+                return None, new_validators
             
-            # Изображения
-            img_tags = soup.find_all('img')
-            for img in img_tags:
-                src = img.get('src') or img.get('data-src')
-                if src and not src.startswith('data:'):
-                    if src.startswith('/'):
-                        src = 'https://www.mos.ru' + src
-                    article_data['images'].append(src)
+            result = await fetcher.run_sync(self.extract_article, url, content, fields)
+            if fields is None:
+                await fetcher.run_sync(self.store_article, result)
+            return result, new_validators
             
-            # Теги
-            tag_selectors = ['.tags a', '.categories a', '[data-test="tags"] a']
-            for selector in tag_selectors:
-                tags = soup.select(selector)
-                for tag in tags:
-                    tag_text = tag.get_text(strip=True)
-                    if tag_text:
-                        article_data['tags'].append(tag_text)
+        except asyncio.CancelledError:
+            logger.info(f"Parsing cancelled: {url}")
+            raise
+        except CircuitOpenError as e:
+            ERRORS.inc(stage='fetch', type='circuit_open')
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url,
+                'retry_after': round(e.retry_after, 1)
+            }, None
+        except Exception as e:
+            logger.error(f"Error parsing {url}: {e}")
+            ERRORS.inc(stage='fetch', type=type(e).__name__)
+            return {
+                'success': False,
+                'error': str(e),
+                'url': url,
+                'parsed_at': datetime.now().isoformat()
+            }, None
+    
+    async def parse_batch_async(self, urls, refresh=False, timings=False, fields=None, since=None):
+        """Параллельный асинхронный парсинг, результаты в порядке входа; since - отпечатки по URL"""
+        async def parse_one(url):
+            if not isinstance(url, str) or not url.startswith('https://www.mos.ru/news/item/'):
+                return {
+                    'success': False,
+                    'error': 'Invalid URL format',
+                    'url': url
+                }
+            # Каждая задача gather работает в своей копии контекста - разбивки не смешиваются
+            with collect_timings(timings) as collected:
+                result = await self.parse_news_article_cached_async(url, refresh, fields,
+                                                                    since.get(url) if since else None)
+            return with_timings(result, collected)
+        
+        return await asyncio.gather(*(parse_one(url) for url in urls))
+    
+    def extract_fields(self, content, fields=None):
+        """Поля статьи из HTML - в пуле процессов, если он включен"""
+        steps = {}
+        with timed(PARSE_SECONDS, 'parse', backend=self.extractor.name):
+            if self.parse_pool is not None:
+                data = self.parse_pool.extract(content, steps, fields)
+            else:
+                data = self.extractor.extract(content, steps, fields)
+        for step, seconds in steps.items():
+            EXTRACT_STEP_SECONDS.observe(seconds, step=step)
+            record_timing(f'extract.{step}', seconds)
+        return data
+    
+    def store_article(self, result):
+        """Сохраняет разобранную статью в хранилище; ошибка записи не влияет на ответ"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(result)
+        except Exception as e:
+            logger.error(f"Error storing {result.get('url')}: {e}")
+            ERRORS.inc(stage='store', type=type(e).__name__)
+    
+    def extract_article(self, url, content, fields=None):
+        """Извлечение данных статьи из HTML, fields - только эти поля ответа"""
+        try:
+            data = self.extract_fields(content, required_fields(fields))
+            article_data = {
+                'success': True,
+                'url': url,
+                **data,
+                'parsed_at': datetime.now().isoformat()
+            }
+            if 'content' in data:
+                article_data['content_length'] = len(data['content'])
+            if 'images' in data:
+                article_data['images_count'] = len(data['images'])
             
-            logger.info(f"Successfully parsed: {article_data['title'][:50]}...")
-            return article_data
+            logger.info(f"Successfully parsed: {article_data.get('title', url)[:50]}...")
+            return project_fields(article_data, fields)
             
         except Exception as e:
             logger.error(f"Error parsing {url}: {e}")
+            ERRORS.inc(stage='parse', type=type(e).__name__)
             return {
                 'success': False,
                 'error': str(e),
@@ -178,18 +504,295 @@ class MosRuAPIParser:
                 'parsed_at': datetime.now().isoformat()
             }
 
+# Общий файл координации экземпляров; отметки "жив" ведет каждый процесс
+coordinator = Coordinator(COORDINATION_DB, COORDINATION_INSTANCE or None, COORDINATION_LEASE_TTL,
+                          COORDINATION_HEARTBEAT_TTL) if COORDINATION_DB else None
+if coordinator and not SERVER_MANAGED and multiprocessing.current_process().name == 'MainProcess':
+    coordinator.start()
+
 # Глобальный экземпляр парсера
 parser = MosRuAPIParser()
 
+# Фоновая загрузка новостей в кэш парсера (только в главном процессе)
+prefetcher = NewsPrefetcher(parser, PREFETCH_SOURCES, PREFETCH_INTERVAL, PREFETCH_LOOKBACK_HOURS * 3600,
+                            PREFETCH_RATE, PREFETCH_MAX_ITEMS, coordinator)
+if PREFETCH_ENABLED and not SERVER_MANAGED and multiprocessing.current_process().name == 'MainProcess':
+    prefetcher.start()
+
+# Состояние кэша и пула процессов читается при каждой выдаче /metrics
+REGISTRY.callback('mosru_cache_requests_total', 'Article cache lookups by result', 'counter',
+                  lambda: {status: parser.cache.get_stats()[status]
+                           for status in ('hits', 'misses', 'bypass', 'revalidated')}, 'result')
+REGISTRY.callback('mosru_cache_coalesced_total', 'Requests that joined an in-flight parse', 'counter',
+                  lambda: parser.cache.get_stats()['coalesced'])
+REGISTRY.callback('mosru_cache_in_flight', 'Parses in flight', 'gauge',
+                  lambda: parser.cache.get_stats()['in_flight'])
+REGISTRY.callback('mosru_cache_memory_entries', 'Entries in the in-memory cache', 'gauge',
+                  lambda: parser.cache.get_stats()['memory_size'])
+REGISTRY.callback('mosru_rate_limit_rps', 'Current adaptive request rate to mos.ru', 'gauge',
+                  lambda: parser.rate_limiter.rate)
+REGISTRY.callback('mosru_circuit_open', 'Circuit breaker state (1 - requests are rejected)', 'gauge',
+                  lambda: int(parser.rate_limiter.state != AdaptiveRateLimiter.CLOSED))
+REGISTRY.callback('mosru_parse_pool_queue_depth', 'HTML documents waiting in the parse pool', 'gauge',
+                  lambda: parser.parse_pool.get_stats()['queue_depth'] if parser.parse_pool else None)
+
+# Компактный JSON (msgpack по запросу клиента) и сжатие ответов
+response_compressor = response_format.init_app(app, RESPONSE_COMPRESSION, COMPRESS_MIN_SIZE, JSON_ENCODER)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else 'unknown'
+    g.metrics_started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+def observe_request(endpoint, method, status, started):
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=method, status=status)
+    REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    if response.is_streamed and 'metrics_started' in g:
+        # Потоковый ответ отправляется уже после teardown - замер завершается при закрытии ответа
+        args = (g.metrics_endpoint, request.method, response.status_code, g.pop('metrics_started'))
+        response.call_on_close(lambda: observe_request(*args))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'metrics_started' in g:
+        observe_request(g.metrics_endpoint, request.method, g.get('metrics_status', 500), g.pop('metrics_started'))
+
+def error_status(result):
+    """
+    Код ответа для неудачного парсинга: 503, если mos.ru ограничивает запросы,
+    иначе 500; в режиме simple - 200 с success: false, как у прежних app.py и main.py
+    """
+    if SIMPLE_MODE:
+        return 200
+    return 503 if result.get('retry_after') is not None else 500
+
+def error_response(result):
+    response = jsonify(result)
+    response.status_code = error_status(result)
+    if result.get('retry_after') is not None:
+        response.headers['Retry-After'] = str(int(result['retry_after'] + 0.999))
+    return response
+
+def get_flag(value):
+    """Логический флаг (refresh, timings) из JSON или параметра запроса"""
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def get_fields(value):
+    """
+    Поля ответа (fields=) из JSON-списка или строки через запятую
+    
+    Возвращает (поля или None - все поля, сообщение об ошибке).
+    """
+    if value is None or value == '':
+        return None, None
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(',') if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        return None, '"fields" must be a list or a comma-separated string'
+    unknown = sorted(set(value) - set(ARTICLE_FIELDS))
+    if unknown:
+        return None, f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(ARTICLE_FIELDS)}'
+    return frozenset(value), None
+
+def get_since(value):
+    """Отпечаток прошлой версии (since) или сообщение об ошибке"""
+    if value is None or value == '':
+        return None, None
+    error = validate_since(value)
+    return (None, error) if error else (value, None)
+
+def get_since_map(value):
+    """since для пакета: {URL: отпечаток прошлой версии} или сообщение об ошибке"""
+    if value is None:
+        return None, None
+    if not isinstance(value, dict):
+        return None, '"since" must be an object mapping URLs to fingerprints'
+    for since in value.values():
+        error = validate_since(since)
+        if error:
+            return None, error
+    return value, None
+
+def client_disconnect_check():
+    """
+    Проверка отключения клиента для async-представлений или None, если сервер
+    не дает сокет соединения: он есть у воркеров gunicorn gthread/sync и у
+    отладочного сервера Flask. Под uvicorn через WsgiToAsgi и с TLS на
+    стороне сервиса отключение не видно - загрузка доводится до конца.
+    """
+    sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return None
+    
+    def disconnected():
+        # Закрытое клиентом соединение читается сразу и пустым; данные
+        # следующего запроса (keep-alive) отключением не считаются
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+    
+    return disconnected
+
+def client_gone(url=None):
+    """Ответ на запрос, клиент которого отключился (его уже никто не прочтет)"""
+    logger.info(f"Client disconnected, fetch cancelled: {url or request.path}")
+    ERRORS.inc(stage='api', type='client_disconnected')
+    return Response(status=499)
+
+def bad_request(error):
+    return jsonify({
+        'success': False,
+        'error': error
+    }), 400
+
+def parse_batch_url(url, refresh=False, timings=False, fields=None, since=None):
+    """Парсинг одного URL из пакета, since - отпечатки прошлых версий по URL"""
+    if not isinstance(url, str) or not url.startswith('https://www.mos.ru/news/item/'):
+        return {
+            'success': False,
+            'error': 'Invalid URL format',
+            'url': url
+        }
+    with collect_timings(timings) as collected:
+        result = parser.parse_news_article_cached(url, refresh, fields, since.get(url) if since else None)
+    return with_timings(result, collected)
+
+# Общий пул воркеров для /batch - ограничивает параллелизм всего процесса
+batch_executor = BatchExecutor(parse_batch_url, max_workers=BATCH_WORKERS)
+
+# Фоновые задания; воркеры отдельные от /batch, поэтому задания занимают
+# не больше JOB_WORKERS соединений с mos.ru, остальное - /parse и /batch
+job_queue = JobQueue(JOBS_DB, parse_batch_url, JOB_WORKERS, JOB_CONCURRENCY, coordinator) if JOBS_DB else None
+if job_queue and not SERVER_MANAGED and multiprocessing.current_process().name == 'MainProcess':
+    job_queue.start()
+
+# Номер воркера gunicorn (None вне gunicorn)
+worker_id = None
+
+def init_worker(background=True, worker=None):
+    """
+    Запуск воркера сервера приложений после fork
+    
+    Пул процессов разбора создается в каждом воркере. Очередь заданий
+    и фоновая загрузка (background) запускаются только в одном воркере,
+    чтобы задания не разбирались дважды. worker - номер воркера: метка
+    worker в /metrics и поле в /health (значения у каждого воркера свои).
+    """
+    global worker_id
+    worker_id = worker
+    if worker is not None:
+        REGISTRY.set_worker(worker)
+    parser.start_parse_pool()
+    if coordinator:
+        coordinator.start()
+    if background:
+        if job_queue:
+            job_queue.start()
+        if PREFETCH_ENABLED:
+            prefetcher.start()
+        logger.info(f"Background tasks started in worker {os.getpid()}")
+
+def shutdown_worker(timeout=30):
+    """Остановка воркера: текущие задания и разборы дорабатываются не дольше timeout секунд"""
+    prefetcher.stop(timeout)
+    if job_queue:
+        job_queue.stop(timeout)
+    if coordinator:
+        coordinator.stop()
+    batch_executor.shutdown(wait=True)
+    if parser.parse_pool:
+        parser.parse_pool.shutdown(wait=True)
+    if parser.async_fetcher:
+        parser.async_fetcher.close()
+    parser.transport.close()
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def get_stream_format(data):
+    """Формат потоковой выдачи из параметра "stream" или заголовка Accept"""
+    stream = data.get('stream')
+    if stream in STREAM_MIMETYPES:
+        return stream
+    for stream, mimetype in STREAM_MIMETYPES.items():
+        if request.accept_mimetypes.best == mimetype:
+            return stream
+    return None
+
+def stream_batch(urls, stream_format, refresh=False, timings=False, fields=None, since=None):
+    """Отдает результаты по мере готовности и итоговую запись в конце"""
+    def encode(event, payload):
+        body = json.dumps(payload, ensure_ascii=False)
+        if stream_format == 'sse':
+            return f"event: {event}\ndata: {body}\n\n"
+        return body + '\n'
+    
+    def generate():
+        total = successful = 0
+        for index, result in batch_executor.iter_completed(urls, refresh=refresh, timings=timings, fields=fields,
+                                                                since=since):
+            total += 1
+            if result.get('success'):
+                successful += 1
+            yield encode('result', {'index': index, **result})
+        
+        yield encode('summary', {
+            'success': True,
+            'summary': True,
+            'total': total,
+            'successful': successful,
+            'failed': total - successful
+        })
+    
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Проверка здоровья сервиса"""
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'service': 'mos.ru parser API'
+        'service': 'mos.ru parser API',
+        'mode': SERVICE_MODE,
+        'worker': {'id': worker_id, 'pid': os.getpid()},
+        'cache': parser.cache.get_stats(),
+        'rate_control': parser.rate_limiter.get_state(),
+        'transport': {
+            'sync': parser.transport.get_stats(),
+            'async': parser.async_fetcher.stats.get_stats() if parser.async_fetcher else None
+        },
+        'jobs': job_queue.get_stats() if job_queue else None,
+        'parse_pool': parser.parse_pool.get_stats() if parser.parse_pool else None,
+        'extraction_rules': parser.extractor.rules.get_stats(),
+        'coordination': coordinator.get_stats() if coordinator else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Метрики в текстовом формате Prometheus
+    
+    Гистограммы времени загрузки, ожиданий, разбора HTML, этапов извлечения
+    и запросов к API; счетчики повторов, ответов 429, ошибок и кэша;
+    число запросов в обработке. Значения относятся к текущему процессу:
+    за балансировщиком ответы дают разные воркеры, их ряды различает
+    метка worker (сумма по сервису - sum without (worker)).
+    """
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/parse', methods=['POST'])
 def parse_article():
     """
@@ -197,8 +800,23 @@ def parse_article():
     
     POST /parse
     {
-        "url": "https://www.mos.ru/news/item/154988073/"
+        "url": "https://www.mos.ru/news/item/154988073/",
+        "refresh": false,
+        "timings": false
     }
+    
+    Результаты кэшируются по ID новости, поле "cache" в ответе содержит
+    статус (hit/miss/bypass) и возраст записи. "refresh": true - обновить кэш.
+    "timings": true - добавить в ответ разбивку времени по этапам в мс
+    (загрузка, ожидание лимита и повторов, разбор HTML, total).
+    "fields": ["title", "date", "tags"] - только эти поля статьи;
+    остальные (например, изображения) не извлекаются.
+    
+    В ответе есть "fingerprint" - хэши полей и абзацев текста.
+    "since": <fingerprint из прошлого ответа> - инкрементальный режим:
+    {"not_modified": true} без полей статьи, если ничего не изменилось
+    (при "fields" - среди выбранных полей), иначе "changes" - изменившиеся
+    поля и правки абзацев текста.
     """
     try:
         data = request.get_json()
@@ -210,24 +828,34 @@ def parse_article():
             }), 400
         
         url = data['url']
+        refresh = get_flag(data.get('refresh'))
+        fields, error = get_fields(data.get('fields'))
+        if not error:
+            since, error = get_since(data.get('since'))
+        if error:
+            return bad_request(error)
         
         # Валидация URL
         if not url.startswith('https://www.mos.ru/news/item/'):
             return jsonify({
                 'success': False,
-                'error': 'Invalid URL format. Expected: https://www.mos.ru/news/item/...'
+                'error': 'Invalid URL format. Expected: https://www.mos.ru/news/item/...',
+                'url': url
             }), 400
         
         # Парсинг
-        result = parser.parse_news_article(url)
+        with collect_timings(get_flag(data.get('timings'))) as timings:
+            result = parser.parse_news_article_cached(url, refresh, fields, since)
+        result = with_timings(result, timings)
         
         if result['success']:
             return jsonify(result), 200
         else:
-            return jsonify(result), 500
+            return error_response(result)
             
     except Exception as e:
         logger.error(f"API error: {e}")
+        ERRORS.inc(stage='api', type=type(e).__name__)
         return jsonify({
             'success': False,
             'error': 'Internal server error',
@@ -239,10 +867,20 @@ def parse_article_get():
     """
     Парсинг статьи по URL через GET параметр
     
-    GET /parse?url=https://www.mos.ru/news/item/154988073/
+    GET /parse?url=https://www.mos.ru/news/item/154988073/&refresh=1&timings=1&fields=title,date
+    
+    since=<fingerprint.article из прошлого ответа> - not_modified, если статья
+    не изменилась (разница по абзацам - только с полным отпечатком в POST).
     """
     try:
         url = request.args.get('url')
+        refresh = get_flag(request.args.get('refresh'))
+        want_timings = get_flag(request.args.get('timings'))
+        fields, error = get_fields(request.args.get('fields'))
+        if not error:
+            since, error = get_since(request.args.get('since'))
+        if error:
+            return bad_request(error)
         
         if not url:
             return jsonify({
@@ -254,19 +892,23 @@ def parse_article_get():
         if not url.startswith('https://www.mos.ru/news/item/'):
             return jsonify({
                 'success': False,
-                'error': 'Invalid URL format. Expected: https://www.mos.ru/news/item/...'
+                'error': 'Invalid URL format. Expected: https://www.mos.ru/news/item/...',
+                'url': url
             }), 400
         
         # Парсинг
-        result = parser.parse_news_article(url)
+        with collect_timings(want_timings) as timings:
+            result = parser.parse_news_article_cached(url, refresh, fields, since)
+        result = with_timings(result, timings)
         
         if result['success']:
             return jsonify(result), 200
         else:
-            return jsonify(result), 500
+            return error_response(result)
             
     except Exception as e:
         logger.error(f"API error: {e}")
+        ERRORS.inc(stage='api', type=type(e).__name__)
         return jsonify({
             'success': False,
             'error': 'Internal server error',
@@ -283,9 +925,19 @@ def parse_batch():
         "urls": [
             "https://www.mos.ru/news/item/154988073/",
             "https://www.mos.ru/news/item/154988074/"
-        ],
-        "delay": 2
+        ]
     }
+    
+    URL обрабатываются параллельно пулом воркеров, частота запросов
+    к mos.ru ограничена общим лимитером. Параметр "delay" больше не используется.
+    
+    Потоковый режим: "stream": "ndjson" или "sse" (либо заголовок Accept
+    application/x-ndjson / text/event-stream). Каждая статья отправляется
+    сразу после парсинга с полем "index", последней идет итоговая запись.
+    
+    "timings": true - разбивка времени по этапам в каждом результате.
+    "fields": [...] - только эти поля статьи, как в /parse.
+    "since": {"<url>": <fingerprint>} - инкрементальный режим, как в /parse.
     """
     try:
         data = request.get_json()
@@ -297,7 +949,13 @@ def parse_batch():
             }), 400
         
         urls = data['urls']
-        delay = data.get('delay', 2)  # Задержка между запросами
+        refresh = get_flag(data.get('refresh'))
+        timings = get_flag(data.get('timings'))
+        fields, error = get_fields(data.get('fields'))
+        if not error:
+            since, error = get_since_map(data.get('since'))
+        if error:
+            return bad_request(error)
         
         if not isinstance(urls, list) or len(urls) == 0:
             return jsonify({
@@ -305,31 +963,149 @@ def parse_batch():
                 'error': 'URLs must be a non-empty array'
             }), 400
         
-        if len(urls) > 10:  # Ограничение на количество
+        stream_format = get_stream_format(data)
+        max_urls = BATCH_STREAM_MAX_URLS if stream_format else BATCH_MAX_URLS
+        
+        if len(urls) > max_urls:  # Ограничение на количество
             return jsonify({
                 'success': False,
-                'error': 'Maximum 10 URLs per batch request'
+                'error': f'Maximum {max_urls} URLs per batch request'
             }), 400
         
-        results = []
+        if stream_format:
+            return stream_batch(urls, stream_format, refresh, timings, fields, since)
         
-        for i, url in enumerate(urls):
-            # Валидация каждого URL
-            if not url.startswith('https://www.mos.ru/news/item/'):
-                results.append({
-                    'success': False,
-                    'error': 'Invalid URL format',
-                    'url': url
-                })
-                continue
-            
-            # Парсинг
-            result = parser.parse_news_article(url)
-            results.append(result)
+        # Параллельный парсинг, результаты в порядке входных URL
+        results = batch_executor.run(urls, refresh=refresh, timings=timings, fields=fields, since=since)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'total': len(results),
+            'successful': len([r for r in results if r.get('success')]),
+            'failed': len([r for r in results if not r.get('success')])
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Batch API error: {e}")
+        ERRORS.inc(stage='api', type=type(e).__name__)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/async/parse', methods=['GET', 'POST'])
+async def parse_article_async():
+    """
+    Асинхронный парсинг статьи
+    
+    POST /async/parse {"url": "..."} или GET /async/parse?url=...
+    
+    Загрузка идет через общий пул keep-alive соединений без блокировки
+    потока на сетевом ожидании и паузах между повторами. Если клиент
+    отключился (там, где сервер это показывает, см. client_disconnect_check),
+    загрузка отменяется.
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            url = data.get('url')
+            refresh = get_flag(data.get('refresh'))
+            want_timings = get_flag(data.get('timings'))
+            fields, error = get_fields(data.get('fields'))
+            since = data.get('since')
+        else:
+            url = request.args.get('url')
+            refresh = get_flag(request.args.get('refresh'))
+            want_timings = get_flag(request.args.get('timings'))
+            fields, error = get_fields(request.args.get('fields'))
+            since = request.args.get('since')
+        if not error:
+            since, error = get_since(since)
+        if error:
+            return bad_request(error)
+        
+        if not url:
+            return jsonify({
+                'success': False,
+                'error': 'URL is required'
+            }), 400
+        
+        # Валидация URL
+        if not url.startswith('https://www.mos.ru/news/item/'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid URL format. Expected: https://www.mos.ru/news/item/...',
+                'url': url
+            }), 400
+        
+        fetcher = parser.get_async_fetcher()
+        # Контекст с разбивкой времени передается в loop загрузчика вместе с корутиной
+        with collect_timings(want_timings) as timings:
+            result = await fetcher.wait(parser.parse_news_article_cached_async(url, refresh, fields, since),
+                                        client_disconnect_check())
+        result = with_timings(result, timings)
+        
+        if result['success']:
+            return jsonify(result), 200
+        else:
+            return error_response(result)
             
-            # Задержка между запросами (кроме последнего)
-            if i < len(urls) - 1:
-                time.sleep(delay)
+    except ClientDisconnected:
+        return client_gone(url)
+    except Exception as e:
+        logger.error(f"API error: {e}")
+        ERRORS.inc(stage='api', type=type(e).__name__)
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+@app.route('/async/batch', methods=['POST'])
+async def parse_batch_async():
+    """
+    Асинхронный пакетный парсинг
+    
+    POST /async/batch {"urls": [...]}
+    
+    Все загрузки пакета выполняются одновременно в event loop загрузчика,
+    число соединений ограничено ASYNC_POOL_SIZE, частота - общим лимитером.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'urls' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'URLs array is required in JSON body'
+            }), 400
+        
+        urls = data['urls']
+        refresh = get_flag(data.get('refresh'))
+        timings = get_flag(data.get('timings'))
+        fields, error = get_fields(data.get('fields'))
+        if not error:
+            since, error = get_since_map(data.get('since'))
+        if error:
+            return bad_request(error)
+        
+        if not isinstance(urls, list) or len(urls) == 0:
+            return jsonify({
+                'success': False,
+                'error': 'URLs must be a non-empty array'
+            }), 400
+        
+        if len(urls) > ASYNC_BATCH_MAX_URLS:
+            return jsonify({
+                'success': False,
+                'error': f'Maximum {ASYNC_BATCH_MAX_URLS} URLs per batch request'
+            }), 400
+        
+        fetcher = parser.get_async_fetcher()
+        results = await fetcher.wait(parser.parse_batch_async(urls, refresh, timings, fields, since),
+                                     client_disconnect_check())
         
         return jsonify({
             'success': True,
@@ -339,25 +1115,339 @@ def parse_batch():
             'failed': len([r for r in results if not r.get('success')])
         }), 200
         
+    except ClientDisconnected:
+        return client_gone()
     except Exception as e:
         logger.error(f"Batch API error: {e}")
+        ERRORS.inc(stage='api', type=type(e).__name__)
         return jsonify({
             'success': False,
             'error': 'Internal server error',
             'details': str(e)
         }), 500
 
+def get_page_params():
+    """limit/offset из параметров запроса или сообщение об ошибке"""
+    try:
+        limit = int(request.args.get('limit', STORE_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return None, None, 'limit and offset must be integers'
+    if not 1 <= limit <= STORE_PAGE_MAX or offset < 0:
+        return None, None, f'limit must be 1..{STORE_PAGE_MAX}, offset must be >= 0'
+    return limit, offset, None
+
+def get_store_filters():
+    """Фильтры tag/date_from/date_to или сообщение об ошибке"""
+    filters = {
+        'tag': request.args.get('tag'),
+        'date_from': request.args.get('date_from'),
+        'date_to': request.args.get('date_to')
+    }
+    for name in ('date_from', 'date_to'):
+        if filters[name]:
+            try:
+                datetime.fromisoformat(filters[name])
+            except ValueError:
+                return None, f'{name} must be a date in YYYY-MM-DD format'
+    return filters, None
+
+def store_disabled():
+    return jsonify({
+        'success': False,
+        'error': 'Article store is disabled (ARTICLE_STORE_DB is empty)'
+    }), 503
+
+@app.route('/articles', methods=['GET'])
+def list_articles():
+    """
+    Сохраненные статьи с фильтрами и постраничной выдачей
+    
+    GET /articles?tag=Транспорт&date_from=2024-05-01&date_to=2024-05-31&limit=20&offset=0
+    
+    Ответ строится по индексам хранилища без обращения к mos.ru,
+    новые статьи первыми.
+    """
+    if parser.store is None:
+        return store_disabled()
+    limit, offset, error = get_page_params()
+    filters, filter_error = get_store_filters()
+    if error or filter_error:
+        return jsonify({'success': False, 'error': error or filter_error}), 400
+    
+    started = time.perf_counter()
+    results, total = parser.store.query(limit=limit, offset=offset, **filters)
+    return jsonify({
+        'success': True,
+        'results': results,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    }), 200
+
+@app.route('/articles/search', methods=['GET'])
+def search_articles():
+    """
+    Полнотекстовый поиск по заголовку, тексту и тегам
+    
+    GET /articles/search?q=метро станция&tag=...&date_from=...&limit=20&offset=0
+    
+    Ищутся статьи, содержащие все слова; "слово*" - поиск по началу слова.
+    Результаты упорядочены по релевантности, поле "snippet" - фрагмент текста.
+    """
+    if parser.store is None:
+        return store_disabled()
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Query parameter "q" is required'
+        }), 400
+    limit, offset, error = get_page_params()
+    filters, filter_error = get_store_filters()
+    if error or filter_error:
+        return jsonify({'success': False, 'error': error or filter_error}), 400
+    
+    started = time.perf_counter()
+    results, total = parser.store.search(query, limit=limit, offset=offset, **filters)
+    return jsonify({
+        'success': True,
+        'query': query,
+        'results': results,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    }), 200
+
+@app.route('/articles/<int:item_id>', methods=['GET'])
+def get_article(item_id):
+    """Сохраненная статья по ID новости"""
+    if parser.store is None:
+        return store_disabled()
+    article = parser.store.get(item_id)
+    if article is None:
+        return jsonify({
+            'success': False,
+            'error': f'Article {item_id} is not stored'
+        }), 404
+    return jsonify({'success': True, **article}), 200
+
+@app.route('/prefetch/start', methods=['POST'])
+def prefetch_start():
+    """
+    Запуск фоновой загрузки новых новостей
+    
+    POST /prefetch/start
+    {
+        "interval": 300,
+        "lookback_hours": 6,
+        "rate": 0.2,
+        "max_items": 100
+    }
+    
+    Все параметры необязательны, по умолчанию берутся из PREFETCH_*.
+    Новости из лент PREFETCH_SOURCES моложе lookback_hours разбираются
+    в кэш, и /parse отдает их без загрузки.
+    """
+    data = request.get_json(silent=True) or {}
+    settings = {}
+    for name, key, cast in (('interval', 'interval', int), ('lookback', 'lookback_hours', float),
+                            ('rate', 'rate', float), ('max_items', 'max_items', int)):
+        if data.get(key) is None:
+            continue
+        try:
+            value = cast(data[key])
+        except (TypeError, ValueError):
+            value = 0
+        if value <= 0:
+            return jsonify({
+                'success': False,
+                'error': f'"{key}" must be a positive number'
+            }), 400
+        settings[name] = value * 3600 if key == 'lookback_hours' else value
+    
+    prefetcher.configure(**settings)
+    started = prefetcher.start()
+    return jsonify({
+        'success': True,
+        'started': started,
+        'status': prefetcher.get_status()
+    }), 200
+
+@app.route('/prefetch/stop', methods=['POST'])
+def prefetch_stop():
+    """Остановка фоновой загрузки"""
+    stopped = prefetcher.stop()
+    return jsonify({
+        'success': True,
+        'stopped': stopped,
+        'status': prefetcher.get_status()
+    }), 200
+
+@app.route('/prefetch/status', methods=['GET'])
+def prefetch_status():
+    """Состояние фоновой загрузки: опросы, найденные и загруженные новости, ошибки"""
+    return jsonify(prefetcher.get_status())
+
+def jobs_disabled():
+    return jsonify({
+        'success': False,
+        'error': 'Job queue is disabled (JOBS_DB is empty)'
+    }), 503
+
+def job_not_found(job_id):
+    return jsonify({
+        'success': False,
+        'error': f'Job {job_id} not found'
+    }), 404
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Задание на парсинг большого списка URL
+    
+    POST /jobs
+    {
+        "urls": ["https://www.mos.ru/news/item/154988073/", ...],
+        "refresh": false,
+        "fields": ["title", "date"]
+    }
+    
+    Сразу возвращает ID задания (202), URL разбираются фоновыми воркерами.
+    Задания хранятся в JOBS_DB и продолжаются после перезапуска сервиса.
+    """
+    if job_queue is None:
+        return jobs_disabled()
+    data = request.get_json(silent=True)
+    if not data or 'urls' not in data:
+        return jsonify({
+            'success': False,
+            'error': 'URLs array is required in JSON body'
+        }), 400
+    
+    urls = data['urls']
+    if not isinstance(urls, list) or len(urls) == 0:
+        return jsonify({
+            'success': False,
+            'error': 'URLs must be a non-empty array'
+        }), 400
+    if len(urls) > JOB_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'Maximum {JOB_MAX_URLS} URLs per job'
+        }), 400
+    # Строка с неверным URL - ошибка своего элемента в результатах, не строка - ошибка запроса
+    if not all(isinstance(url, str) for url in urls):
+        return bad_request('URLs must be strings')
+    fields, error = get_fields(data.get('fields'))
+    if error:
+        return bad_request(error)
+    
+    options = {'refresh': get_flag(data.get('refresh'))}
+    if fields is not None:
+        options['fields'] = sorted(fields)
+    job_id = job_queue.submit(urls, **options)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'total': len(urls),
+        'status_url': f'/jobs/{job_id}',
+        'results_url': f'/jobs/{job_id}/results'
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Прогресс задания: число URL done/failed/pending/running"""
+    if job_queue is None:
+        return jobs_disabled()
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    return jsonify({'success': True, **job}), 200
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Отмена задания: необработанные URL не загружаются"""
+    if job_queue is None:
+        return jobs_disabled()
+    cancelled = job_queue.cancel(job_id)
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    return jsonify({'success': True, 'cancelled': cancelled, **job}), 200
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """
+    Результаты задания постранично
+    
+    GET /jobs/<id>/results?offset=0&limit=100&status=failed
+    
+    Готовые результаты в порядке входного списка, поле "index" - позиция URL.
+    status=done или failed - только успешные или только ошибки.
+    """
+    if job_queue is None:
+        return jobs_disabled()
+    try:
+        limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit and offset must be integers'}), 400
+    status = request.args.get('status')
+    if not 1 <= limit <= JOB_RESULTS_PAGE_MAX or offset < 0 or status not in (None, 'done', 'failed'):
+        return jsonify({
+            'success': False,
+            'error': f'limit must be 1..{JOB_RESULTS_PAGE_MAX}, offset must be >= 0, status must be done or failed'
+        }), 400
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    results = job_queue.results(job_id, offset, limit, status)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job['status'],
+        'results': results,
+        'limit': limit,
+        'offset': offset,
+        'next_offset': offset + len(results) if len(results) == limit else None
+    }), 200
+
 @app.route('/', methods=['GET'])
 def api_info():
     """Информация об API"""
     return jsonify({
         'service': 'MosRu News Parser API',
+        'status': 'running',
         'version': '1.0',
+        'mode': SERVICE_MODE,
         'endpoints': {
             'GET /health': 'Health check',
-            'POST /parse': 'Parse single article (JSON: {"url": "..."})',
-            'GET /parse?url=': 'Parse single article (URL parameter)',
-            'POST /batch': 'Parse multiple articles (JSON: {"urls": [...], "delay": 2})'
+            'GET /metrics': 'Prometheus metrics',
+            'POST /parse': 'Parse single article (JSON: {"url": "...", "timings": true, "fields": ["title", "date"], "since": {fingerprint}})',
+            'GET /parse?url=': 'Parse single article (URL parameter, fields=title,date)',
+            'POST /batch': 'Parse multiple articles (JSON: {"urls": [...], "stream": "ndjson" | "sse"})',
+            'POST /async/parse': 'Parse single article with non-blocking fetch (JSON: {"url": "..."})',
+            'GET /async/parse?url=': 'Parse single article with non-blocking fetch (URL parameter)',
+            'POST /async/batch': 'Parse multiple articles concurrently (JSON: {"urls": [...]})',
+            'GET /articles': 'Stored articles (params: tag, date_from, date_to, limit, offset)',
+            'GET /articles/search?q=': 'Full-text search in stored articles',
+            'GET /articles/<id>': 'Stored article by news ID',
+            'POST /prefetch/start': 'Start background prefetch of new articles (JSON: {"interval": 300, "lookback_hours": 6})',
+            'POST /prefetch/stop': 'Stop background prefetch',
+            'GET /prefetch/status': 'Background prefetch status',
+            'POST /jobs': 'Submit a large batch as a background job (JSON: {"urls": [...]})',
+            'GET /jobs/<id>': 'Job progress (done, failed, pending)',
+            'GET /jobs/<id>/results': 'Job results page (params: offset, limit, status)',
+            'DELETE /jobs/<id>': 'Cancel a job'
+        },
+        'fields': list(ARTICLE_FIELDS),
+        'formats': {
+            'msgpack': 'Accept: application/msgpack or ?format=msgpack',
+            'compression': response_compressor.encodings if response_compressor else []
         },
         'examples': {
             'single_parse': 'curl -X POST -H "Content-Type: application/json" -d \'{"url":"https://www.mos.ru/news/item/154988073/"}\' http://localhost:5000/parse',
@@ -0,0 +1,125 @@
+"""
+Настройки gunicorn для продакшена вместо отладочного app.run.
+
+    gunicorn -c gunicorn.conf.py
+    SERVER_WORKER_CLASS=uvicorn WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py
+
+Приложение загружается в мастере до fork (preload), и воркеры делят
+память импортированных модулей copy-on-write. Пул разбора, очередь
+заданий и фоновая загрузка запускаются после fork: очередь и загрузка -
+в одном воркере, его определяет блокировка файла BACKGROUND_LOCK.
+Лимит MOSRU_RATE и всплеск MOSRU_BURST - общие на сервис, они делятся
+между воркерами; всплеск воркера - не меньше одного запроса, иначе
+в ведре никогда не набирается целый токен и даже первый запрос
+простаивающего воркера ждет. С COORDINATION_DB воркеры (и другие
+экземпляры) делят один бюджет в файле координации, и делить его не нужно.
+Так же делится PARSE_PROCESSES (по умолчанию - число ядер): пул разбора
+есть в каждом воркере, и без деления процессов было бы ядер в квадрате.
+
+Метрики и /health у каждого воркера свои; номер воркера (метка worker)
+берется блокировкой файла WORKER_LOCK_PREFIX-<номер>, и перезапущенный
+воркер получает номер прежнего.
+"""
+import fcntl
+import gc
+import importlib
+import multiprocessing
+import os
+import tempfile
+
+port = int(os.environ.get('PORT', 5000))
+bind = os.environ.get('BIND', f'0.0.0.0:{port}')
+
+# Класс воркеров: gthread (WSGI, потоки) или uvicorn (ASGI через asgi.py)
+SERVER_WORKER_CLASS = os.environ.get('SERVER_WORKER_CLASS', 'gthread')
+if SERVER_WORKER_CLASS == 'uvicorn':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = os.environ.get('APP_MODULE', 'asgi:app')
+else:
+    worker_class = SERVER_WORKER_CLASS
+    wsgi_app = os.environ.get('APP_MODULE', 'flask_api_parser:app')
+
+# Разбор HTML упирается в CPU - по воркеру на ядро; потоки ждут mos.ru
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or multiprocessing.cpu_count()
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Перезапуск воркера после N запросов (со случайным разбросом) против роста памяти
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Разбор с повторами может идти десятки секунд; при остановке воркер
+# дорабатывает начатые запросы не дольше graceful_timeout
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+loglevel = os.environ.get('LOG_LEVEL', 'info')
+
+BACKGROUND_LOCK = os.environ.get('BACKGROUND_LOCK',
+                                 os.path.join(tempfile.gettempdir(), f'mosru-background-{port}.lock'))
+WORKER_LOCK_PREFIX = os.environ.get('WORKER_LOCK_PREFIX',
+                                    os.path.join(tempfile.gettempdir(), f'mosru-worker-{port}'))
+
+MOSRU_RATE = float(os.environ.get('MOSRU_RATE', 1.0))
+MOSRU_BURST = float(os.environ.get('MOSRU_BURST', 3))
+MOSRU_MIN_RATE = float(os.environ.get('MOSRU_MIN_RATE', 0.1))
+rate_shares = 1 if os.environ.get('COORDINATION_DB') else workers
+# Процессов разбора на весь сервис (PARSE_POOL=true)
+PARSE_PROCESSES = int(os.environ.get('PARSE_PROCESSES', 0)) or multiprocessing.cpu_count()
+
+# Переменные окружения приложения; выставляются до загрузки приложения
+raw_env = [
+    'SERVER_MANAGED=true',
+    f'MOSRU_RATE={MOSRU_RATE / rate_shares}',
+    f'MOSRU_BURST={max(1.0, MOSRU_BURST / rate_shares)}',
+    f'MOSRU_MIN_RATE={MOSRU_MIN_RATE / rate_shares}',
+    f'PARSE_PROCESSES={max(1, PARSE_PROCESSES // workers)}',
+]
+
+
+def app_module():
+    return importlib.import_module(wsgi_app.split(':')[0])
+
+
+def when_ready(server):
+    # Объекты, созданные при preload, исключаются из сборки мусора: иначе
+    # обход GC в воркерах трогает их страницы и copy-on-write не работает
+    gc.freeze()
+
+
+def try_lock(path):
+    """Открытый файл с эксклюзивной блокировкой или None, если ее держит другой воркер"""
+    lock = open(path, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def worker_slot():
+    """Свободный номер воркера и его блокировка (прежний воркер мог еще не выйти - номеров с запасом)"""
+    for slot in range(workers * 2):
+        lock = try_lock(f'{WORKER_LOCK_PREFIX}-{slot}.lock')
+        if lock is not None:
+            return slot, lock
+    return None, None
+
+
+def post_fork(server, worker):
+    init_worker = getattr(app_module(), 'init_worker', None)
+    if init_worker is None:
+        return
+    # Файлы держатся открытыми, пока жив воркер; после его перезапуска
+    # блокировки берет следующий новый воркер
+    worker.background_lock = try_lock(BACKGROUND_LOCK)
+    slot, worker.slot_lock = worker_slot()
+    init_worker(background=worker.background_lock is not None, worker=slot)
+
+
+def worker_exit(server, worker):
+    shutdown_worker = getattr(app_module(), 'shutdown_worker', None)
+    if shutdown_worker is not None:
+        shutdown_worker(graceful_timeout)
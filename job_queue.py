@@ -0,0 +1,272 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+
+from sqlite_local import LocalConnection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS jobs ('
+    'job_id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL, options TEXT NOT NULL, '
+    'created_at REAL NOT NULL, finished_at REAL)',
+    'CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)',
+    'CREATE TABLE IF NOT EXISTS job_items ('
+    'job_id TEXT NOT NULL, idx INTEGER NOT NULL, url TEXT NOT NULL, status TEXT NOT NULL, '
+    'result TEXT, updated_at REAL, owner TEXT, PRIMARY KEY (job_id, idx)) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS job_items_status ON job_items (job_id, status, idx)',
+]
+
+# Состояния задания и отдельного URL
+ACTIVE = 'active'
+DONE = 'done'
+CANCELLED = 'cancelled'
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """
+    Очередь заданий на парсинг больших списков URL.
+
+    Задания и их URL хранятся в SQLite и переживают перезапуск: URL,
+    которые обрабатывались в момент остановки, снова становятся pending.
+    Фоновые воркеры (workers потоков) берут URL по кругу из активных
+    заданий, у одного задания одновременно обрабатывается не больше
+    per_job URL - большое задание не занимает всех воркеров.
+
+    worker(url, **options) возвращает словарь результата с полем 'success'.
+
+    С coordinator (coordination.Coordinator) очередь в общем файле делят
+    несколько экземпляров сервиса: URL забирается одним UPDATE и помечается
+    экземпляром-владельцем, per_job действует в каждом экземпляре, новые
+    задания других экземпляров замечаются не позже чем через секунду.
+    URL, которые держит экземпляр, переставший отмечаться, возвращаются
+    в очередь живыми экземплярами.
+    """
+
+    def __init__(self, path, worker, workers=4, per_job=2, coordinator=None):
+        self.path = path
+        self.worker = worker
+        self.workers = workers
+        self.per_job = per_job
+        self.coordinator = coordinator
+        # Задания других экземпляров не будят воркеры - опрос чаще
+        self.poll_interval = 1 if coordinator else 5
+        self._connect = LocalConnection(path, timeout=30)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.running = Counter()
+        self.threads = []
+        self.stopping = False
+        self.stopped = threading.Event()
+        with self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            # Файлы, созданные до появления владельца URL
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(job_items)')]
+            if 'owner' not in columns:
+                conn.execute('ALTER TABLE job_items ADD COLUMN owner TEXT')
+
+    @property
+    def owner(self):
+        return self.coordinator.instance_id if self.coordinator else None
+
+    def _resume(self):
+        """Возвращает в очередь прерванные URL: все или, с coordinator, URL неживых экземпляров"""
+        query, params = 'UPDATE job_items SET status = ?, owner = NULL WHERE status = ?', [PENDING, RUNNING]
+        if self.coordinator:
+            self.coordinator.heartbeat()
+            live = self.coordinator.live_instances()
+            query += f" AND (owner IS NULL OR owner NOT IN ({', '.join('?' * len(live))}))"
+            params += live
+        with self._connect() as conn:
+            resumed = conn.execute(query, params).rowcount
+        if resumed:
+            logger.info(f"Resuming {resumed} interrupted job items")
+
+    def _reclaim(self):
+        # Возврат URL упавших экземпляров - отдельно от воркеров, которые могут долго ждать mos.ru
+        while not self.stopped.wait(self.coordinator.heartbeat_ttl / 3):
+            try:
+                self._resume()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue reclaim failed: {e}")
+
+    def start(self):
+        """Возвращает прерванные URL в очередь и запускает воркеры"""
+        self._resume()
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        if self.coordinator:
+            thread = threading.Thread(target=self._reclaim, name='job-reclaim', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=10):
+        with self.wakeup:
+            self.stopping = True
+            self.wakeup.notify_all()
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def submit(self, urls, **options):
+        """Создает задание, возвращает его ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, status, total, options, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, ACTIVE, len(urls), json.dumps(options), now)
+            )
+            conn.executemany(
+                'INSERT INTO job_items (job_id, idx, url, status, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(job_id, index, url, PENDING, now) for index, url in enumerate(urls)]
+            )
+        with self.wakeup:
+            self.wakeup.notify_all()
+        logger.info(f"Job {job_id} submitted: {len(urls)} URLs")
+        return job_id
+
+    def cancel(self, job_id):
+        """Отменяет необработанные URL задания; False - задание не найдено или завершено"""
+        with self._connect() as conn:
+            updated = conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = ?',
+                (CANCELLED, time.time(), job_id, ACTIVE)
+            ).rowcount
+            if updated:
+                conn.execute(
+                    'UPDATE job_items SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?',
+                    (CANCELLED, time.time(), job_id, PENDING)
+                )
+        return bool(updated)
+
+    def _claim(self):
+        """Следующий URL: задания с наименьшим числом URL в работе, затем старые"""
+        conn = self._connect()
+        jobs = [row[0] for row in conn.execute(
+            'SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at', (ACTIVE,)
+        )]
+        for job_id in sorted(jobs, key=lambda job_id: self.running[job_id]):
+            if self.running[job_id] >= self.per_job:
+                continue
+            # Выбор и захват URL одним запросом - другой экземпляр не возьмет тот же URL
+            with conn:
+                row = conn.execute(
+                    'UPDATE job_items SET status = ?, owner = ?, updated_at = ? WHERE job_id = ? AND idx = ('
+                    'SELECT idx FROM job_items WHERE job_id = ? AND status = ? ORDER BY idx LIMIT 1) '
+                    'RETURNING idx, url',
+                    (RUNNING, self.owner, time.time(), job_id, job_id, PENDING)
+                ).fetchone()
+            if row is None:
+                self._finish_if_complete(conn, job_id)
+                continue
+            self.running[job_id] += 1
+            options = json.loads(conn.execute(
+                'SELECT options FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()[0])
+            return job_id, row[0], row[1], options
+        return None
+
+    def _finish_if_complete(self, conn, job_id):
+        if self.running[job_id]:
+            return
+        left = conn.execute(
+            'SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN (?, ?)', (job_id, PENDING, RUNNING)
+        ).fetchone()[0]
+        if not left:
+            with conn:
+                finished = conn.execute(
+                    'UPDATE jobs SET status = ?, finished_at = ? WHERE job_id = ? AND status = ?',
+                    (DONE, time.time(), job_id, ACTIVE)
+                ).rowcount
+            if finished:
+                logger.info(f"Job {job_id} finished")
+
+    def _run(self):
+        while True:
+            with self.wakeup:
+                task = None
+                while not self.stopping:
+                    task = self._claim()
+                    if task is not None:
+                        break
+                    # Новые задания будят воркеры сразу, таймаут - страховка
+                    self.wakeup.wait(self.poll_interval)
+                if self.stopping:
+                    return
+
+            job_id, index, url, options = task
+            try:
+                result = self.worker(url, **options)
+            except Exception as e:
+                logger.error(f"Job {job_id} item {index} failed: {e}")
+                result = {'success': False, 'error': str(e), 'url': url}
+
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'UPDATE job_items SET status = ?, result = ?, updated_at = ? WHERE job_id = ? AND idx = ?',
+                    (DONE if result.get('success') else FAILED, json.dumps(result, ensure_ascii=False),
+                     time.time(), job_id, index)
+                )
+            with self.wakeup:
+                self.running[job_id] -= 1
+                if not self.running[job_id]:
+                    del self.running[job_id]
+                self._finish_if_complete(conn, job_id)
+                # Освободилось место в задании - его может взять ждущий воркер
+                self.wakeup.notify()
+
+    def get(self, job_id):
+        """Состояние задания с числом URL по статусам или None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT status, total, options, created_at, finished_at FROM jobs WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, total, options, created_at, finished_at = row
+        counts = dict(conn.execute(
+            'SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status', (job_id,)
+        ).fetchall())
+        return {
+            'job_id': job_id,
+            'status': status,
+            'total': total,
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'pending': counts.get(PENDING, 0),
+            'running': counts.get(RUNNING, 0),
+            'cancelled': counts.get(CANCELLED, 0),
+            'options': json.loads(options),
+            'created_at': created_at,
+            'finished_at': finished_at
+        }
+
+    def results(self, job_id, offset=0, limit=100, status=None):
+        """Результаты обработанных URL в порядке входного списка"""
+        statuses = [status] if status else [DONE, FAILED]
+        placeholders = ', '.join('?' * len(statuses))
+        rows = self._connect().execute(
+            f'SELECT idx, status, result FROM job_items WHERE job_id = ? AND status IN ({placeholders}) '
+            'ORDER BY idx LIMIT ? OFFSET ?',
+            [job_id] + statuses + [limit, offset]
+        ).fetchall()
+        return [{'index': index, 'status': item_status, **json.loads(result)} for index, item_status, result in rows]
+
+    def get_stats(self):
+        with self.lock:
+            running = sum(self.running.values())
+        active = self._connect().execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (ACTIVE,)).fetchone()[0]
+        return {'workers': self.workers, 'per_job': self.per_job, 'active_jobs': active, 'running': running,
+                'shared': self.coordinator is not None}
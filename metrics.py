@@ -0,0 +1,288 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None, const=()):
+    pairs = list(const) + list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """Метрика с набором меток, значения хранятся по кортежу значений меток"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+    def samples(self, const=()):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f'{self.name}{format_labels(self.labelnames, key, const=const)} {format_value(value)}'
+                for key, value in items]
+
+    def render(self, const=()):
+        """Текст метрики; const - метки процесса (worker) перед собственными"""
+        return self.header() + self.samples(const)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self, const=()):
+        with self.lock:
+            items = sorted((key, dict(state, counts=list(state['counts']))) for key, state in self.values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, ('le', format_value(float(bound))), const)
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = format_labels(self.labelnames, key, const=const)
+            lines.append(f'{self.name}_sum{labels} {format_value(state["sum"])}')
+            lines.append(f'{self.name}_count{labels} {state["count"]}')
+        return lines
+
+
+class CallbackMetric(Metric):
+    """
+    Значение читается при каждой выдаче метрик.
+
+    func возвращает число или словарь {значение метки: число} для одной метки.
+    """
+
+    def __init__(self, name, documentation, metric_type, func, labelname=None):
+        super().__init__(name, documentation, (labelname,) if labelname else ())
+        self.type = metric_type
+        self.func = func
+
+    def samples(self, const=()):
+        value = self.func()
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [f'{self.name}{format_labels((), (), const=const)} {format_value(value)}']
+        return [
+            f'{self.name}{format_labels(self.labelnames, (label,), const=const)} {format_value(item)}'
+            for label, item in sorted(value.items())
+        ]
+
+
+class Registry:
+    """
+    Набор метрик процесса и их выдача в текстовом формате Prometheus.
+
+    Значения не агрегируются между процессами: у каждого воркера gunicorn
+    свои счетчики. set_worker() добавляет ко всем метрикам метку worker,
+    чтобы ряды разных воркеров за балансировщиком не смешивались (и каждый
+    оставался монотонным); сумма по сервису - sum without (worker).
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.const = ()
+
+    def set_worker(self, worker):
+        self.const = (('worker', worker),)
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, metric_type, func, labelname=None):
+        return self.register(CallbackMetric(name, documentation, metric_type, func, labelname))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render(self.const))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'mosru_request_duration_seconds', 'Total API request time',
+    ('endpoint', 'method', 'status')
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'mosru_requests_in_flight', 'API requests being processed', ('endpoint',)
+)
+FETCH_SECONDS = REGISTRY.histogram(
+    'mosru_fetch_duration_seconds', 'Page fetch time including retries and waits', ('mode',)
+)
+WAIT_SECONDS = REGISTRY.histogram(
+    'mosru_wait_duration_seconds', 'Time spent waiting before requests to mos.ru', ('reason',)
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    'mosru_parse_duration_seconds', 'HTML parse and extraction time', ('backend',)
+)
+EXTRACT_STEP_SECONDS = REGISTRY.histogram(
+    'mosru_extract_step_duration_seconds', 'Extraction step time', ('step',)
+)
+RETRIES = REGISTRY.counter('mosru_fetch_retries_total', 'Repeated fetch attempts', ('mode',))
+RATE_LIMITED = REGISTRY.counter('mosru_rate_limited_total', 'HTTP 429/503 responses from mos.ru', ('mode',))
+ERRORS = REGISTRY.counter('mosru_errors_total', 'Errors by stage and type', ('stage', 'type'))
+HTTP_REQUESTS = REGISTRY.counter('mosru_http_requests_total', 'HTTP requests sent to mos.ru', ('mode',))
+CONNECTIONS_OPENED = REGISTRY.counter(
+    'mosru_connections_opened_total', 'New connections to mos.ru (the rest reused keep-alive)', ('mode',)
+)
+CONNECT_SECONDS = REGISTRY.histogram(
+    'mosru_connect_duration_seconds', 'TCP connect and TLS handshake time', ('mode',)
+)
+DNS_LOOKUPS = REGISTRY.counter('mosru_dns_lookups_total', 'DNS cache lookups by result', ('mode', 'result'))
+DOWNLOAD_BYTES = REGISTRY.counter(
+    'mosru_download_bytes_total', 'Response body bytes downloaded from mos.ru', ('mode',)
+)
+DOWNLOAD_SAVED_BYTES = REGISTRY.counter(
+    'mosru_download_saved_bytes_total', 'Response body bytes not downloaded thanks to early termination', ('mode',)
+)
+DOWNLOAD_TRUNCATED = REGISTRY.counter(
+    'mosru_download_truncated_total', 'Downloads cut short (article_end, too_large)', ('mode', 'reason')
+)
+INCREMENTAL_RESULTS = REGISTRY.counter(
+    'mosru_incremental_results_total', 'Incremental parse results (not_modified, diff, full)', ('result',)
+)
+
+# Разбивка времени текущего запроса к API, если клиент ее запросил
+_timings = contextvars.ContextVar('timings', default=None)
+
+
+def record_timing(name, seconds):
+    """Добавляет время этапа в разбивку текущего запроса"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram, name=None, **labels):
+    """Замер блока в гистограмму и, если задано имя, в разбивку запроса"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if name:
+            record_timing(name, elapsed)
+
+
+@contextmanager
+def collect_timings(enabled=True):
+    """
+    Собирает разбивку времени по этапам для кода внутри блока.
+
+    Отдает словарь (или None, если разбивка не нужна), который
+    заполняется к выходу из блока; этап 'total' - общее время.
+    """
+    if not enabled:
+        yield None
+        return
+    timings = {}
+    token = _timings.set(timings)
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings['total'] = time.perf_counter() - started
+        _timings.reset(token)
+
+
+def with_timings(result, timings):
+    """Ответ с полем 'timings' в миллисекундах"""
+    if timings is None:
+        return result
+    return {**result, 'timings': {name: round(seconds * 1000, 3) for name, seconds in timings.items()}}
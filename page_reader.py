@@ -0,0 +1,245 @@
+import re
+
+from extractors import RegionMatcher
+from metrics import DOWNLOAD_BYTES, DOWNLOAD_SAVED_BYTES, DOWNLOAD_TRUNCATED
+
+CHUNK_SIZE = 16384
+
+TAG_RE = re.compile(rb'<(/?)([A-Za-z][A-Za-z0-9:-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+ATTR_RE = re.compile(rb'([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+)))?')
+RAW_TEXT_TAGS = (b'script', b'style')
+VOID_TAGS = frozenset((b'area', b'base', b'br', b'col', b'embed', b'hr', b'img', b'input', b'link', b'meta',
+                       b'source', b'track', b'wbr'))
+RAW_TEXT_END_RE = {name: re.compile(rb'</' + name + rb'\s*>', re.I) for name in RAW_TEXT_TAGS}
+CHARSET_RE = re.compile(r'charset=["\']?([\w-]+)', re.I)
+
+
+class PageTooLarge(Exception):
+    """Тело ответа больше допустимого размера"""
+
+
+def parse_attrs(raw):
+    attrs = {}
+    for match in ATTR_RE.finditer(raw):
+        value = next((v for v in match.groups()[1:] if v is not None), b'')
+        attrs[match.group(1).decode('latin-1').lower()] = value.decode('utf-8', 'replace')
+    return attrs
+
+
+class ArticleEndScanner:
+    """
+    Находит в потоке HTML место, после которого экстрактору ничего не нужно:
+    закрыты первые подходящие элементы всех регионов полей - заголовка (h1),
+    текста (первый блок content), даты (первый селектор) и тегов. Кандидаты
+    внутри ненужных блоков (шапка, меню, подвал) пропускаются, как при
+    разборе; заголовок, как и экстрактор, берется и из них. Пока какой-то
+    регион не встретился, загрузка не обрезается.
+
+    Части тела подаются в feed() по мере загрузки; разбираются только
+    теги, содержимое script/style и комментарии пропускаются. feed()
+    возвращает смещение в байтах сразу после закрывающего тега последнего
+    из регионов (не зависит от размера частей) или None, пока они не закрыты.
+    """
+
+    def __init__(self, rules):
+        # Заголовок и дата - первый селектор по приоритету: более поздний элемент
+        # с ним вытеснил бы найденный по запасному
+        self.regions = {
+            'title': RegionMatcher(rules.title[:1]),
+            'content': RegionMatcher([rules.content]),
+            'date': RegionMatcher(rules.date[:1]),
+            'tags': RegionMatcher(rules.tags)
+        }
+        self.unwanted = rules.unwanted_matcher
+        self.buffer = bytearray()
+        # Смещение начала буфера в потоке
+        self.base = 0
+        self.raw_text_end = None
+        # Открытые элементы: регион -> [тег, глубина]; ненужный блок - [тег, глубина]
+        self.open = {}
+        self.skipped = None
+        self.done = set()
+        self.end = None
+
+    def feed(self, chunk):
+        if self.end is not None:
+            return self.end
+        self.buffer += chunk
+        buffer = self.buffer
+        pos = 0
+        while True:
+            if self.raw_text_end is not None:
+                match = self.raw_text_end.search(buffer, pos)
+                if match is None:
+                    # Закрывающий тег мог разрезаться между частями
+                    pos = max(pos, len(buffer) - 16)
+                    break
+                pos = match.end()
+                self.raw_text_end = None
+                continue
+
+            start = buffer.find(b'<', pos)
+            if start == -1:
+                pos = len(buffer)
+                break
+            if len(buffer) - start < 4:
+                pos = start
+                break
+            if buffer.startswith(b'<!--', start):
+                close = buffer.find(b'-->', start + 4)
+                if close == -1:
+                    pos = start
+                    break
+                pos = close + 3
+                continue
+
+            match = TAG_RE.match(buffer, start)
+            if match is None:
+                if buffer.find(b'>', start) == -1:
+                    # Тег еще не загружен целиком
+                    pos = start
+                    break
+                pos = start + 1
+                continue
+            pos = match.end()
+            closing, name, raw_attrs = match.group(1), match.group(2).lower(), match.group(3)
+            if name in VOID_TAGS or raw_attrs.rstrip().endswith(b'/'):
+                # Пустые элементы не открывают регион и не меняют глубину
+                continue
+            if not closing and name in RAW_TEXT_TAGS:
+                self.raw_text_end = RAW_TEXT_END_RE[name]
+                continue
+
+            if self.open or self.skipped is not None or not closing:
+                if self.track(closing, name, raw_attrs) and len(self.done) == len(self.regions):
+                    self.end = self.base + pos
+                    self.buffer = bytearray()
+                    return self.end
+
+        del buffer[:pos]
+        self.base += pos
+        return None
+
+    def track(self, closing, name, raw_attrs):
+        """Учитывает тег; True - закрылся элемент региона"""
+        closed = False
+        for element in list(self.open.values()) + ([self.skipped] if self.skipped else []):
+            if element[0] == name:
+                element[1] += -1 if closing else 1
+        for region, element in list(self.open.items()):
+            if element[1] == 0:
+                del self.open[region]
+                self.done.add(region)
+                closed = True
+        if self.skipped is not None and self.skipped[1] == 0:
+            self.skipped = None
+        if closing:
+            return closed
+
+        tag, attrs = name.decode('latin-1'), parse_attrs(raw_attrs)
+        # Ненужный блок удаляется вместе с кандидатами внутри него (кроме заголовка)
+        unwanted = self.skipped is not None or self.unwanted.matches(tag, attrs)
+        for region, matcher in self.regions.items():
+            if region in self.done or region in self.open or (unwanted and region != 'title'):
+                continue
+            if matcher.matches(tag, attrs):
+                self.open[region] = [name, 1]
+        if self.skipped is None and unwanted:
+            self.skipped = [name, 1]
+        return closed
+
+
+class BodyReader:
+    """
+    Чтение тела ответа по частям с ограничением размера max_bytes.
+
+    С scanner тело обрезается после конца блока статьи. Остаток ответа
+    дочитывается (без сохранения), только если он не больше drain_bytes:
+    тогда соединение возвращается в пул keep-alive, иначе закрывается.
+
+    wire_bytes() - сколько байт тела загружено по сети (до распаковки);
+    без него считаются распакованные байты, и content_length передается,
+    только если ответ не сжат.
+    """
+
+    def __init__(self, mode, max_bytes, scanner=None, drain_bytes=65536, content_length=None, wire_bytes=None):
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.scanner = scanner
+        self.drain_bytes = drain_bytes
+        self.content_length = content_length
+        self.wire_bytes = wire_bytes or (lambda: self.received)
+        self.parts = []
+        self.received = 0
+        self.end = None
+        if max_bytes and content_length is not None and content_length > max_bytes:
+            DOWNLOAD_TRUNCATED.inc(mode=mode, reason='too_large')
+            raise PageTooLarge(f"Page is {content_length} bytes, limit is {max_bytes}")
+
+    def feed(self, chunk):
+        """Принимает часть тела; False - дальше не читать"""
+        self.received += len(chunk)
+        if self.end is not None:
+            return self.received - self.end <= self.drain_bytes
+        self.parts.append(chunk)
+        if self.scanner is not None:
+            self.end = self.scanner.feed(chunk)
+            if self.end is not None:
+                # Известен размер остатка - большой остаток не дочитывается
+                left = self.content_length - self.wire_bytes() if self.content_length is not None else 0
+                return left <= self.drain_bytes and self.received - self.end <= self.drain_bytes
+        if self.max_bytes and self.received > self.max_bytes:
+            DOWNLOAD_TRUNCATED.inc(mode=self.mode, reason='too_large')
+            raise PageTooLarge(f"Page exceeds {self.max_bytes} bytes")
+        return True
+
+    def read(self, chunks):
+        """Читает тело из итератора частей, возвращает страницу"""
+        for chunk in chunks:
+            if not self.feed(chunk):
+                return self.finish(False)
+        return self.finish(True)
+
+    async def read_async(self, chunks):
+        """То же для асинхронного итератора частей"""
+        async for chunk in chunks:
+            if not self.feed(chunk):
+                return self.finish(False)
+        return self.finish(True)
+
+    def finish(self, complete):
+        """Тело страницы; complete - ответ дочитан до конца"""
+        content = b''.join(self.parts)
+        if self.end is not None:
+            DOWNLOAD_TRUNCATED.inc(mode=self.mode, reason='article_end')
+            content = content[:self.end]
+        downloaded = self.wire_bytes()
+        DOWNLOAD_BYTES.inc(downloaded, mode=self.mode)
+        if not complete and self.content_length is not None:
+            DOWNLOAD_SAVED_BYTES.inc(max(0, self.content_length - downloaded), mode=self.mode)
+        return content
+
+
+class Page:
+    """Загруженная страница: статус, заголовки и тело (возможно, обрезанное)"""
+
+    def __init__(self, status_code, headers, content=b''):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        match = CHARSET_RE.search(self.headers.get('Content-Type', ''))
+        try:
+            return self.content.decode(match.group(1) if match else 'utf-8', 'replace')
+        except LookupError:
+            return self.content.decode('utf-8', 'replace')
+
+
+def content_length(headers):
+    """Размер тела из Content-Length или None"""
+    try:
+        return int(headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from extractors import get_extractor
+
+logger = logging.getLogger(__name__)
+
+# Бэкенд извлечения в процессе-воркере, создается инициализатором
+_extractor = None
+
+
+def _init_worker(backend, selective):
+    global _extractor
+    _extractor = get_extractor(backend, selective)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _extract(content, fields=None):
+    # Время этапов возвращается вместе с полями - метрики собирает главный процесс
+    steps = {}
+    return _extractor.extract(content, steps, fields), steps
+
+
+class ParsePool:
+    """
+    Пул процессов для разбора HTML.
+
+    Разбор - чистая CPU-работа и в потоках упирается в GIL. Пул получает
+    сырые байты страницы и возвращает словарь полей от бэкенда извлечения.
+    Воркеры перезапускаются после max_tasks_per_child задач, чтобы память
+    не росла; глубина очереди показывает насыщение пула.
+    """
+
+    def __init__(self, processes=None, max_tasks_per_child=500, backend=None, selective=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child
+        self.backend = backend
+        self.selective = selective
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.restarts = 0
+        self.executor = self._create_executor()
+        self.warm_up()
+
+    def _create_executor(self):
+        # max_tasks_per_child несовместим с fork, процессы запускаются через spawn
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.backend, self.selective),
+            max_tasks_per_child=self.max_tasks_per_child
+        )
+
+    def warm_up(self):
+        """Запускает все процессы заранее, чтобы первый запрос не ждал старта"""
+        futures = [self.executor.submit(_warm_up) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def submit(self, content, fields=None):
+        """Отправляет HTML в пул, возвращает concurrent.futures.Future с (поля, этапы)"""
+        executor = self.executor
+        with self.lock:
+            self.pending += 1
+        try:
+            future = executor.submit(_extract, content, fields)
+        except BrokenProcessPool:
+            with self.lock:
+                self.pending -= 1
+            self._restart(executor)
+            raise
+        future.executor = executor
+        future.add_done_callback(self._done)
+        return future
+
+    def extract(self, content, steps=None, fields=None):
+        """Разбор HTML в пуле с ожиданием результата, steps и fields - как у Extractor.extract"""
+        future = self.submit(content, fields)
+        try:
+            data, worker_steps = future.result()
+        except BrokenProcessPool:
+            # Воркер упал (например, по памяти) - пересоздаем пул для следующих задач
+            self._restart(future.executor)
+            raise
+        if steps is not None:
+            steps.update(worker_steps)
+        return data
+
+    def _restart(self, broken_executor):
+        with self.lock:
+            # Пул мог уже пересоздать другой поток
+            if self.executor is not broken_executor:
+                return
+            logger.error("Parse pool is broken, restarting")
+            self.restarts += 1
+            self.executor = self._create_executor()
+        broken_executor.shutdown(wait=False)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'processes': self.processes,
+                'max_tasks_per_child': self.max_tasks_per_child,
+                'queue_depth': self.pending,
+                'completed': self.completed,
+                'restarts': self.restarts
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
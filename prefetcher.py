@@ -0,0 +1,233 @@
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from article_cache import get_news_item_id
+from batch_engine import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+ITEM_LINK_RE = re.compile(r'(?:https?://www\.mos\.ru)?/news/item/(\d+)/?')
+RSS_ITEM_RE = re.compile(r'<item\b.*?</item>', re.S | re.I)
+RSS_PUBDATE_RE = re.compile(r'<pubDate>\s*(.*?)\s*</pubDate>', re.S | re.I)
+
+
+def item_url(item_id):
+    return f'https://www.mos.ru/news/item/{item_id}/'
+
+
+def parse_timestamp(value):
+    """Время публикации (RFC 822 из RSS или ISO 8601 со страницы) в unix-времени или None"""
+    if not value:
+        return None
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return moment.timestamp()
+
+
+def discover_items(text):
+    """
+    Новости из ленты RSS или HTML-списка: {url: время публикации или None}.
+
+    Для RSS время берется из pubDate, в HTML-списке его нет - оно
+    уточняется по дате статьи после парсинга.
+    """
+    items = {}
+    for block in RSS_ITEM_RE.findall(text):
+        match = ITEM_LINK_RE.search(block)
+        if match:
+            pubdate = RSS_PUBDATE_RE.search(block)
+            items[item_url(match.group(1))] = parse_timestamp(pubdate.group(1) if pubdate else None)
+    for match in ITEM_LINK_RE.finditer(text):
+        items.setdefault(item_url(match.group(1)), None)
+    return items
+
+
+class NewsPrefetcher:
+    """
+    Фоновая загрузка новых новостей mos.ru в кэш парсера.
+
+    Раз в interval секунд опрашивает источники (лента новостей, RSS),
+    находит ссылки /news/item/<id>/ и разбирает их через кэш парсера
+    с частотой не выше rate статей в секунду, начиная с новых. Новость
+    загружается, пока она моложе lookback секунд (по дате публикации,
+    а если она неизвестна - по времени обнаружения), и обновляется
+    по истечении TTL кэша, поэтому /parse отдает ее из кэша. Старые
+    новости помнятся, пока есть в источниках, чтобы не разбирать их снова.
+
+    С coordinator источники опрашивает один экземпляр сервиса - тот, кто
+    держит аренду 'prefetch'; остальные получают новости из общего кэша.
+    """
+
+    def __init__(self, parser, sources, interval=300, lookback=6 * 3600, rate=0.2, max_items=100,
+                 coordinator=None):
+        self.parser = parser
+        self.coordinator = coordinator
+        self.sources = list(sources)
+        self.interval = interval
+        self.lookback = lookback
+        self.rate = rate
+        self.max_items = max_items
+        self.items = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_poll_at = None
+        self.last_error = None
+        self.leader = coordinator is None
+        self.stats = {'polls': 0, 'discovered': 0, 'prefetched': 0, 'failed': 0, 'skipped': 0}
+
+    def configure(self, interval=None, lookback=None, rate=None, max_items=None):
+        with self.lock:
+            if interval is not None:
+                self.interval = interval
+            if lookback is not None:
+                self.lookback = lookback
+            if rate is not None:
+                self.rate = rate
+            if max_items is not None:
+                self.max_items = max_items
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Запускает фоновый опрос, возвращает False, если он уже запущен"""
+        with self.lock:
+            if self.is_running():
+                return False
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name='news-prefetcher', daemon=True)
+            self.thread.start()
+        logger.info(f"Prefetcher started: every {self.interval}s, lookback {self.lookback}s")
+        return True
+
+    def stop(self, timeout=10):
+        """Останавливает опрос; текущая статья дорабатывается"""
+        with self.lock:
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                return False
+            self.stop_event.set()
+        thread.join(timeout)
+        logger.info("Prefetcher stopped")
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            started = time.time()
+            try:
+                if self.is_leader():
+                    self.poll_once()
+                    # Продление аренды на следующий интервал
+                    self.is_leader()
+                else:
+                    self.stats['skipped'] += 1
+            except Exception as e:
+                logger.error(f"Prefetch poll failed: {e}")
+                self.last_error = str(e)
+            self.stop_event.wait(max(0.0, self.interval - (time.time() - started)))
+
+    def is_leader(self):
+        """Этот экземпляр ведет фоновую загрузку (берет или продлевает аренду)"""
+        if self.coordinator is not None:
+            # Аренда переживает самый долгий цикл: загрузку max_items статей с частотой rate
+            self.leader = self.coordinator.acquire('prefetch', self.interval * 2 + self.max_items / self.rate)
+        return self.leader
+
+    def fetch_source(self, source):
+        response = self.parser.get_page_with_retries(self.parser.origin_url(source))
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch {source}")
+        return response.text
+
+    def poll_once(self):
+        """Один цикл: поиск новых новостей и загрузка устаревших в кэше"""
+        now = time.time()
+        for source in self.sources:
+            try:
+                discovered = discover_items(self.fetch_source(source))
+            except Exception as e:
+                logger.warning(f"Prefetch source error {source}: {e}")
+                self.last_error = str(e)
+                continue
+            with self.lock:
+                for url, published in discovered.items():
+                    item = self.items.get(url)
+                    if item is None:
+                        item = self.items[url] = {'first_seen': now, 'published': None, 'fetched_at': None}
+                        self.stats['discovered'] += 1
+                    item['last_seen'] = now
+                    item['published'] = item['published'] or published
+
+        with self.lock:
+            self.stats['polls'] += 1
+            self.last_poll_at = now
+            self._forget(now)
+            due = [
+                url for url, item in self.items.items()
+                if self.in_window(item, now)
+                and (item['fetched_at'] is None or now - item['fetched_at'] >= self.parser.cache.ttl)
+            ]
+            # Сначала новые: id новостей mos.ru растут со временем
+            due.sort(key=lambda url: int(get_news_item_id(url)), reverse=True)
+            due = due[:self.max_items]
+            bucket = TokenBucket(self.rate, 1)
+
+        for url in due:
+            if self.stop_event.wait(bucket.reserve()):
+                return
+            if not self.prefetch(url):
+                # mos.ru ограничивает запросы - остаток ждет следующего цикла
+                return
+
+    def prefetch(self, url):
+        """Разбор одной новости в кэш, False - продолжать цикл не нужно"""
+        result = self.parser.parse_news_article_cached(url)
+        with self.lock:
+            item = self.items.get(url)
+            if result.get('success'):
+                self.stats['prefetched'] += 1
+                if item is not None:
+                    item['fetched_at'] = time.time()
+                    item['published'] = item['published'] or parse_timestamp(result.get('date'))
+            else:
+                self.stats['failed'] += 1
+                self.last_error = result.get('error')
+        return result.get('retry_after') is None
+
+    def in_window(self, item, now):
+        return (item['published'] or item['first_seen']) >= now - self.lookback
+
+    def _forget(self, now):
+        # Новости, пропавшие из источников дольше lookback назад
+        cutoff = now - self.lookback
+        for url in [url for url, item in self.items.items() if item['last_seen'] < cutoff]:
+            del self.items[url]
+
+    def get_status(self):
+        now = time.time()
+        with self.lock:
+            return {
+                'running': self.is_running(),
+                'leader': self.leader,
+                'sources': self.sources,
+                'interval': self.interval,
+                'lookback': self.lookback,
+                'rate': self.rate,
+                'max_items': self.max_items,
+                'tracked': sum(1 for item in self.items.values() if self.in_window(item, now)),
+                'pending': sum(1 for item in self.items.values()
+                               if self.in_window(item, now) and item['fetched_at'] is None),
+                'last_poll_at': datetime.fromtimestamp(self.last_poll_at).isoformat() if self.last_poll_at else None,
+                'last_error': self.last_error,
+                **self.stats
+            }
@@ -0,0 +1,225 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from batch_engine import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: mos.ru ограничивает нас, автомат разомкнут"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"mos.ru is throttling requests, retry in {retry_after:.1f}s")
+
+
+def parse_retry_after(value):
+    """Retry-After в секундах: число секунд или HTTP-дата, None если заголовка нет"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """
+    Общий для всех воркеров регулятор частоты запросов к mos.ru (AIMD).
+
+    Ответ 429 уменьшает частоту в decrease раз (не чаще раза в секунду,
+    чтобы одновременные отказы считались одним событием) и ставит общую
+    паузу по Retry-After. Каждые increase_after успешных ответов подряд
+    частота растет на increase до max_rate.
+
+    После breaker_threshold отказов подряд автомат размыкается: запросы
+    завершаются CircuitOpenError без обращения к сайту. По истечении паузы
+    пропускается один пробный запрос - успех замыкает автомат, отказ
+    размыкает его снова с удвоенной паузой. Вызывающий освобождает пробу
+    через release_probe() после каждой попытки, чем бы она ни кончилась.
+
+    Частота, пауза и их изменения хранятся в процессе; SharedRateLimiter
+    (coordination) переопределяет reserve_slot, _pause, _decrease и
+    _increase, чтобы делить их между экземплярами сервиса. blocking -
+    методы обращаются к диску, и асинхронный код вызывает их вне event loop.
+    """
+
+    blocking = False
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, max_rate, capacity=1, min_rate=0.1, increase=0.1, decrease=0.5,
+                 increase_after=20, breaker_threshold=5, breaker_cooldown=30.0,
+                 max_cooldown=300.0, backoff_base=1.0, backoff_cap=30.0, bucket=None):
+        self.bucket = bucket or TokenBucket(max_rate, capacity)
+        self.max_rate = float(max_rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.increase_after = increase_after
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_cooldown = max_cooldown
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self.state = self.CLOSED
+        self.open_until = 0.0
+        self.cooldown = breaker_cooldown
+        self.probe_in_flight = False
+        self.stats = {'throttled': 0, 'decreases': 0, 'increases': 0, 'trips': 0, 'rejected': 0}
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def _check_circuit(self, now):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            # Пробный запрос - остальные ждут его результата
+            self.probe_in_flight = True
+            return
+        self.stats['rejected'] += 1
+        raise CircuitOpenError(max(self.open_until - now, 1.0))
+
+    def reserve(self):
+        """
+        Резервирует право на запрос и возвращает, сколько секунд подождать.
+
+        Учитывает общую паузу после 429; при разомкнутом автомате
+        бросает CircuitOpenError.
+        """
+        self.check_circuit()
+        return self.reserve_slot()
+
+    def check_circuit(self):
+        """Проверка автомата (без ожидания): CircuitOpenError или право на запрос"""
+        with self.lock:
+            self._check_circuit(time.monotonic())
+
+    def reserve_slot(self):
+        """Токен без проверки автомата: сколько секунд подождать"""
+        return self._paused_for(time.monotonic()) + self.bucket.reserve()
+
+    def _paused_for(self, now):
+        return max(0.0, self.paused_until - now)
+
+    def _pause(self, now, seconds):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def _decrease(self, now):
+        """Снижение частоты; одновременные отказы (чаще раза в секунду) - одно событие"""
+        if now - self.last_decrease < 1.0:
+            return False
+        self.last_decrease = now
+        self.bucket.set_rate(max(self.min_rate, self.rate * self.decrease))
+        return True
+
+    def _increase(self):
+        if self.rate >= self.max_rate:
+            return False
+        self.bucket.set_rate(min(self.max_rate, self.rate + self.increase))
+        return True
+
+    def acquire(self):
+        """Блокирует поток до разрешенного момента запроса"""
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def on_success(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info("mos.ru accepts requests again, closing circuit")
+                self.state = self.CLOSED
+                self.cooldown = self.breaker_cooldown
+            self.throttles = 0
+            self.successes += 1
+            if self.successes >= self.increase_after:
+                self.successes = 0
+                if self._increase():
+                    self.stats['increases'] += 1
+
+    def on_throttle(self, retry_after=None):
+        """Ответ 429/503: снижение частоты, общая пауза, возможно размыкание автомата"""
+        with self.lock:
+            now = time.monotonic()
+            self.stats['throttled'] += 1
+            self.successes = 0
+            self.throttles += 1
+
+            if self._decrease(now):
+                self.stats['decreases'] += 1
+                logger.warning(f"mos.ru throttling, request rate lowered to {self.rate:.2f}/s")
+
+            pause = retry_after if retry_after is not None else self.backoff(self.throttles - 1)
+            self._pause(now, pause)
+
+            if self.state == self.HALF_OPEN:
+                # Пробный запрос не прошел - пауза растет
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open(now, retry_after)
+            elif self.state == self.CLOSED and self.throttles >= self.breaker_threshold:
+                self._open(now, retry_after)
+
+    def on_failure(self):
+        """Ошибка сети или сервера - не ограничение, но пробный запрос завершен"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """
+        Попытка запроса завершена любым образом (вызывается в finally): пробный
+        запрос, прерванный исключением без on_success/on_throttle/on_failure
+        (PageTooLarge, отмена), не оставляет автомат в half_open навсегда
+        """
+        with self.lock:
+            self.probe_in_flight = False
+
+    def _open(self, now, retry_after):
+        self.state = self.OPEN
+        self.open_until = now + max(self.cooldown, retry_after or 0)
+        self.probe_in_flight = False
+        self.stats['trips'] += 1
+        logger.error(f"Circuit opened for {self.open_until - now:.0f}s after {self.throttles} throttled requests")
+
+    def backoff(self, attempt):
+        """Пауза перед повтором с полным случайным разбросом (full jitter)"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt + 1)))
+
+    def get_state(self):
+        with self.lock:
+            now = time.monotonic()
+            return {
+                'circuit': self.state,
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'min_rate': self.min_rate,
+                'paused_for': round(self._paused_for(now), 3),
+                'open_for': round(max(0.0, self.open_until - now), 3) if self.state == self.OPEN else 0,
+                'consecutive_throttles': self.throttles,
+                **self.stats
+            }
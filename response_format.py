@@ -0,0 +1,161 @@
+import gzip
+import logging
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Как json.dumps: ключи-числа допустимы и становятся строками
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+# Сжимаются только текстовые ответы; двоичный msgpack тоже жмется хорошо
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', MSGPACK_MIMETYPE, 'text/')
+
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _brotli_compress(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _gzip_compress(data, level):
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+# Кодировки в порядке предпочтения при одинаковом q: (функция, уровень по умолчанию)
+ENCODINGS = {
+    'zstd': (_zstd_compress, 3),
+    'br': (_brotli_compress, 5),
+    'gzip': (_gzip_compress, 6),
+}
+
+
+def available_encodings():
+    """Кодировки, для которых установлены библиотеки"""
+    names = ['gzip']
+    if brotli is not None:
+        names.insert(0, 'br')
+    if zstandard is not None:
+        names.insert(0, 'zstd')
+    return names
+
+
+def wants_msgpack():
+    """Клиент просит msgpack: ?format=msgpack или Accept: application/msgpack"""
+    if request.args.get('format') == 'msgpack':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """
+    JSON без \\u-экранирования кириллицы и сортировки ключей, через orjson,
+    если он установлен. По запросу клиента ответ кодируется в msgpack.
+    """
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def __init__(self, app, encoder='auto'):
+        super().__init__(app)
+        self.orjson = encoder in ('auto', 'orjson') and orjson is not None
+        if encoder == 'orjson' and orjson is None:
+            logger.warning("orjson is not installed, using the standard json encoder")
+        self.msgpack = msgpack is not None
+
+    def dumps(self, obj, **kwargs):
+        if self.orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.msgpack and wants_msgpack():
+            response = Response(msgpack.packb(obj, default=self.default), mimetype=MSGPACK_MIMETYPE)
+            response.vary.add('Accept')
+            return response
+        if self.orjson:
+            # Без промежуточной строки: orjson сразу отдает байты
+            return Response(orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS) + b'\n',
+                            mimetype=self.mimetype)
+        return super().response(obj)
+
+
+class ResponseCompressor:
+    """
+    Сжатие ответов по Accept-Encoding: zstd, br или gzip (что есть и что
+    клиент предпочитает). Маленькие, потоковые и уже сжатые ответы
+    отдаются как есть.
+    """
+
+    def __init__(self, encodings=None, min_size=1024, levels=None):
+        self.encodings = [name for name in (encodings or available_encodings()) if name in ENCODINGS]
+        self.min_size = min_size
+        self.levels = levels or {}
+
+    def choose(self):
+        if not self.encodings:
+            return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compressible(self, response):
+        mimetype = response.mimetype or ''
+        return (
+            not response.is_streamed
+            and not response.direct_passthrough
+            and 200 <= response.status_code < 300
+            and response.status_code != 204
+            and 'Content-Encoding' not in response.headers
+            and mimetype.startswith(COMPRESSIBLE_MIMETYPES)
+        )
+
+    def __call__(self, response):
+        if not self.compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        encoding = self.choose()
+        if encoding is None:
+            return response
+        compress, level = ENCODINGS[encoding]
+        response.set_data(compress(data, self.levels.get(encoding, level)))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_app(app, compression=True, min_size=1024, encoder='auto'):
+    """Подключает компактный JSON/msgpack и сжатие ответов к приложению Flask"""
+    app.json = CompactJSONProvider(app, encoder)
+    compressor = None
+    if compression:
+        compressor = ResponseCompressor(min_size=min_size)
+        app.after_request(compressor)
+    logger.info(f"Response encoding: json={'orjson' if app.json.orjson else 'json'}, "
+                f"msgpack={app.json.msgpack}, compression={compressor.encodings if compressor else []}")
+    return compressor
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class FlightAborted(Exception):
+    """Ведущий запрос был отменен до получения результата"""
+
+
+class SingleFlight:
+    """
+    Объединение одновременных запросов с одинаковым ключом.
+
+    Первый вызов (ведущий) выполняет работу, остальные ждут его результат.
+    Ожидание построено на concurrent.futures.Future, поэтому к одному вызову
+    могут присоединяться и потоки Flask, и корутины асинхронного загрузчика.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    def _begin(self, key):
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            # Запущенный future нельзя отменить со стороны ожидающих
+            future.set_running_or_notify_cancel()
+            self.calls[key] = future
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self.lock:
+            self.calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, func):
+        """Выполняет func() один раз для всех одновременных вызовов с ключом key"""
+        while True:
+            future, leader = self._begin(key)
+            if not leader:
+                try:
+                    return future.result(), False
+                except FlightAborted:
+                    continue
+
+            try:
+                result = func()
+            except BaseException as e:
+                self._finish(key, future, error=FlightAborted() if isinstance(e, asyncio.CancelledError) else e)
+                raise
+            self._finish(key, future, result)
+            return result, True
+
+    async def do_async(self, key, func):
+        """То же, что do(), для корутинной функции func"""
+        while True:
+            future, leader = self._begin(key)
+            if not leader:
+                try:
+                    # shield - отмена одного ожидающего не затрагивает остальных
+                    return await asyncio.shield(asyncio.wrap_future(future)), False
+                except FlightAborted:
+                    continue
+
+            try:
+                result = await func()
+            except BaseException as e:
+                self._finish(key, future, error=FlightAborted() if isinstance(e, asyncio.CancelledError) else e)
+                raise
+            self._finish(key, future, result)
+            return result, True
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.calls)
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """
+    Соединение SQLite на поток для хранилищ сервиса (кэш статей, хранилище,
+    очередь заданий, координация).
+
+    WAL позволяет читать параллельно с записью. Соединение, унаследованное
+    через fork (preload в gunicorn), не используется: после fork каждый
+    воркер открывает свое. Вызов объекта возвращает соединение потока.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
@@ -0,0 +1,118 @@
+"""
+Координация экземпляров через общий файл SQLite: два Coordinator на одном
+временном файле ведут себя как два экземпляра сервиса (общий бюджет
+запросов, пауза после 429, аренды и возврат URL заданий упавшего экземпляра).
+
+    python -m pytest -q
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from coordination import Coordinator, SharedRateLimiter  # noqa: E402
+from job_queue import DONE, JobQueue  # noqa: E402
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'coordination.db')
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_rate_budget_is_shared(path):
+    a = SharedRateLimiter(Coordinator(path, 'a'), 1, 2)
+    b = SharedRateLimiter(Coordinator(path, 'b'), 1, 2)
+    assert a.reserve() == 0
+    assert b.reserve() == 0
+    # Всплеск в 2 запроса потрачен экземплярами вместе
+    assert a.reserve() > 0.5
+    assert b.reserve() > 1.5
+
+
+def test_throttle_pauses_every_instance(path):
+    a = SharedRateLimiter(Coordinator(path, 'a'), 1, 2)
+    b = SharedRateLimiter(Coordinator(path, 'b'), 1, 2)
+    a.on_throttle(retry_after=5)
+    assert b.reserve() >= 4
+    assert b.rate == 0.5
+
+
+def test_lease_is_exclusive_until_released(path):
+    a, b = Coordinator(path, 'a'), Coordinator(path, 'b')
+    a.heartbeat()
+    assert a.acquire('article:1')
+    assert a.acquire('article:1')
+    assert not b.acquire('article:1')
+    a.release('article:1')
+    assert b.acquire('article:1')
+
+
+def test_lease_of_dead_instance_is_taken_over(path):
+    a = Coordinator(path, 'a', heartbeat_ttl=0.3)
+    b = Coordinator(path, 'b', heartbeat_ttl=0.3)
+    a.heartbeat()
+    assert a.acquire('article:1', ttl=60)
+    assert not b.acquire('article:1')
+    # a перестал отмечаться - аренду не ждут до истечения срока
+    time.sleep(0.5)
+    assert b.acquire('article:1')
+
+
+def test_lease_is_renewed_while_held(path):
+    a = Coordinator(path, 'a', lease_ttl=0.3)
+    b = Coordinator(path, 'b', lease_ttl=0.3)
+    a.start()
+    try:
+        assert a.acquire('article:1', renew=True)
+        assert a.acquire('article:2')
+        time.sleep(1)
+        # Загрузка идет дольше срока аренды, но ее продлевают
+        assert not b.acquire('article:1')
+        assert b.acquire('article:2')
+        a.release('article:1')
+        assert b.acquire('article:1')
+    finally:
+        a.stop()
+
+
+def test_items_of_dead_instance_are_reclaimed(path):
+    a = Coordinator(path, 'a', heartbeat_ttl=0.5)
+    b = Coordinator(path, 'b', heartbeat_ttl=0.5)
+    release = threading.Event()
+
+    def stuck(url, **options):
+        release.wait(10)
+        return {'success': True, 'url': url, 'instance': 'a'}
+
+    def worker(url, **options):
+        return {'success': True, 'url': url, 'instance': 'b'}
+
+    queue_a = JobQueue(path, stuck, workers=1, per_job=1, coordinator=a)
+    queue_b = JobQueue(path, worker, workers=1, per_job=1, coordinator=b)
+    try:
+        queue_a.start()
+        job_id = queue_a.submit(['https://www.mos.ru/news/item/1/'])
+        wait_for(lambda: queue_a.get(job_id)['running'] == 1)
+        # Экземпляр a "упал": URL остался за ним, отметок больше нет
+        queue_a.stop(timeout=0.1)
+        time.sleep(0.6)
+
+        queue_b.start()
+        wait_for(lambda: queue_b.get(job_id)['status'] == DONE)
+        assert [item['instance'] for item in queue_b.results(job_id)] == ['b']
+    finally:
+        release.set()
+        queue_a.stop()
+        queue_b.stop()
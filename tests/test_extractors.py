@@ -0,0 +1,99 @@
+"""
+Извлечение полей статьи: выборочный разбор bs4 дает те же поля, что полный,
+и не строит ненужные блоки (шапку, меню, подвал); проверка правил извлечения.
+
+    python -m pytest -q
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from extractors import ExtractionRules, RegionSoup, RulesFile, get_extractor  # noqa: E402
+from origin import load_fixtures  # noqa: E402
+
+# Кандидаты в поля внутри шапки и подвала, вложенные ненужные блоки,
+# заголовок в шапке, запасной разбор по параграфам
+PAGES = [
+    """<html><head><title>Заголовок страницы - mos.ru</title></head><body>
+<header><div class="content"><p>Промо: скачайте приложение mos.ru и получайте уведомления первыми</p></div>
+<img src="/static/logo.svg"></header>
+<div class="banner"><img src="/upload/banner.jpg"></div>
+<article class="news-article"><h1>Открыта новая станция метро в районе</h1>
+<div class="content"><p>Сегодня мэр Москвы открыл новую станцию метро, которую ждали жители района.</p>
+<figure><img src="/upload/newsfeed/1.jpg"></figure></div></article>
+<div class="news-date">2024-05-13</div>
+<div class="tags"><a href="/t/1">Транспорт</a><a href="/t/2">Метро</a></div>
+<aside><img data-src="/upload/side.jpg"></aside>
+<footer><div class="tags"><a>Подвал</a></div></footer>
+</body></html>""",
+    """<html><body><header><h1>Заголовок в шапке <img src="/h.jpg"></h1><header><nav>
+<div class="content"><p>меню меню меню меню меню меню меню меню меню меню</p></div></nav></header>
+<time datetime="2020-01-01">x</time><div class="tags"><a>шапка</a></div><br><img src="/logo.png"></header>
+<main><div class="content"><p>Основной текст статьи достаточно длинный, чтобы пройти порог.</p>
+<script>var a = "<header>";</script><img src="/a.jpg"></div>
+<time datetime="2024-01-01">1</time><div class="tags"><a>Тег</a></div></main>
+<footer><footer></footer><img src="/f.png"><p>Подвал подвал подвал подвал подвал подвал подвал подвал</p></footer>
+<div class="content"><p>Второй блок контента после подвала, тоже достаточно длинный текст.</p></div>
+</body></html>""",
+    """<html><body><nav class="menu"><ul><li><a>Раз</a><li><a>Два</a></ul></nav>
+<h1>Короткий</h1><h1>Нормальный заголовок</h1>
+<div class="navigation"><div><div class="content"><p>Навигационный текст не попадает в контент.</p></div></div></div>
+<p>Просто параграф вне контента, достаточно длинный для запасного режима разбора.</p></body></html>""",
+]
+
+
+@pytest.mark.parametrize('fields', [None, {'images'}, {'title', 'tags'}, {'date'}, {'title'}])
+def test_selective_matches_full(fields):
+    full, selective = get_extractor('bs4', selective=False), get_extractor('bs4', selective=True)
+    assert selective.selective
+    for page in load_fixtures() + [page.encode() for page in PAGES]:
+        assert selective.extract(page, fields=fields) == full.extract(page, fields=fields)
+
+
+def test_unwanted_blocks_are_not_built():
+    with open(os.path.join(ROOT, 'bench', 'fixtures', 'portal-000.html'), 'rb') as f:
+        soup = RegionSoup(f.read(), ExtractionRules())
+    assert soup.find('nav') is None
+    assert soup.find('footer') is None
+    assert soup.find(class_='menu__item') is None
+    assert soup.find('article') is not None
+
+
+def test_lxml_has_no_selective_mode():
+    assert not get_extractor('lxml', selective=True).selective
+
+
+@pytest.mark.parametrize('rules', [{'title': [1]}, {'block_tags': [1]}, {'skip_words': [None]}, {'title': 'h1'}])
+def test_rules_reject_wrong_types(rules):
+    with pytest.raises(ValueError):
+        ExtractionRules(rules)
+
+
+def test_reload_keeps_previous_plan(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'title': ['h1']}))
+    rules_file = RulesFile(str(path), check_interval=0)
+    version = rules_file.rules.version
+    path.write_text(json.dumps({'title': [1]}))
+    os.utime(path, ns=(time.time_ns() + 10 ** 9,) * 2)
+    assert rules_file.reload() is False
+    assert rules_file.rules.version == version
+    assert rules_file.get_stats()['error']
+    extractor = get_extractor('bs4', rules=rules_file)
+    assert extractor.extract(PAGES[0].encode())['title'] == 'Открыта новая станция метро в районе'
+
+
+def test_unsupported_region_selector_disables_region_parsing():
+    rules = ExtractionRules({'content': 'article:not(.promo) .content'})
+    assert rules.region_matcher is None
+    assert not rules.get_stats()['region_parsing']
+    full = get_extractor('bs4', selective=False, rules=rules)
+    selective = get_extractor('bs4', selective=True, rules=rules)
+    assert selective.extract(PAGES[0].encode()) == full.extract(PAGES[0].encode())
@@ -0,0 +1,99 @@
+"""
+Настройки gunicorn.conf.py: как бюджет сервиса делится между воркерами,
+и остановка сервиса под gunicorn с дорабатыванием начатых запросов.
+
+    python -m pytest -q
+"""
+import os
+import runpy
+import socket
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from origin import start_origin  # noqa: E402
+from rate_control import AdaptiveRateLimiter  # noqa: E402
+from run import check_drain, start_service  # noqa: E402
+
+
+def load_config(monkeypatch, **env):
+    """Переменные окружения воркера (raw_env) при заданных переменных мастера"""
+    for name in ('COORDINATION_DB', 'MOSRU_RATE', 'MOSRU_BURST', 'PARSE_PROCESSES'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    config = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+    return dict(item.split('=', 1) for item in config['raw_env'])
+
+
+@pytest.mark.parametrize('workers', ['1', '4', '8', '64'])
+def test_idle_worker_first_request_does_not_wait(monkeypatch, workers):
+    env = load_config(monkeypatch, WEB_CONCURRENCY=workers)
+    limiter = AdaptiveRateLimiter(float(env['MOSRU_RATE']), float(env['MOSRU_BURST']))
+    assert limiter.reserve() == 0
+
+
+def test_rate_is_split_between_workers(monkeypatch):
+    env = load_config(monkeypatch, WEB_CONCURRENCY='4', MOSRU_RATE='2', MOSRU_BURST='8')
+    assert float(env['MOSRU_RATE']) == 0.5
+    assert float(env['MOSRU_BURST']) == 2
+
+
+def test_rate_is_not_split_with_coordination(monkeypatch, tmp_path):
+    env = load_config(monkeypatch, WEB_CONCURRENCY='4', MOSRU_RATE='2', MOSRU_BURST='8',
+                      COORDINATION_DB=str(tmp_path / 'coordination.db'))
+    assert float(env['MOSRU_RATE']) == 2
+    assert float(env['MOSRU_BURST']) == 8
+
+
+def test_parse_processes_are_split_between_workers(monkeypatch):
+    env = load_config(monkeypatch, WEB_CONCURRENCY='4', PARSE_PROCESSES='8')
+    assert env['PARSE_PROCESSES'] == '2'
+    env = load_config(monkeypatch, WEB_CONCURRENCY='16', PARSE_PROCESSES='8')
+    assert env['PARSE_PROCESSES'] == '1'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_in_flight_requests_finish_after_sigterm(tmp_path):
+    # Стенд отвечает через секунду: SIGTERM приходит, пока запросы в работе
+    server, stats = start_origin(latency=1)
+    origin = f'http://127.0.0.1:{server.server_address[1]}'
+    env = {
+        'WEB_CONCURRENCY': '2',
+        'GUNICORN_THREADS': '4',
+        'PREFETCH_ENABLED': 'False',
+        'COORDINATION_DB': '',
+        'ARTICLE_STORE_DB': str(tmp_path / 'articles.db'),
+        'JOBS_DB': str(tmp_path / 'jobs.db'),
+        'BACKGROUND_LOCK': str(tmp_path / 'background.lock'),
+        'WORKER_LOCK_PREFIX': str(tmp_path / 'worker'),
+    }
+    try:
+        process, base_url = start_service('gunicorn', free_port(), origin, env)
+
+        def send(session, item_id):
+            response = session.post(base_url + '/parse', timeout=60,
+                                    json={'url': f'https://www.mos.ru/news/item/{item_id}/'})
+            return response.status_code == 200 and response.json().get('success')
+
+        try:
+            drain = check_drain(process, list(range(7000, 7006)), send)
+        finally:
+            if process.poll() is None:
+                process.kill()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert drain['completed'] == drain['requests']
+    assert drain['errors'] == 0
+    assert drain['exit_code'] == 0
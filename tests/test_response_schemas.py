@@ -0,0 +1,242 @@
+"""
+Схемы ответов сервиса: каждый маршрут возвращает все ключи исходной версии
+сервиса (прежний контракт), поля, добавленные позже, проверяются отдельно.
+
+Сервис поднимается через test_client Flask и ходит за страницами
+в локальный bench/origin.py (MOSRU_ORIGIN). flask_api_parser читает
+настройки при импорте, поэтому прежние точки входа app.py и main.py
+(SERVICE_MODE=simple) проверяются в отдельном процессе.
+
+    python -m pytest -q
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from origin import start_origin  # noqa: E402
+
+URL = 'https://www.mos.ru/news/item/555/'
+# Проходит проверку URL, но стенд отвечает 404 - разбор не удается
+MISSING_URL = 'https://www.mos.ru/news/item/missing/'
+FOREIGN_URL = 'https://example.com/x'
+
+# Прежний контракт: ключи ответов flask_api_parser в исходной версии сервиса
+RESULT_KEYS = {'success', 'url', 'title', 'content', 'date', 'images', 'tags', 'parsed_at'}
+FAILURE_KEYS = {'success', 'error', 'url'}
+ERROR_KEYS = {'success', 'error'}
+BATCH_KEYS = {'success', 'results', 'total', 'successful', 'failed'}
+INDEX_KEYS = {'service', 'version', 'endpoints', 'examples'}
+HEALTH_KEYS = {'service', 'status', 'timestamp'}
+
+# Поля, добавленные позже, - проверяются отдельно от прежнего контракта
+NEW_RESULT_KEYS = {'content_length', 'images_count', 'cache', 'fingerprint'}
+NEW_INDEX_KEYS = {'status', 'mode'}
+NEW_HEALTH_KEYS = {'mode', 'cache', 'jobs', 'parse_pool', 'rate_control', 'worker'}
+# Новые маршруты
+PAGE_KEYS = {'success', 'results', 'total', 'limit', 'offset', 'took_ms'}
+JOB_KEYS = {'success', 'job_id', 'status', 'total', 'done', 'failed', 'pending', 'running',
+            'cancelled', 'created_at', 'finished_at', 'options'}
+
+# Прежний контракт app.py и main.py: ключи /, /health и успешного /parse
+LEGACY_KEYS = {
+    'app': {
+        'index': {'status', 'service', 'version'},
+        'health': {'status', 'service'},
+        'result': {'success', 'url', 'title', 'content', 'content_length'},
+    },
+    'main': {
+        'index': {'service', 'status', 'endpoints'},
+        'health': {'status', 'timestamp', 'service'},
+        'result': {'success', 'url', 'title', 'content', 'images', 'content_length', 'images_count',
+                   'parsed_at'},
+    },
+}
+LEGACY_REQUESTS = [
+    ('GET', '/', None),
+    ('GET', '/health', None),
+    ('POST', '/parse', {'url': URL}),
+    ('GET', f'/parse?url={URL}', None),
+    ('POST', '/parse', {}),
+    ('POST', '/parse', {'url': MISSING_URL}),
+    ('POST', '/parse', {'url': FOREIGN_URL}),
+]
+LEGACY_SCRIPT = """
+import importlib, json, sys
+module = importlib.import_module(sys.argv[1])
+import flask_api_parser
+assert module.app is flask_api_parser.app
+client = module.app.test_client()
+out = []
+for method, path, body in json.loads(sys.argv[2]):
+    response = client.open(path, method=method, json=body)
+    out.append([response.status_code, response.get_json(silent=True) or {}])
+print(json.dumps(out))
+"""
+
+
+@pytest.fixture(scope='module')
+def origin():
+    server, stats = start_origin(latency=0)
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def service_env(origin):
+    return {
+        'MOSRU_ORIGIN': origin,
+        'MOSRU_RATE': '1000',
+        'MOSRU_BURST': '100',
+        'PREFETCH_ENABLED': 'False',
+        'COORDINATION_DB': '',
+        'ARTICLE_CACHE_DB': '',
+    }
+
+
+@pytest.fixture(scope='module')
+def client(service_env, tmp_path_factory):
+    directory = tmp_path_factory.mktemp('service')
+    os.environ.update(service_env,
+                      ARTICLE_STORE_DB=str(directory / 'articles.db'),
+                      JOBS_DB=str(directory / 'jobs.db'))
+    import flask_api_parser
+    yield flask_api_parser.app.test_client()
+    flask_api_parser.shutdown_worker(5)
+
+
+def keys(response, status=200):
+    assert response.status_code == status, response.get_data(as_text=True)
+    data = response.get_json()
+    assert isinstance(data, dict)
+    return set(data)
+
+
+def test_index(client):
+    index = keys(client.get('/'))
+    assert index >= INDEX_KEYS
+    assert index >= NEW_INDEX_KEYS
+
+
+def test_health(client):
+    health = keys(client.get('/health'))
+    assert health >= HEALTH_KEYS
+    assert health >= NEW_HEALTH_KEYS
+
+
+def test_metrics(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+@pytest.mark.parametrize('path', ['/parse', '/async/parse'])
+def test_parse(client, path):
+    for response in (client.post(path, json={'url': URL}), client.get(path, query_string={'url': URL})):
+        result = keys(response)
+        assert result >= RESULT_KEYS
+        assert result >= NEW_RESULT_KEYS
+
+
+@pytest.mark.parametrize('path', ['/parse', '/async/parse'])
+def test_parse_errors(client, path):
+    assert keys(client.post(path, json={}), 400) >= ERROR_KEYS
+    assert keys(client.get(path), 400) >= ERROR_KEYS
+    invalid = keys(client.post(path, json={'url': FOREIGN_URL}), 400)
+    assert invalid >= ERROR_KEYS
+    # Новое: в ошибке неверного URL есть сам URL
+    assert 'url' in invalid
+
+
+def test_parse_failure(client):
+    assert keys(client.post('/parse', json={'url': MISSING_URL}), 500) >= FAILURE_KEYS
+
+
+def test_parse_not_modified(client):
+    fingerprint = client.post('/parse', json={'url': URL}).get_json()['fingerprint']
+    response = client.post('/parse', json={'url': URL, 'since': fingerprint})
+    assert keys(response) >= {'success', 'url', 'not_modified', 'fingerprint', 'parsed_at', 'cache'}
+
+
+@pytest.mark.parametrize('path', ['/batch', '/async/batch'])
+def test_batch(client, path):
+    response = client.post(path, json={'urls': [URL, FOREIGN_URL]})
+    assert keys(response) >= BATCH_KEYS
+    results = response.get_json()['results']
+    assert set(results[0]) >= RESULT_KEYS | NEW_RESULT_KEYS
+    assert set(results[1]) >= FAILURE_KEYS
+    assert keys(client.post(path, json={}), 400) >= ERROR_KEYS
+
+
+def test_batch_stream(client):
+    response = client.post('/batch', json={'urls': [URL], 'stream': 'ndjson'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    line = json.loads(response.get_data(as_text=True).splitlines()[0])
+    assert set(line) >= RESULT_KEYS | {'index'}
+
+
+def test_articles(client):
+    client.post('/parse', json={'url': URL})
+    assert keys(client.get('/articles')) >= PAGE_KEYS
+    assert keys(client.get('/articles/search', query_string={'q': 'Москва'})) >= PAGE_KEYS | {'query'}
+    article = keys(client.get('/articles/555'))
+    assert article >= {'success', 'item_id', 'url', 'title', 'content', 'date', 'tags', 'images'}
+
+
+def test_prefetch_status(client):
+    assert keys(client.get('/prefetch/status')) >= {'running', 'leader', 'polls', 'prefetched', 'failed'}
+
+
+def test_jobs(client):
+    created = client.post('/jobs', json={'urls': [URL]})
+    assert keys(created, 202) >= {'success', 'job_id', 'total', 'status_url', 'results_url'}
+    job_id = created.get_json()['job_id']
+    deadline = time.monotonic() + 10
+    while client.get(f'/jobs/{job_id}').get_json()['status'] not in ('done', 'failed', 'cancelled'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert keys(client.get(f'/jobs/{job_id}')) >= JOB_KEYS
+    results = keys(client.get(f'/jobs/{job_id}/results'))
+    assert results >= {'success', 'job_id', 'status', 'results', 'offset', 'limit', 'next_offset'}
+    assert keys(client.delete(f'/jobs/{job_id}')) >= JOB_KEYS
+
+
+@pytest.mark.parametrize('urls', [[None], [{'a': 1}], [URL, 1]])
+def test_jobs_reject_non_string_urls(client, urls):
+    assert keys(client.post('/jobs', json={'urls': urls}), 400) >= ERROR_KEYS
+
+
+@pytest.mark.parametrize('module', ['app', 'main'])
+def test_legacy_entry_points(service_env, module):
+    env = {name: value for name, value in os.environ.items()
+           if name not in ('SERVICE_MODE', 'ARTICLE_STORE_DB', 'JOBS_DB')}
+    env.update(service_env, PYTHONPATH=ROOT)
+    completed = subprocess.run([sys.executable, '-c', LEGACY_SCRIPT, module, json.dumps(LEGACY_REQUESTS)],
+                               env=env, cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    index, health, parsed, parsed_get, missing, failed, foreign = json.loads(completed.stdout.splitlines()[-1])
+    legacy = LEGACY_KEYS[module]
+
+    # Прежний контракт
+    assert index[0] == 200 and set(index[1]) >= legacy['index']
+    assert health[0] == 200 and set(health[1]) >= legacy['health']
+    assert parsed[0] == 200 and set(parsed[1]) >= legacy['result']
+    assert missing[0] == 400 and set(missing[1]) >= ERROR_KEYS
+    # Неудачный разбор - 200 с success: false, как в прежних app.py и main.py
+    assert failed[0] == 200 and set(failed[1]) >= FAILURE_KEYS and failed[1]['success'] is False
+
+    # Новое: режим simple, GET /parse (в app.py его не было) и поля ядра
+    assert index[1]['mode'] == health[1]['mode'] == 'simple'
+    assert parsed_get[0] == 200 and set(parsed_get[1]) >= legacy['result']
+    assert set(parsed[1]) >= RESULT_KEYS | NEW_RESULT_KEYS
+    # Несовместимое изменение (README): app.py загружал любой URL, теперь - 400
+    assert foreign[0] == 400 and set(foreign[1]) >= FAILURE_KEYS
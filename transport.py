@@ -0,0 +1,297 @@
+import logging
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import create_connection
+
+from metrics import CONNECT_SECONDS, CONNECTIONS_OPENED, DNS_LOOKUPS, HTTP_REQUESTS
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStats:
+    """
+    Счетчики транспорта: запросы, новые соединения (TCP + TLS) и их время,
+    обращения к кэшу DNS. Запросы без нового соединения шли по keep-alive.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.connect_seconds = 0.0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def request(self):
+        HTTP_REQUESTS.inc(mode=self.mode)
+        with self.lock:
+            self.requests += 1
+
+    def connected(self, seconds):
+        CONNECTIONS_OPENED.inc(mode=self.mode)
+        CONNECT_SECONDS.observe(seconds, mode=self.mode)
+        with self.lock:
+            self.opened += 1
+            self.connect_seconds += seconds
+
+    def dns(self, hit):
+        DNS_LOOKUPS.inc(mode=self.mode, result='hit' if hit else 'miss')
+        with self.lock:
+            if hit:
+                self.dns_hits += 1
+            else:
+                self.dns_misses += 1
+
+    def get_stats(self):
+        with self.lock:
+            reused = max(0, self.requests - self.opened)
+            return {
+                'requests': self.requests,
+                'connections_opened': self.opened,
+                'connections_reused': reused,
+                'reuse_ratio': round(reused / self.requests, 3) if self.requests else None,
+                'avg_connect_ms': round(self.connect_seconds / self.opened * 1000, 3) if self.opened else None,
+                'dns_hits': self.dns_hits,
+                'dns_misses': self.dns_misses
+            }
+
+
+class DnsCache:
+    """Адреса хостов на ttl секунд, общие для всех потоков"""
+
+    def __init__(self, stats, ttl=300):
+        self.stats = stats
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[1] > now:
+            self.stats.dns(True)
+            return entry[0]
+        self.stats.dns(False)
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][:2]
+        with self.lock:
+            self.entries[key] = (address, now + self.ttl)
+        return address
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+
+class _CountingConnectionMixin:
+    """Соединение urllib3 с учетом времени подключения и адресом из кэша DNS"""
+
+    transport = None
+
+    def _new_conn(self):
+        dns_cache = self.transport.dns_cache
+        if dns_cache is None:
+            return super()._new_conn()
+        try:
+            address = dns_cache.resolve(self._dns_host, self.port)
+            return create_connection(address, self.timeout, source_address=self.source_address,
+                                     socket_options=self.socket_options)
+        except socket.timeout as e:
+            dns_cache.invalidate(self._dns_host, self.port)
+            raise ConnectTimeoutError(self, f"Connection to {self.host} timed out") from e
+        except OSError as e:
+            # Адрес мог смениться - следующая попытка разрешит имя заново
+            dns_cache.invalidate(self._dns_host, self.port)
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        self.transport.stats.connected(time.perf_counter() - started)
+
+
+class _KeepAlivePoolMixin:
+    """
+    Пул urllib3 со сроком простоя соединения (keepalive секунд, как
+    keepalive_timeout у aiohttp и keepalive_expiry у httpx): соединение,
+    пролежавшее в пуле дольше, закрывается и открывается заново - сервер
+    к этому времени, скорее всего, уже закрыл его со своей стороны.
+    """
+
+    keepalive = None
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.idle_since = time.monotonic()
+        super()._put_conn(conn)
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        idle_since = getattr(conn, 'idle_since', None)
+        if self.keepalive and idle_since is not None and time.monotonic() - idle_since > self.keepalive:
+            # Закрытое соединение urllib3 откроет при отправке запроса
+            conn.close()
+        return conn
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter с настраиваемым пулом, сроком keep-alive и счетчиками соединений"""
+
+    def __init__(self, transport, pool_size, keepalive=60):
+        self.transport = transport
+        attrs = {'transport': transport}
+        http_connection = type('CountingHTTPConnection', (_CountingConnectionMixin, HTTPConnection), attrs)
+        https_connection = type('CountingHTTPSConnection', (_CountingConnectionMixin, HTTPSConnection), attrs)
+        self.pool_classes = {
+            'http': type('CountingHTTPConnectionPool', (_KeepAlivePoolMixin, HTTPConnectionPool),
+                         {'ConnectionCls': http_connection, 'keepalive': keepalive}),
+            'https': type('CountingHTTPSConnectionPool', (_KeepAlivePoolMixin, HTTPSConnectionPool),
+                          {'ConnectionCls': https_connection, 'keepalive': keepalive})
+        }
+        super().__init__(pool_connections=4, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def send(self, request, **kwargs):
+        self.transport.stats.request()
+        return super().send(request, **kwargs)
+
+
+class StreamedResponse:
+    """
+    Ответ с телом, которое читается по частям: iter_chunks(size) и
+    wire_bytes() - сколько байт тела получено по сети (до распаковки).
+    """
+
+    def __init__(self, status_code, headers, iter_chunks, wire_bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.iter_chunks = iter_chunks
+        self.wire_bytes = wire_bytes
+
+
+class Transport:
+    """
+    Общий для всех потоков синхронный транспорт к mos.ru.
+
+    requests.Session с пулом на pool_size соединений к хосту и кэшем DNS,
+    либо, при http2=True и установленном httpx[http2], httpx.Client
+    с мультиплексированием запросов по HTTP/2 (DNS кэширует ОС).
+    stream() отдает StreamedResponse с непрочитанным телом; если тело
+    прочитано не до конца, соединение закрывается, а не возвращается
+    в пул. Соединение, простоявшее в пуле дольше keepalive секунд,
+    открывается заново. Ошибки соединения - исключения из errors.
+    """
+
+    def __init__(self, headers, pool_size=20, keepalive=60, dns_ttl=300, http2=False):
+        self.stats = ConnectionStats('sync')
+        self.local = threading.local()
+        self.dns_cache = DnsCache(self.stats, dns_ttl) if dns_ttl > 0 else None
+        self.http2 = http2 and self._http2_available()
+        if self.http2:
+            self.client = httpx.Client(
+                http2=True,
+                headers=headers,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                    keepalive_expiry=keepalive)
+            )
+            self.errors = (httpx.HTTPError,)
+        else:
+            self.client = requests.Session()
+            self.client.headers.update(headers)
+            adapter = TransportAdapter(self, pool_size, keepalive)
+            self.client.mount('https://', adapter)
+            self.client.mount('http://', adapter)
+            self.errors = (requests.exceptions.RequestException,)
+
+    def _http2_available(self):
+        if httpx is None:
+            logger.warning("httpx is not installed, HTTP/2 is disabled")
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("h2 is not installed, HTTP/2 is disabled")
+            return False
+        return True
+
+    def _trace(self, event, info):
+        # События httpcore: время подключения считается от начала TCP до конца TLS
+        if event == 'connection.connect_tcp.started':
+            self.local.connect_started = time.perf_counter()
+        elif event in ('connection.start_tls.complete', 'connection.connect_tcp.complete'):
+            started = getattr(self.local, 'connect_started', None)
+            if started is not None and (event == 'connection.start_tls.complete' or not self.local.tls):
+                self.stats.connected(time.perf_counter() - started)
+                self.local.connect_started = None
+
+    @contextmanager
+    def stream(self, url, headers=None, timeout=30):
+        if not self.http2:
+            response = self.client.get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True)
+            streamed = StreamedResponse(response.status_code, response.headers,
+                                        response.iter_content, response.raw.tell)
+        else:
+            self.stats.request()
+            self.local.tls = url.startswith('https://')
+            request = self.client.build_request('GET', url, headers=headers, timeout=timeout,
+                                                extensions={'trace': self._trace})
+            response = self.client.send(request, stream=True, follow_redirects=True)
+            streamed = StreamedResponse(response.status_code, response.headers,
+                                        response.iter_bytes, lambda: response.num_bytes_downloaded)
+        try:
+            yield streamed
+        finally:
+            response.close()
+
+    def close(self):
+        self.client.close()
+
+    def get_stats(self):
+        return {'http2': self.http2, **self.stats.get_stats()}
+
+
+def aiohttp_trace_config(stats):
+    """TraceConfig aiohttp, который ведет ConnectionStats асинхронного загрузчика"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        stats.request()
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        stats.connected(time.perf_counter() - context.connect_started)
+
+    async def on_dns_cache_hit(session, context, params):
+        stats.dns(True)
+
+    async def on_dns_cache_miss(session, context, params):
+        stats.dns(False)
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+    trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+    return trace_config